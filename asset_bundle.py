@@ -0,0 +1,114 @@
+"""太空捕手 - 預先編譯的資源包
+
+把已縮放好的圖片像素 (RGBA) 存成單一檔案，啟動時一次讀入 (優先使用 mmap)，
+不再逐一探測路徑、解碼 PNG 與縮放。
+
+檔案格式：
+    MAGIC (4 bytes) | version, 索引長度 (<II) | 索引 JSON | 各圖片的 RGBA 像素
+索引記錄每張圖的鍵、尺寸與像素位移，以及建包時來源檔案的 (mtime_ns, size)，
+來源有變動時視為過期；另外記錄探測過但不存在的候選路徑 (例如使用備用圖形的項目)，
+其中任何一個後來出現時也視為過期。
+"""
+import json
+import mmap
+import os
+import struct
+
+import pygame
+
+MAGIC = b'SCAB'
+VERSION = 2
+HEADER = struct.Struct('<II')
+
+def write_bundle(path, surfaces, sources, missing=None):
+    """寫出資源包 (先寫暫存檔再替換，中斷時不會留下壞檔)
+
+    surfaces: 鍵 -> Surface；sources: 鍵 -> 來源圖片路徑 (備用圖形為 None)
+    missing: 鍵 -> 探測過但不存在的候選路徑列表
+    """
+    items = []
+    blobs = []
+    offset = 0
+    for key, surf in surfaces.items():
+        data = pygame.image.tobytes(surf, 'RGBA')
+        w, h = surf.get_size()
+        items.append({'key': key, 'w': w, 'h': h, 'offset': offset, 'length': len(data)})
+        blobs.append(data)
+        offset += len(data)
+    stamps = {}
+    for key, src in sources.items():
+        if src is not None:
+            st = os.stat(src)
+            stamps[key] = [src, st.st_mtime_ns, st.st_size]
+        else:
+            stamps[key] = None
+    missing = {key: [os.path.abspath(p) for p in paths] for key, paths in (missing or {}).items() if paths}
+    index = json.dumps({'items': items, 'sources': stamps, 'missing': missing}, ensure_ascii=False).encode('utf-8')
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as fp:
+        fp.write(MAGIC)
+        fp.write(HEADER.pack(VERSION, len(index)))
+        fp.write(index)
+        for data in blobs:
+            fp.write(data)
+    os.replace(tmp, path)
+
+def sources_fresh(stamps, missing=None):
+    """建包時記錄的來源檔案是否都沒有變動，且當時不存在的候選路徑仍不存在"""
+    for paths in (missing or {}).values():
+        if any(os.path.exists(p) for p in paths):
+            return False
+    for stamp in stamps.values():
+        if stamp is None:
+            continue
+        src, mtime_ns, size = stamp
+        try:
+            st = os.stat(src)
+        except OSError:
+            return False
+        if st.st_mtime_ns != mtime_ns or st.st_size != size:
+            return False
+    return True
+
+def read_bundle(path):
+    """讀取資源包；回傳 鍵 -> Surface，檔案不存在、損壞或過期時回傳 None"""
+    try:
+        with open(path, 'rb') as fp:
+            try:
+                buf = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                buf = fp.read()
+    except OSError:
+        return None
+    try:
+        if buf[:4] != MAGIC:
+            return None
+        version, index_len = HEADER.unpack_from(buf, 4)
+        if version != VERSION:
+            return None
+        start = 4 + HEADER.size
+        index = json.loads(bytes(buf[start:start + index_len]).decode('utf-8'))
+        if not sources_fresh(index['sources'], index.get('missing')):
+            return None
+        base = start + index_len
+        # 已開啟視窗時直接轉成顯示格式 (這一步本身就會複製像素)，否則先複製一份；之後即可關閉 mmap
+        convert = pygame.display.get_surface() is not None
+        surfaces = {}
+        with memoryview(buf) as view:
+            for item in index['items']:
+                a = base + item['offset']
+                size = (item['w'], item['h'])
+                if convert:
+                    surf = pygame.image.frombuffer(view[a:a + item['length']], size, 'RGBA')
+                    surfaces[item['key']] = surf.convert_alpha()
+                    del surf
+                else:
+                    pixels = view[a:a + item['length']].tobytes()
+                    surfaces[item['key']] = pygame.image.frombuffer(pixels, size, 'RGBA')
+        return surfaces
+    except (ValueError, KeyError, struct.error):
+        return None
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
@@ -0,0 +1,230 @@
+"""太空捕手 - 前瞻搜尋自動駕駛
+
+Autopilot(sim) -> 輸入位元，可直接當作 Simulation.run 的策略或遊戲的 input_source。
+每隔 hold 步重新規劃一次：從目前狀態展開「不動 / 左 / 右 / 跳」各持續 hold 步的動作序列，
+搜尋 depth 層 (4^depth 個候選未來)，以複製出的模擬逐步推進並評分，執行最佳序列的第一段。
+模擬狀態以 Simulation.copy_from 複製 (含亂數狀態)，因此候選未來與實際會發生的完全一致。
+
+有時間預算時採逐層加深：先搜完較淺的層數，時間用完就採用最深一次完整搜尋的結果。
+預算分散在 hold 步裡：執行目前計畫的同時，以計畫執行完的預測狀態為根，每步搜尋 budget / hold 秒，
+避免每 hold 步出現一次用掉整個預算的畫面。
+
+平衡測試 (不開視窗，量測難度曲線在高分時的表現)：
+
+    python autopilot.py --sessions 20 --depth 3 --hold 6
+
+預設載入遊戲資源建立碰撞遮罩；--aabb 改用矩形判定 (物件比實際圖形大，幾乎無法閃避高速的假金幣)。
+遊戲中以 python 嘉桐gemini.py --autopilot 啟動，或在遊戲中按 A 切換。
+"""
+import argparse
+import statistics
+from time import perf_counter
+
+from sim_core import (
+    SIM_HZ, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, DEFAULT_RULES, SCREEN_WIDTH, Simulation,
+)
+
+AUTOPILOT_ACTIONS = (0, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP)
+
+# 評分權重
+DEATH_PENALTY = 1_000_000
+SHIELD_PENALTY = 300
+EFFECT_BONUS = 0.5      # 每步的無敵 / 火焰時間
+COIN_DISTANCE_WEIGHT = 5
+
+def _state_key(sim):
+    """用來確認預測的根節點與實際狀態相同"""
+    player = sim.player
+    return (sim.frame, sim.score, player.x, player.y, player.vel_y, player.shields, sim.rng.getstate())
+
+class Autopilot:
+    """depth: 搜尋層數；hold: 每層動作持續的步數；
+    budget: 每次規劃的時間上限 (秒，None 為不限)，分成 hold 段在每一步各用一段"""
+    def __init__(self, depth=3, hold=6, budget=None, actions=AUTOPILOT_ACTIONS):
+        self.depth = depth
+        self.hold = hold
+        self.budget = budget
+        self.actions = actions
+        self.scratch = []
+        self.scratch_for = None
+        self.plan = []
+        # 進行中的搜尋 (產生器)、其根節點的狀態摘要與目前最深一次完整搜尋的結果
+        self.search = None
+        self.root_key = None
+        self.deadline = float('inf')
+        self.best_action = 0
+        self.reached = 0
+        # 上一次呼叫時的模擬、步數與回傳的動作 (同一步內重複呼叫時沿用)
+        self.last_sim = None
+        self.last_frame = None
+        self.last_action = 0
+        # 統計：規劃次數、評估過的候選未來數、完整搜尋層數的總和
+        self.decisions = 0
+        self.futures = 0
+        self.depth_total = 0
+
+    def __call__(self, sim):
+        # 遊戲每個畫面呼叫一次，畫面更新率高於模擬步數時同一步會被問好幾次：沿用同一個動作
+        elapsed = sim.frame - self.last_frame if sim is self.last_sim else -1
+        if elapsed == 0:
+            return self.last_action
+        # 一個畫面推進了好幾步時，跳過計畫中已經執行過的部分；換了一局或計畫用完才重新規劃
+        if elapsed > 1: del self.plan[max(0, len(self.plan) - (elapsed - 1)):]
+        if elapsed < 0: self.root_key = None
+        if elapsed < 0 or not self.plan:
+            self.plan = [self.decide(sim)] * self.hold
+            if self.budget is not None: self._prepare(sim, self.plan[0])
+        else:
+            # 執行計畫的期間，每步以一小段時間接續下一次規劃的搜尋
+            self._resume(self.budget / self.hold if self.budget is not None else None)
+        self.last_sim = sim
+        self.last_frame = sim.frame
+        self.last_action = self.plan.pop()
+        return self.last_action
+
+    def decide(self, sim):
+        """回傳接下來 hold 步要採取的輸入
+
+        有時間預算時，這次規劃的搜尋在上一段計畫執行期間就已經分段進行
+        (根節點是計畫執行完的狀態，模擬是確定性的，所以與現在的 sim 相同)，
+        這裡只再給一段時間；沒有事先準備的搜尋時 (第一次或換了一局) 就只有這一段，搜得較淺。
+        """
+        if self.root_key is None or self.root_key != _state_key(sim):
+            self._start(sim)
+        self._resume(self.budget / self.hold if self.budget is not None else None)
+        self.root_key = None
+        self.search = None
+        self.decisions += 1
+        self.depth_total += self.reached
+        return self.best_action
+
+    def _scratch_for(self, sim):
+        if self.scratch_for is not sim:
+            # 每層一個暫存模擬，之後只複製狀態不再重建
+            self.scratch = [sim.clone() for _ in range(self.depth + 1)]
+            self.scratch_for = sim
+        return self.scratch[0]
+
+    def _start(self, sim):
+        """以 sim 目前的狀態為根，開始新的搜尋"""
+        self._scratch_for(sim).copy_from(sim)
+        self._begin()
+
+    def _prepare(self, sim, action):
+        """預測 action 持續 hold 步之後的狀態，以它為根開始下一次規劃的搜尋"""
+        root = self._scratch_for(sim)
+        root.copy_from(sim)
+        for _ in range(self.hold):
+            if not root.step(action): break
+        if root.game_over:
+            self.search = None
+            return
+        self._begin()
+        self.root_key = _state_key(root)
+
+    def _begin(self):
+        root = self.scratch[0]
+        self.root_score = root.score
+        self.root_shields = root.player.shields
+        self.best_action = 0
+        self.reached = 0
+        # 有時間預算時採逐層加深，隨時可以採用最深一次完整搜尋的結果
+        depths = range(1, self.depth + 1) if self.budget is not None else (self.depth,)
+        self.search = self._deepen(depths)
+
+    def _resume(self, seconds):
+        """讓搜尋再進行 seconds 秒 (None 為直到完成)"""
+        if self.search is None:
+            return
+        self.deadline = float('inf') if seconds is None else perf_counter() + seconds
+        try:
+            next(self.search)
+        except StopIteration:
+            self.search = None
+
+    def _deepen(self, depths):
+        for depth in depths:
+            _, action = yield from self._search(0, depth)
+            self.best_action = action
+            self.reached = depth
+
+    def _search(self, level, depth):
+        """從 scratch[level] 展開每個動作；回傳 (最佳分數, 對應的第一個動作)
+        時間用完時暫停 (yield)，下次 _resume 從同一處接續"""
+        src = self.scratch[level]
+        dst = self.scratch[level + 1]
+        state = src.rng.getstate()
+        best = (float('-inf'), 0)
+        for action in self.actions:
+            if perf_counter() > self.deadline:
+                yield
+            dst.copy_from(src, state)
+            for _ in range(self.hold):
+                if not dst.step(action): break
+            if dst.game_over or level + 1 == depth:
+                self.futures += 1
+                value = self.evaluate(dst)
+            else:
+                value = (yield from self._search(level + 1, depth))[0]
+            if value > best[0]:
+                best = (value, action)
+        return best
+
+    def evaluate(self, sim):
+        """候選未來的分數：越晚死越好，其次是得分、護盾、道具效果，最後是離最近金幣的距離"""
+        if sim.game_over:
+            return -DEATH_PENALTY + sim.frame
+        player = sim.player
+        value = sim.score - self.root_score
+        value -= (self.root_shields - player.shields) * SHIELD_PENALTY
+        value += (player.invincible_timer + player.fire_timer) * EFFECT_BONUS
+        nearest = None
+        for obj in sim.wave_system.active:
+            if obj.is_active and obj.type == 'coin' and (nearest is None or obj.y > nearest.y):
+                nearest = obj
+        if nearest is not None:
+            value -= abs(nearest.centerx - player.centerx) / SCREEN_WIDTH * COIN_DISTANCE_WEIGHT
+        return value
+
+def main():
+    parser = argparse.ArgumentParser(description='以自動駕駛量測難度曲線')
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--hold', type=int, default=6)
+    parser.add_argument('--budget-ms', type=float, default=None, help='每次規劃的時間上限 (毫秒，分散在 hold 步裡)')
+    parser.add_argument('--max-minutes', type=float, default=10, help='單局上限 (遊戲內分鐘)')
+    parser.add_argument('--magnet', type=int, default=0)
+    parser.add_argument('--shield', type=int, default=0)
+    parser.add_argument('--speed', type=int, default=0)
+    parser.add_argument('--aabb', action='store_true', help='不載入遊戲資源，以矩形判定碰撞')
+    args = parser.parse_args()
+
+    masks = sizes = None
+    if not args.aabb:
+        from replay import load_game_masks
+        masks, sizes = load_game_masks()
+
+    upgrades = {'magnet': args.magnet, 'shield': args.shield, 'speed': args.speed}
+    budget = args.budget_ms / 1000 if args.budget_ms else None
+    speed_div = DEFAULT_RULES['wave_speed_div']
+    max_frames = int(args.max_minutes * 60 * SIM_HZ)
+    print(f"{'seed':>6}{'秒':>8}{'分數':>8}{'落速加成':>8}{'結束':>6}{'候選/決策':>10}{'層數':>6}{'ms/決策':>9}")
+    scores = []
+    for i in range(args.sessions):
+        pilot = Autopilot(args.depth, args.hold, budget)
+        sim = Simulation(seed=args.seed + i, upgrades=upgrades, sizes=sizes, masks=masks)
+        start = perf_counter()
+        sim.run(pilot, max_frames=max_frames)
+        elapsed = perf_counter() - start
+        scores.append(sim.score)
+        per = pilot.futures / max(1, pilot.decisions)
+        depth = pilot.depth_total / max(1, pilot.decisions)
+        ms = elapsed / max(1, pilot.decisions) * 1000
+        print(f"{args.seed + i:>6}{sim.frame / SIM_HZ:>8.1f}{sim.score:>8}{sim.score // speed_div:>8}"
+              f"{'死亡' if sim.game_over else '上限':>6}{per:>10.0f}{depth:>6.1f}{ms:>9.2f}")
+    if scores:
+        print(f"平均分數 {statistics.mean(scores):.0f}，中位數 {statistics.median(scores):.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""太空捕手 - NumPy 批次模擬器
+
+一次推進 N 局遊戲：玩家、6 個落下物件、火焰粒子、計時器與分數都存在
+NumPy 陣列中，每一幀以向量運算完成移動、磁鐵吸引、軌道生成與碰撞。
+規則與 sim_core.Simulation 相同；碰撞以矩形 hitbox 近似遮罩，預設為遊戲圖片遮罩的外框
+(尺寸也取自遊戲圖片)，平均存活步數與 Simulation 相差約 1%。
+"""
+import numpy as np
+
+from sim_core import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, PLAYER_SPEED_BASE, GRAVITY, JUMP_STRENGTH,
+    COIN_SPEED_BASE, NUM_LANES, LANE_WIDTH, INVINCIBLE_STEPS, FIRE_STEPS,
+    FIRE_SIZE_MIN, FIRE_SIZE_MAX, SIM_DT, seconds_to_steps, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, DEFAULT_SIZES,
+    DEFAULT_UPGRADES, DEFAULT_RULES, DEFAULT_WAVES,
+)
+
+# 物件欄位順序與預設波次 (DEFAULT_WAVES) 下的 SimWaveSystem.all_falling_objects 相同
+OBJECT_TYPES = ('coin', 'f_coin', 'f_coin', 'f_coin', 'star', 'flower')
+COIN, STAR, FLOWER = 0, 4, 5
+F_COINS = slice(1, 4)
+CORE = slice(0, 4)
+
+# 每局一列的狀態陣列 (grow 時逐一擴充)
+PER_GAME_ARRAYS = (
+    'player_x', 'player_y', 'vel_y', 'is_jumping', 'shields', 'invincible_timer', 'fire_timer',
+    'obj_x', 'obj_y', 'obj_speed', 'obj_active', 'p_x', 'p_y', 'p_vx', 'p_vy', 'p_size', 'p_life',
+    'score', 'combo', 'max_combo', 'frame', 'game_over',
+)
+
+# 每局的火焰粒子上限 (預設壽命 30 步、每步最多 1 顆，32 已足夠)
+PARTICLE_CAPACITY = 32
+
+def to_px(v):
+    """向量版 sim_core.to_px"""
+    return np.where(v >= 0, np.floor(v + 0.5), -np.floor(-v + 0.5))
+
+def hitbox_from_mask(mask):
+    """由 pygame 遮罩的外框算出 (dx, dy, w, h) hitbox，供近似遮罩碰撞"""
+    rects = mask.get_bounding_rects()
+    if not rects:
+        w, h = mask.get_size()
+        return (0, 0, w, h)
+    box = rects[0].unionall(rects[1:])
+    return (box.x, box.y, box.w, box.h)
+
+_game_hitboxes = None
+
+def game_hitboxes():
+    """遊戲圖片遮罩外框的 (hitboxes, 尺寸)；同一個行程只載入一次，找不到圖片時拋出 FileNotFoundError"""
+    global _game_hitboxes
+    if _game_hitboxes is None:
+        from replay import load_game_masks
+        masks, sizes = load_game_masks(strict=True)
+        _game_hitboxes = ({key: hitbox_from_mask(mask) for key, mask in masks.items() if isinstance(key, str)},
+                          sizes)
+    return _game_hitboxes
+
+def _overlap(ax, ay, aw, ah, bx, by, bw, bh):
+    return (ax < bx + bw) & (bx < ax + aw) & (ay < by + bh) & (by < ay + ah)
+
+class BatchSimulation:
+    """N 局平行的 PLAYING 模擬
+
+    upgrades: 'magnet' / 'shield' / 'speed' 等級，可為純量或長度 N 的陣列。
+    hitboxes: 各物件鍵對應的 (dx, dy, w, h)；省略時使用遊戲圖片遮罩的外框與圖片尺寸 (sizes 可再覆寫)，
+              缺少的鍵為整個圖片矩形。
+    aabb: 為 True 時不載入遊戲圖片，以預設尺寸的整個矩形判定 (與遊戲不同)。
+    rules: 覆寫 DEFAULT_RULES 中的難度曲線參數 (波次固定為 DEFAULT_WAVES)。
+    """
+    def __init__(self, n, seed=None, character_key='player', upgrades=None, sizes=None,
+                 hitboxes=None, particle_capacity=PARTICLE_CAPACITY, rules=None, aabb=False):
+        self.n = n
+        self.rng = np.random.default_rng(seed)
+        self.character_key = character_key
+        self.sizes = dict(DEFAULT_SIZES)
+        if hitboxes is None and not aabb:
+            hitboxes, game_sizes = game_hitboxes()
+            self.sizes.update(game_sizes)
+        if sizes: self.sizes.update(sizes)
+        levels = dict(DEFAULT_UPGRADES)
+        if upgrades: levels.update(upgrades)
+        self.upgrades = {k: np.broadcast_to(np.asarray(v), (n,)).copy() for k, v in levels.items()}
+        self.rules = dict(DEFAULT_RULES)
+        if rules: self.rules.update(rules)
+        if self.rules['waves'] != DEFAULT_WAVES:
+            raise ValueError('批次模擬只支援預設波次 (DEFAULT_WAVES)')
+        hitboxes = hitboxes or {}
+
+        pw, ph = self.sizes[character_key]
+        self.player_w, self.player_h = pw, ph
+        self.player_box = hitboxes.get(character_key, (0, 0, pw, ph))
+        self.obj_w = np.array([self.sizes[t][0] for t in OBJECT_TYPES], dtype=np.float64)
+        self.obj_h = np.array([self.sizes[t][1] for t in OBJECT_TYPES], dtype=np.float64)
+        boxes = np.array([hitboxes.get(t, (0, 0) + self.sizes[t]) for t in OBJECT_TYPES], dtype=np.float64)
+        self.obj_box = boxes.T  # (4, 6): dx, dy, w, h
+        self.capacity = particle_capacity
+        self.ground_y = SCREEN_HEIGHT - ph - 20
+        self.reset()
+
+    def reset(self, mask=None):
+        """重置全部 (或 mask 為 True 的) 局"""
+        n, cap = self.n, self.capacity
+        if mask is None:
+            self.player_x = np.full(n, SCREEN_WIDTH // 2 - self.player_w // 2, dtype=np.float64)
+            self.player_y = np.full(n, self.ground_y, dtype=np.float64)
+            self.vel_y = np.zeros(n)
+            self.is_jumping = np.zeros(n, dtype=bool)
+            self.shields = self.upgrades['shield'].astype(np.int64)
+            self.invincible_timer = np.zeros(n, dtype=np.int64)
+            self.fire_timer = np.zeros(n, dtype=np.int64)
+            self.obj_x = np.zeros((n, 6))
+            self.obj_y = np.zeros((n, 6))
+            self.obj_speed = np.full((n, 6), float(COIN_SPEED_BASE))
+            self.obj_active = np.zeros((n, 6), dtype=bool)
+            self.p_x = np.zeros((n, cap))
+            self.p_y = np.zeros((n, cap))
+            self.p_vx = np.zeros((n, cap))
+            self.p_vy = np.zeros((n, cap))
+            self.p_size = np.zeros((n, cap))
+            self.p_life = np.zeros((n, cap), dtype=np.int64)
+            self.score = np.zeros(n, dtype=np.int64)
+            self.combo = np.zeros(n, dtype=np.int64)
+            self.max_combo = np.zeros(n, dtype=np.int64)
+            self.frame = np.zeros(n, dtype=np.int64)
+            self.game_over = np.zeros(n, dtype=bool)
+            return
+        self.player_x[mask] = SCREEN_WIDTH // 2 - self.player_w // 2
+        self.player_y[mask] = self.ground_y
+        self.vel_y[mask] = 0
+        self.is_jumping[mask] = False
+        self.shields[mask] = self.upgrades['shield'][mask]
+        for arr in (self.invincible_timer, self.fire_timer, self.p_life, self.score,
+                    self.combo, self.max_combo, self.frame):
+            arr[mask] = 0
+        self.obj_active[mask] = False
+        self.game_over[mask] = False
+
+    def grow(self, n):
+        """擴充到 n 局：原有的局不受影響，新增的局為預設升級等級的新局"""
+        old = self.n
+        if n <= old:
+            return
+        for name in PER_GAME_ARRAYS:
+            arr = getattr(self, name)
+            grown = np.zeros((n,) + arr.shape[1:], dtype=arr.dtype)
+            grown[:old] = arr
+            setattr(self, name, grown)
+        for key, levels in self.upgrades.items():
+            grown = np.full(n, DEFAULT_UPGRADES.get(key, 0), dtype=levels.dtype)
+            grown[:old] = levels
+            self.upgrades[key] = grown
+        self.n = n
+        added = np.zeros(n, dtype=bool)
+        added[old:] = True
+        self.reset(added)
+
+    # --- 各階段 ---
+
+    def _update_players(self, alive, inputs):
+        speed = PLAYER_SPEED_BASE + self.upgrades['speed'] * 1.5 + (self.score // self.rules['player_speed_div'])
+        left = alive & ((inputs & INPUT_LEFT) != 0)
+        right = alive & ((inputs & INPUT_RIGHT) != 0)
+        x = self.player_x
+        x[:] = np.where(left, to_px(x - speed), x)
+        x[:] = np.where(right, to_px(x + speed), x)
+        jump = alive & ((inputs & INPUT_JUMP) != 0) & ~self.is_jumping
+        self.vel_y[jump] = JUMP_STRENGTH
+        self.is_jumping |= jump
+
+        vy = np.where(alive, self.vel_y + GRAVITY, self.vel_y)
+        y = np.where(alive, to_px(self.player_y + vy), self.player_y)
+        landed = y >= self.ground_y
+        self.player_y[:] = np.where(landed, self.ground_y, y)
+        self.vel_y[:] = np.where(landed, 0, vy)
+        self.is_jumping &= ~landed
+        np.clip(x, 0, SCREEN_WIDTH - self.player_w, out=x)
+
+        tick = alive.astype(np.int64)
+        self.invincible_timer -= tick * (self.invincible_timer > 0)
+        self.fire_timer -= tick * (self.fire_timer > 0)
+
+    def _spawn_waves(self, alive):
+        need = alive & ~self.obj_active[:, CORE].any(axis=1)
+        idx = np.flatnonzero(need)
+        if idx.size == 0:
+            return
+        m = idx.size
+        rng = self.rng
+        lanes = np.argsort(rng.random((m, NUM_LANES)), axis=1)
+        speed = COIN_SPEED_BASE + self.score[idx] // self.rules['wave_speed_div']
+        y_off = rng.integers(0, 401, size=(m, 4))
+        w, h = self.obj_w[CORE], self.obj_h[CORE]
+        self.obj_x[idx, CORE] = lanes[:, :4] * LANE_WIDTH + LANE_WIDTH // 2 - w // 2
+        self.obj_y[idx, CORE] = -h - y_off
+        self.obj_speed[idx, CORE] = speed[:, None]
+        self.obj_active[idx, CORE] = True
+
+        # 只有在玩家沒有任何特殊效果時，才允許生成新道具
+        calm = (self.invincible_timer[idx] <= 0) & (self.fire_timer[idx] <= 0)
+        roll = rng.random(m) < 0.10
+        pick = np.where(rng.random(m) < 0.5, STAR, FLOWER)
+        sel = np.flatnonzero(calm & roll)
+        if sel.size == 0:
+            return
+        games, props = idx[sel], pick[sel]
+        k = sel.size
+        # 10 個候選位置同時檢查，取第一個不與本波金幣重疊的
+        cand_lane = rng.integers(0, NUM_LANES, size=(k, 10))
+        cand_off = rng.integers(0, 401, size=(k, 10))
+        prop_h = self.obj_h[props]
+        cand_y = -prop_h[:, None] - cand_off
+        occ_lane = lanes[sel, :4]
+        occ_y = self.obj_y[games, CORE]
+        conflict = ((cand_lane[:, :, None] == occ_lane[:, None, :]) &
+                    (np.abs(occ_y[:, None, :] - cand_y[:, :, None]) < 150)).any(axis=2)
+        ok = ~conflict
+        has = ok.any(axis=1)
+        first = ok.argmax(axis=1)
+        games, props = games[has], props[has]
+        rows = np.flatnonzero(has)
+        lane = cand_lane[rows, first[has]]
+        self.obj_x[games, props] = lane * LANE_WIDTH + LANE_WIDTH // 2 - self.obj_w[props] // 2
+        self.obj_y[games, props] = cand_y[rows, first[has]]
+        self.obj_speed[games, props] = speed[sel][has]
+        self.obj_active[games, props] = True
+
+    def _move_objects(self, alive):
+        moving = self.obj_active & alive[:, None]
+        magnet = self.upgrades['magnet']
+        coin = moving[:, COIN] & (magnet > 0)
+        if coin.any():
+            pcx = self.player_x + self.player_w // 2
+            pcy = self.player_y + self.player_h // 2
+            cx = self.obj_x[:, COIN] + self.obj_w[COIN] // 2
+            cy = self.obj_y[:, COIN] + self.obj_h[COIN] // 2
+            dx, dy = pcx - cx, pcy - cy
+            dist = np.hypot(dx, dy)
+            pull = coin & (dist < 100 + magnet * 100) & (dist > 5)
+            safe = np.where(pull, dist, 1.0)
+            self.obj_x[:, COIN] = np.where(pull, to_px(self.obj_x[:, COIN] + dx / safe * 8), self.obj_x[:, COIN])
+            self.obj_y[:, COIN] = np.where(pull, to_px(self.obj_y[:, COIN] + dy / safe * 4), self.obj_y[:, COIN])
+
+        self.obj_y += self.obj_speed * moving
+        gone = moving & (self.obj_y > SCREEN_HEIGHT)
+        self.obj_active &= ~gone
+        missed = gone[:, COIN]
+        self.score[missed] = np.maximum(0, self.score[missed] - 5)
+        self.combo[missed] = 0
+
+    def _update_particles(self, alive):
+        rng = self.rng
+        # 每局每步最多發射一顆 (每步期望值大於 1 時視為 1)
+        emit = alive & (self.fire_timer > 0) & (rng.random(self.n) < self.rules['fire_emit_rate'] * SIM_DT)
+        free = self.p_life <= 0
+        emit &= free.any(axis=1)
+        idx = np.flatnonzero(emit)
+        if idx.size:
+            slot = free[idx].argmax(axis=1)
+            size = rng.integers(FIRE_SIZE_MIN, FIRE_SIZE_MAX + 1, size=idx.size)
+            self.p_size[idx, slot] = size
+            self.p_x[idx, slot] = self.player_x[idx] + self.player_w // 2 - size // 2
+            self.p_y[idx, slot] = self.player_y[idx] - size // 2
+            self.p_vy[idx, slot] = rng.uniform(-15, -8, size=idx.size)
+            self.p_vx[idx, slot] = rng.uniform(-2, 2, size=idx.size)
+            self.p_life[idx, slot] = seconds_to_steps(self.rules['fire_particle_lifetime'])
+
+        # 只處理存活粒子的扁平索引，成本與粒子數成正比而非容量
+        flat = np.flatnonzero((self.p_life > 0) & alive[:, None])
+        if flat.size == 0:
+            return
+        p_x, p_y, p_life = self.p_x.reshape(-1), self.p_y.reshape(-1), self.p_life.reshape(-1)
+        px = to_px(p_x[flat] + self.p_vx.reshape(-1)[flat])
+        py = to_px(p_y[flat] + self.p_vy.reshape(-1)[flat])
+        life = p_life[flat] - 1
+        p_x[flat] = px
+        p_y[flat] = py
+        p_life[flat] = life
+        keep = life > 0
+        flat, px, py = flat[keep], px[keep], py[keep]
+        r = flat // self.capacity
+        ps = self.p_size.reshape(-1)[flat]
+
+        # 粒子 (K, 1) 對同一局的金幣與假金幣 (K, 4)
+        dx, dy, bw, bh = self.obj_box[:, CORE]
+        ps = ps[:, None]
+        ox = np.take(self.obj_x[:, CORE] + dx, r, axis=0)
+        oy = np.take(self.obj_y[:, CORE] + dy, r, axis=0)
+        hits = _overlap(px[:, None], py[:, None], ps, ps, ox, oy, bw, bh)
+        hits &= np.take(self.obj_active[:, CORE], r, axis=0)
+
+        # 火焰清理假金幣 (100% 擊毀機率)，清理有額外獎勵
+        burned = np.zeros((self.n, 3), dtype=bool)
+        for j in range(3):
+            burned[r[hits[:, j + 1]], j] = True
+        self.obj_active[:, F_COINS] &= ~burned
+        self.score += 2 * burned.sum(axis=1)
+        # 火焰擊中真金幣：每顆粒子 10% 誤傷機率
+        k = np.bincount(r[hits[:, COIN]], minlength=self.n)
+        lost = (k > 0) & (rng.random(self.n) < 1 - 0.9 ** k)
+        self.obj_active[:, COIN] &= ~lost
+
+    def _player_collisions(self, alive):
+        dx, dy, bw, bh = self.obj_box
+        pdx, pdy, pw, ph = self.player_box
+        hits = _overlap((self.player_x + pdx)[:, None], (self.player_y + pdy)[:, None], pw, ph,
+                        self.obj_x + dx, self.obj_y + dy, bw, bh)
+        hits &= self.obj_active & alive[:, None]
+
+        got = hits[:, COIN]
+        self.combo += got
+        np.maximum(self.max_combo, self.combo, out=self.max_combo)
+        bonus = np.minimum(self.combo // 5, 5)
+        self.score += got * 10 * (1 + bonus)
+
+        self.invincible_timer[hits[:, STAR]] = INVINCIBLE_STEPS
+        self.fire_timer[hits[:, FLOWER]] = FIRE_STEPS
+        self.obj_active[:, COIN] &= ~got
+        self.obj_active[:, STAR] &= ~hits[:, STAR]
+        self.obj_active[:, FLOWER] &= ~hits[:, FLOWER]
+
+        # 假金幣依序處理：無敵直接撞毀，否則消耗護盾，護盾用完即結束
+        for j in range(1, 4):
+            hit = hits[:, j] & ~self.game_over
+            inv = hit & (self.invincible_timer > 0)
+            shield = hit & ~inv & (self.shields > 0)
+            dead = hit & ~inv & ~shield
+            self.shields -= shield
+            self.obj_active[:, j] &= ~(inv | shield)
+            self.game_over |= dead
+
+    def step(self, inputs=0, active=None):
+        """推進一幀；inputs 為純量或長度 N 的輸入位元陣列，active 為 None 或只推進其中為 True 的局。
+        回傳仍在進行中的 mask"""
+        inputs = np.broadcast_to(np.asarray(inputs, dtype=np.int64), (self.n,))
+        alive = ~self.game_over
+        if active is not None: alive &= active
+        self.frame += alive
+        self._update_players(alive, inputs)
+        self._spawn_waves(alive)
+        self._move_objects(alive)
+        self._update_particles(alive)
+        self._player_collisions(alive)
+        return ~self.game_over
+
+    def run(self, policy, max_frames):
+        """以 policy(batch) -> 輸入陣列 推進，直到全部結束或達到 max_frames"""
+        for _ in range(max_frames):
+            if self.game_over.all():
+                break
+            self.step(policy(self))
+        return self
@@ -0,0 +1,273 @@
+"""太空捕手 - 效能基準測試
+
+以 SDL 的 dummy 視訊驅動 (不開視窗) 執行真正的 SpaceCatcherGame，
+每個情境固定種子、固定每幀推進一步模擬，跑固定幀數後回報：
+    fps         每秒畫面數 (計時數輪取最快的一輪，不含 tracemalloc)
+    p99_ms      第 99 百分位的單幀耗時
+    alloc_kib   每幀暫時配置的 Python 記憶體 (幀內尖峰減去幀開始時，平均)
+    net_blocks  每幀淨增加的記憶體區塊數 (持續為正代表有東西沒被釋放)
+    peak_kib    整段期間 Python 記憶體的最高用量 (相對於情境開始)
+記憶體數字另跑一輪並開啟 tracemalloc 量測，不影響計時；SDL 內部配置的像素記憶體不在其中。
+
+與儲存的基準比較，任一情境變慢或多用記憶體超過容許比例即回傳非零結束碼：
+
+    python benchmark.py --save-baseline          # 在目前的程式碼上建立基準
+    python benchmark.py                          # 之後每次修改後比較
+"""
+import argparse
+import copy
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import 嘉桐gemini as game_module
+from sim_core import SIM_DT, INVINCIBLE_STEPS, FIRE_STEPS, FIRE_POOL_CAPACITY, seconds_to_steps
+from sweep import chase_bot
+
+DEFAULT_BASELINE = 'bench_baseline.json'
+
+# --- 情境 ---
+# 每個情境：(設定函式, 每幀前維持條件的函式)；設定函式負責切到對應的畫面狀態
+
+def setup_menu(game):
+    game.state = "MENU"
+
+def setup_shop(game):
+    game_module.total_tokens = 1000
+    game.state = "SHOP"
+
+def start_playing(game):
+    game.selected_char = 'player'
+    game.init_playing_session()
+    game.input_source = chase_bot
+    game.state = "PLAYING"
+
+def setup_magnet(game):
+    magnet = game_module.shop_items['magnet']
+    magnet['level'] = magnet['max']
+    start_playing(game)
+
+def setup_fire(game):
+    start_playing(game)
+    # 發射率調到剛好填滿粒子池
+    life = seconds_to_steps(game.sim.rules['fire_particle_lifetime'])
+    game.sim.rules['fire_emit_rate'] = FIRE_POOL_CAPACITY / (life * SIM_DT)
+
+def keep_playing(game):
+    """機器人失手時直接開新的一局，維持在遊戲畫面"""
+    if game.game_over:
+        rules = game.sim.rules
+        game.init_playing_session()
+        game.sim.rules = rules
+
+def keep_fire(game):
+    keep_playing(game)
+    game.sim.player.fire_timer = FIRE_STEPS
+
+def keep_invincible(game):
+    keep_playing(game)
+    game.sim.player.invincible_timer = INVINCIBLE_STEPS
+
+SCENARIOS = {
+    'menu': (setup_menu, None),
+    'shop': (setup_shop, None),
+    'playing': (start_playing, keep_playing),
+    'magnet_max': (setup_magnet, keep_playing),
+    'fire_full': (setup_fire, keep_fire),
+    'invincible': (start_playing, keep_invincible),
+}
+
+# --- 量測 ---
+
+def prepare(game, name, seed, shop_snapshot):
+    """還原全域狀態並以固定種子設定情境"""
+    setup, hold = SCENARIOS[name]
+    random.seed(seed)
+    game_module.total_tokens = 0
+    game_module.shop_items.clear()
+    game_module.shop_items.update(copy.deepcopy(shop_snapshot))
+    game.reset_game_state()
+    game.input_source = None
+    game.frame_dt = SIM_DT
+    game.renderer.invalidate()
+    setup(game)
+    return hold
+
+def run_frames(game, hold, frames):
+    for _ in range(frames):
+        if hold: hold(game)
+        game.run_frame()
+
+def time_scenario(game, name, seed, frames, warmup, shop_snapshot, repeat=3):
+    """跑 repeat 輪 (每輪都從同一個種子開始)，取最快的一輪以壓低背景雜訊"""
+    best = None
+    for _ in range(repeat):
+        hold = prepare(game, name, seed, shop_snapshot)
+        run_frames(game, hold, warmup)
+        times = []
+        for _ in range(frames):
+            start = perf_counter()
+            if hold: hold(game)
+            game.run_frame()
+            times.append(perf_counter() - start)
+        total = sum(times)
+        if best is None or total < best[0]:
+            best = (total, sorted(times))
+    total, times = best
+    return {
+        'fps': frames / total if total > 0 else 0.0,
+        'p99_ms': times[min(len(times) - 1, int(len(times) * 0.99))] * 1000,
+    }
+
+def memory_scenario(game, name, seed, frames, warmup, shop_snapshot):
+    hold = prepare(game, name, seed, shop_snapshot)
+    run_frames(game, hold, warmup)
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    peak = 0
+    transient = 0
+    blocks_start = sys.getallocatedblocks()
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        if hold: hold(game)
+        game.run_frame()
+        current, frame_peak = tracemalloc.get_traced_memory()
+        transient += frame_peak - before
+        peak = max(peak, frame_peak - base)
+    blocks = sys.getallocatedblocks() - blocks_start
+    tracemalloc.stop()
+    return {
+        'alloc_kib': transient / frames / 1024,
+        'net_blocks': blocks / frames,
+        'peak_kib': peak / 1024,
+    }
+
+def run_benchmarks(names, frames=600, warmup=60, seed=1234, repeat=3):
+    # 遙測照常開啟 (寫到暫存資料夾)，事件紀錄的成本也算在內
+    with tempfile.TemporaryDirectory() as telemetry_dir:
+        game = game_module.SpaceCatcherGame(max_fps=0, record_replays=False, save_path=None,
+                                            telemetry_dir=telemetry_dir)
+        shop_snapshot = copy.deepcopy(game_module.shop_items)
+        results = {}
+        for name in names:
+            row = time_scenario(game, name, seed, frames, warmup, shop_snapshot, repeat)
+            row.update(memory_scenario(game, name, seed, frames, warmup, shop_snapshot))
+            results[name] = row
+        game.telemetry.close()
+    game_module.shop_items.clear()
+    game_module.shop_items.update(shop_snapshot)
+    return results
+
+# --- 基準比較 ---
+
+# 指標 -> 數值越大越好 (True) 或越小越好 (False)
+METRICS = {'fps': True, 'p99_ms': False, 'alloc_kib': False, 'net_blocks': False, 'peak_kib': False}
+# 記憶體指標數值很小時的絕對容許量，避免 0.1 KiB 的雜訊被判為回歸
+ABS_SLACK = {'alloc_kib': 4.0, 'net_blocks': 1.0, 'peak_kib': 64.0, 'p99_ms': 0.5, 'fps': 0.0}
+
+def compare(results, baseline, tolerance):
+    """回傳回歸列表 [(情境, 指標, 基準值, 目前值)]"""
+    regressions = []
+    for name, row in results.items():
+        base_row = baseline.get(name)
+        if base_row is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in base_row:
+                continue
+            old, new = base_row[metric], row[metric]
+            if higher_is_better:
+                bad = new < old * (1 - tolerance) - ABS_SLACK[metric]
+            else:
+                bad = new > old * (1 + tolerance) + ABS_SLACK[metric]
+            if bad:
+                regressions.append((name, metric, old, new))
+    return regressions
+
+def print_table(results, baseline):
+    print(f"{'scenario':<12}" + ''.join(f'{m:>14}' for m in METRICS))
+    for name, row in results.items():
+        cells = []
+        base_row = baseline.get(name, {}) if baseline else {}
+        for metric in METRICS:
+            cell = f'{row[metric]:.1f}'
+            if metric in base_row and base_row[metric]:
+                cell += f' ({(row[metric] / base_row[metric] - 1) * 100:+.0f}%)'
+            cells.append(f'{cell:>14}')
+        print(f'{name:<12}' + ''.join(cells))
+
+def main():
+    parser = argparse.ArgumentParser(description='太空捕手效能基準測試')
+    parser.add_argument('scenarios', nargs='*', help=f'要跑的情境 (預設全部：{", ".join(SCENARIOS)})')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--warmup', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--repeat', type=int, default=3, help='計時輪數 (取最快的一輪)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基準檔 (JSON)')
+    parser.add_argument('--save-baseline', action='store_true', help='把這次結果寫成基準')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='容許的變差比例')
+    parser.add_argument('--out', help='另存這次結果 (JSON)')
+    args = parser.parse_args()
+
+    names = args.scenarios or list(SCENARIOS)
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f'未知的情境: {", ".join(unknown)}')
+
+    results = run_benchmarks(names, args.frames, args.warmup, args.seed, args.repeat)
+    meta = {'frames': args.frames, 'warmup': args.warmup, 'seed': args.seed,
+            'python': platform.python_version(), 'pygame': pygame.version.ver,
+            'machine': platform.node()}
+    report = {'meta': meta, 'results': results}
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as fp:
+            json.dump(report, fp, indent=2)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as fp:
+            stored = json.load(fp)
+        baseline = stored['results']
+        base_meta = stored.get('meta', {})
+        if any(base_meta.get(k) != meta[k] for k in ('frames', 'seed', 'machine')):
+            print(f"注意：基準的設定或機器不同 ({base_meta})，比較結果僅供參考")
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding='utf-8') as fp:
+                stored = json.load(fp)
+            stored['results'].update(results)
+            stored['meta'] = meta
+            report = stored
+        with open(args.baseline, 'w', encoding='utf-8') as fp:
+            json.dump(report, fp, indent=2)
+        print(f"基準已寫入 {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"找不到基準 {args.baseline}；先以 --save-baseline 建立")
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"\n效能回歸 (容許 {args.tolerance:.0%})：")
+        for name, metric, old, new in regressions:
+            print(f"  {name}.{metric}: {old:.2f} -> {new:.2f}")
+        return 1
+    print("\n沒有超過容許範圍的回歸")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
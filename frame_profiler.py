@@ -0,0 +1,128 @@
+"""太空捕手 - 每幀分段計時 (與啟動階段計時)
+
+遊戲迴圈與模擬核心在各階段結束時呼叫 mark(階段)，把距離上一次 mark 的時間
+累加到該階段；end_frame() 時整幀的結果寫入環狀緩衝區 (保留最近 capacity 幀)。
+未啟用時呼叫端持有的是 None，只多一次真假判斷。
+
+統計可匯出成 CSV 或 Chrome trace JSON (chrome://tracing、Perfetto 可開啟)。
+"""
+import csv
+import json
+from array import array
+from time import perf_counter
+
+# 一幀內的階段 (依執行順序)；wait 為管線模式等待模擬執行緒的時間
+PHASES = ('wait', 'input', 'player', 'waves', 'fire', 'collide', 'background', 'sprites', 'hud',
+          'menu', 'present')
+
+class FrameProfiler:
+    def __init__(self, capacity=600, phases=PHASES):
+        self.capacity = capacity
+        self.phases = phases
+        self.index = {name: i for i, name in enumerate(phases)}
+        # samples[i][frame] 為第 i 個階段在該幀累計的秒數
+        self.samples = [array('d', bytes(8 * capacity)) for _ in phases]
+        self.starts = array('d', bytes(8 * capacity))
+        self.current = [0.0] * len(phases)
+        self.count = 0
+        # 累計的幀數 (count 到 capacity 就不再增加，這個會一直增加)
+        self.frames_total = 0
+        self.cursor = 0
+        self.frame_start = self.last = perf_counter()
+
+    def begin_frame(self):
+        self.frame_start = self.last = perf_counter()
+        current = self.current
+        for i in range(len(current)):
+            current[i] = 0.0
+
+    def mark(self, phase):
+        now = perf_counter()
+        self.current[self.index[phase]] += now - self.last
+        self.last = now
+
+    def end_frame(self):
+        c = self.cursor
+        for i, value in enumerate(self.current):
+            self.samples[i][c] = value
+        self.starts[c] = self.frame_start
+        self.cursor = (c + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.frames_total += 1
+
+    def _ordered(self, column):
+        """依時間順序取出環狀緩衝區中的有效資料"""
+        if self.count < self.capacity:
+            return list(column[:self.count])
+        return list(column[self.cursor:]) + list(column[:self.cursor])
+
+    def percentiles(self, phase, qs=(50, 99)):
+        """回傳該階段的各百分位數 (毫秒)"""
+        values = sorted(self._ordered(self.samples[self.index[phase]]))
+        if not values:
+            return [0.0 for _ in qs]
+        last = len(values) - 1
+        return [values[min(last, int(round(q / 100 * last)))] * 1000 for q in qs]
+
+    def summary(self):
+        """[(階段, p50 毫秒, p99 毫秒)]，略過整段期間都沒有耗時的階段"""
+        rows = []
+        for phase in self.phases:
+            p50, p99 = self.percentiles(phase)
+            if p99 > 0:
+                rows.append((phase, p50, p99))
+        return rows
+
+    def export_csv(self, path):
+        columns = [self._ordered(col) for col in self.samples]
+        with open(path, 'w', newline='', encoding='utf-8') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(['frame'] + [f'{p}_ms' for p in self.phases] + ['total_ms'])
+            for n in range(self.count):
+                row = [col[n] * 1000 for col in columns]
+                writer.writerow([n] + [f'{v:.4f}' for v in row] + [f'{sum(row):.4f}'])
+
+    def export_chrome_trace(self, path):
+        """每幀一個 frame 事件，各階段依序排在其中 (同一階段在幀內的多段時間合併為一段)"""
+        starts = self._ordered(self.starts)
+        columns = [self._ordered(col) for col in self.samples]
+        events = []
+        origin = starts[0] if starts else 0.0
+        for n, start in enumerate(starts):
+            ts = (start - origin) * 1e6
+            total = sum(col[n] for col in columns) * 1e6
+            events.append({'name': 'frame', 'ph': 'X', 'ts': ts, 'dur': total, 'pid': 0, 'tid': 0})
+            for phase, col in zip(self.phases, columns):
+                dur = col[n] * 1e6
+                if dur > 0:
+                    events.append({'name': phase, 'ph': 'X', 'ts': ts, 'dur': dur, 'pid': 0, 'tid': 1})
+                    ts += dur
+        with open(path, 'w', encoding='utf-8') as fp:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fp)
+
+    def export(self, path):
+        """依副檔名匯出：.csv 為 CSV，其他為 Chrome trace JSON"""
+        if path.lower().endswith('.csv'):
+            self.export_csv(path)
+        else:
+            self.export_chrome_trace(path)
+
+class StartupTimer:
+    """啟動各階段的耗時：每個階段結束時 mark(名稱)，記錄距離上一次 mark 的時間"""
+    def __init__(self, start=None):
+        self.start = self.last = perf_counter() if start is None else start
+        self.marks = []
+
+    def mark(self, name):
+        now = perf_counter()
+        self.marks.append((name, now - self.last))
+        self.last = now
+
+    @property
+    def total(self):
+        return self.last - self.start
+
+    def report(self):
+        lines = [f"{name:<14}{seconds * 1000:8.1f} ms" for name, seconds in self.marks]
+        lines.append(f"{'total':<14}{self.total * 1000:8.1f} ms")
+        return '\n'.join(lines)
@@ -0,0 +1,655 @@
+"""太空捕手 - 多局遊戲伺服器 (asyncio)
+
+一個行程同時執行許多局 PLAYING 模擬 (預設的規則與遊戲、重播完全相同)，用於比賽、伺服器端驗證分數與機器人對戰。
+
+    python game_server.py --port 8765 --replays server_replays/   # 啟動伺服器 (每局錄成重播檔)
+    python game_server.py --batch 4096                             # 批次模式，每種角色最多 4096 局
+    python game_server.py --clients 2000 --seconds 30              # 另開行程：2000 個本機測試客戶端
+    python game_server.py --batch 4096 --bench 3000                # 不經網路量測 3000 局的 tick 處理時間
+
+通訊協定 (本機 TCP)：
+    客戶端先送一行 JSON：{"seed": 種子 (省略時隨機), "character": "player", "upgrades": {"shield": 1, ...}}
+    伺服器回一行 JSON：{"session": 編號, "seed": 種子, "hz": 60, "collision": 碰撞判定}；
+    參數不合法時回 {"error": 訊息} 並關閉，
+    連線後 HANDSHAKE_TIMEOUT 秒內沒有送完握手也一樣；
+    之後客戶端每一步送 1 byte 的輸入位元 (左 1、右 2、跳 4)，可以一次送多步；
+    伺服器把客戶端送來的輸入都推進完時回傳一筆 STATE (步數、分數、連擊、護盾、旗標)：
+    逐步送輸入的客戶端每步收到一筆，一次送 6 步的客戶端每 6 步收到一筆 (每筆都是一次系統呼叫)，
+    遊戲結束的那一筆旗標含 FLAG_GAME_OVER，之後關閉連線。
+
+排程：單一計時工作每 1/SIM_HZ 秒醒來一次，依經過的時間替每局累加應推進的步數 (每局各自的固定步長)，
+在同一個迴圈裡批次推進所有的局，不為每局建立協程或計時器。
+一局只在收到該步的輸入後才推進，因此結果與以相同輸入重播完全一致 (可用 replay.py 驗證)。
+伺服器本身忙不過來時，每個 tick 計入的時間有上限，所有的局一起變慢而不是被判定落後。
+
+兩種推進方式：
+    預設：每局一個 sim_core.Simulation，逐局逐步推進；每步約 20 µs，一個核心約可撐 700~900 局。
+    --batch N：同一角色的局共用一個 batch_sim.BatchSimulation (最多 N 個 slot)，每個 tick 以向量運算
+        一次推進所有的局，每局只剩收發輸入與狀態的 Python 成本 (每步約 3~4 µs)，一個核心約可撐 4000 局。
+        代價是規則雖然相同，碰撞以矩形 hitbox 近似遮罩、所有的局共用一個亂數來源 (握手的 seed 不生效，
+        回覆的 seed 為 null)，結果無法以重播重現，因此不能與 --replays 同時使用。
+
+碰撞判定預設載入遊戲圖片建立的遮罩，與客戶端完全相同 (找不到圖片時直接報錯)；--aabb 明確改用預設尺寸的
+整張圖矩形 (局的長度差一個數量級，只適合測試)。回覆與每筆指標的 "collision" 標明實際的判定：
+mask (與遊戲相同)、hitbox (批次模式，遮罩外框的近似，分數不可作為驗證)、aabb。
+
+背壓：
+    輸入緩衝超過 INPUT_WINDOW 步時暫停讀取該連線 (客戶端送太快)，消化到一半後恢復；
+    傳送緩衝滿 (客戶端沒有讀取) 時暫停推進該局；
+    應推進而未推進的步數超過 MAX_LAG 秒 (輸入太慢或不讀取) 的局中斷連線。
+
+指標：每個 tick 記錄延遲 (實際醒來比預定晚多少)、處理時間、推進步數與局數，
+每 METRICS_INTERVAL 秒印出每秒步數與 p50 / p99 毫秒數，--metrics 檔案 另存 JSON Lines。
+"""
+import argparse
+import asyncio
+import heapq
+import json
+import random
+import struct
+import sys
+from array import array
+from time import perf_counter
+
+from sim_core import (
+    SIM_HZ, SIM_DT, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, SHOP_DEFAULTS, DEFAULT_UPGRADES, Simulation,
+)
+
+# 伺服器回傳的狀態：步數、分數、連擊、護盾、旗標
+STATE = struct.Struct('<IiHBB')
+# 批次模式一次打包所有 slot 的狀態 (與 STATE 的排列相同)
+STATE_FIELDS = [('frame', '<u4'), ('score', '<i4'), ('combo', '<u2'), ('shields', 'u1'), ('flags', 'u1')]
+FLAG_GAME_OVER = 1
+
+INPUT_MASK = INPUT_LEFT | INPUT_RIGHT | INPUT_JUMP
+CHARACTERS = ('player', 'player_2')
+HANDSHAKE_LIMIT = 4096
+# 連線後必須在幾秒內送完握手
+HANDSHAKE_TIMEOUT = 5.0
+# 輸入緩衝上限 (步)；每個 tick 每局最多推進的步數 (追趕短暫的延遲)；落後多少秒中斷連線
+INPUT_WINDOW = 2 * SIM_HZ
+MAX_CATCHUP_STEPS = 5
+MAX_LAG = 3.0
+# 批次模式每種角色一開始的 slot 數
+BATCH_INITIAL = 64
+METRICS_INTERVAL = 5.0
+METRICS_CAPACITY = 1024
+
+class Session(asyncio.Protocol):
+    """一條連線就是一局；握手之後收到的每個 byte 是一步的輸入"""
+    def __init__(self, server):
+        self.server = server
+        self.transport = None
+        self.id = 0
+        self.sim = None
+        self.recorder = None
+        # 批次模式：所屬的 BatchPool 與 slot
+        self.pool = None
+        self.slot = 0
+        self.timer = None
+        self.handshake = bytearray()
+        self.inputs = bytearray()
+        # 依經過時間應推進、但還沒推進的步數
+        self.owed = 0.0
+        self.reading = True
+        self.writable = True
+        self.finished = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.timer = asyncio.get_running_loop().call_later(HANDSHAKE_TIMEOUT, self.reject, '握手逾時')
+
+    def data_received(self, data):
+        if self.finished:
+            return
+        if self.handshake is not None:
+            self.handshake += data
+            end = self.handshake.find(b'\n')
+            if end < 0:
+                if len(self.handshake) > HANDSHAKE_LIMIT: self.reject('握手太長')
+                return
+            line, data = bytes(self.handshake[:end]), bytes(self.handshake[end + 1:])
+            self.handshake = None
+            self.timer.cancel()
+            try:
+                hello = json.loads(line or b'{}')
+            except ValueError:
+                return self.reject('握手不是 JSON')
+            error = self.server.open_session(self, hello)
+            if error:
+                return self.reject(error)
+        self.inputs += data
+        if self.reading and len(self.inputs) > INPUT_WINDOW:
+            self.reading = False
+            self.transport.pause_reading()
+
+    def pause_writing(self):
+        self.writable = False
+
+    def resume_writing(self):
+        self.writable = True
+
+    def connection_lost(self, exc):
+        if self.timer: self.timer.cancel()
+        self.server.close_session(self)
+
+    def finish(self):
+        """遊戲結束：送完最後的狀態後半關閉，之後收到的輸入丟棄；客戶端沒有關閉時 MAX_LAG 秒後強制關閉"""
+        self.finished = True
+        transport = self.transport
+        try:
+            if transport.can_write_eof(): transport.write_eof()
+        except OSError:
+            # 客戶端已經斷線
+            transport.abort()
+            return
+        asyncio.get_running_loop().call_later(MAX_LAG, transport.close)
+
+    def reject(self, message):
+        self.handshake = None
+        self.finished = True
+        self.transport.write(json.dumps({'error': message}, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.transport.close()
+
+def parse_hello(hello):
+    """檢查握手參數；回傳 (種子, 角色, 升級) 或錯誤訊息"""
+    if not isinstance(hello, dict):
+        return '握手必須是物件'
+    seed = hello.get('seed')
+    if seed is None: seed = random.getrandbits(32)
+    if not isinstance(seed, int) or not 0 <= seed < 2 ** 32:
+        return 'seed 必須是 32 位元非負整數'
+    character = hello.get('character', 'player')
+    if character not in CHARACTERS:
+        return f'character 必須是 {", ".join(CHARACTERS)} 之一'
+    upgrades = hello.get('upgrades') or {}
+    if not isinstance(upgrades, dict):
+        return 'upgrades 必須是物件'
+    for key, level in upgrades.items():
+        if key not in SHOP_DEFAULTS or not isinstance(level, int) or not 0 <= level <= SHOP_DEFAULTS[key]['max']:
+            return f'不合法的升級 {key}={level!r}'
+    return seed, character, upgrades
+
+class TickMetrics:
+    """每個 tick 一筆 (延遲、處理時間、推進步數、局數) 的環狀緩衝區，與區間內的累計值"""
+    def __init__(self, capacity=METRICS_CAPACITY):
+        self.capacity = capacity
+        self.lateness = array('d', bytes(8 * capacity))
+        self.work = array('d', bytes(8 * capacity))
+        self.count = 0
+        self.cursor = 0
+        self.reset_interval(perf_counter())
+
+    def reset_interval(self, now):
+        self.started = now
+        self.ticks = 0
+        self.steps = 0
+        self.sessions = 0
+        self.queued = 0
+        self.session_ticks = 0
+        self.stalled = 0
+        self.throttled = 0
+        self.opened = 0
+        self.finished = 0
+        self.dropped = 0
+
+    def record(self, lateness, work, steps, sessions, queued, stalled, throttled):
+        c = self.cursor
+        self.lateness[c] = lateness
+        self.work[c] = work
+        self.cursor = (c + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.ticks += 1
+        self.steps += steps
+        self.sessions = sessions
+        self.queued += queued
+        self.session_ticks += sessions
+        self.stalled = stalled
+        self.throttled = throttled
+
+    def percentiles(self, column, qs=(50, 99)):
+        values = sorted(column[:self.count])
+        if not values:
+            return [0.0 for _ in qs]
+        return [values[min(len(values) - 1, int(len(values) * q / 100))] * 1000 for q in qs]
+
+    def publish(self, now):
+        """回傳這一段區間的統計 (並開始新的區間)"""
+        seconds = max(now - self.started, 1e-9)
+        late50, late99 = self.percentiles(self.lateness)
+        work50, work99 = self.percentiles(self.work)
+        report = {
+            'seconds': round(seconds, 3),
+            'sessions': self.sessions,
+            'ticks_per_s': round(self.ticks / seconds, 1),
+            'steps_per_s': round(self.steps / seconds, 1),
+            'late_p50_ms': round(late50, 3), 'late_p99_ms': round(late99, 3),
+            'work_p50_ms': round(work50, 3), 'work_p99_ms': round(work99, 3),
+            # 每局平均緩衝的輸入換算成毫秒 (輸入到推進的排隊時間)
+            'queue_ms': round(self.queued / max(1, self.session_ticks) / SIM_HZ * 1000, 2),
+            'stalled': self.stalled,
+            'throttled': self.throttled,
+            'opened': self.opened,
+            'finished': self.finished,
+            'dropped': self.dropped,
+        }
+        self.count = self.cursor = 0
+        self.reset_interval(now)
+        return report
+
+class BatchPool:
+    """同一角色的局共用一個 BatchSimulation，每局佔一個 slot；空的 slot 標為結束，不會推進。
+    每一步的成本與 slot 數成正比，因此從 BATCH_INITIAL 個 slot 開始，滿了才加倍 (上限 capacity)，
+    並優先配置編號小的 slot"""
+    def __init__(self, capacity, character, sizes=None, hitboxes=None, rules=None, aabb=False):
+        import numpy as np
+        from batch_sim import BatchSimulation
+        self.np = np
+        self.capacity = capacity
+        size = min(BATCH_INITIAL, capacity)
+        self.sim = BatchSimulation(size, character_key=character, sizes=sizes, hitboxes=hitboxes, rules=rules,
+                                   aabb=aabb)
+        self.free = []
+        self._add_slots(0, size)
+
+    def _add_slots(self, old, size):
+        np = self.np
+        self.sim.game_over[old:] = True
+        for slot in range(old, size): heapq.heappush(self.free, slot)
+        # 這個 tick 每個 slot 的各步輸入與要推進的步數
+        self.inputs = np.zeros((MAX_CATCHUP_STEPS, size), dtype=np.int64)
+        self.counts = np.zeros(size, dtype=np.int64)
+        self.states = np.zeros(size, dtype=STATE_FIELDS)
+
+    def open(self, upgrades):
+        """配置一個 slot 並重置成新的一局；已滿時回傳 None"""
+        if not self.free:
+            old = self.sim.n
+            if old >= self.capacity:
+                return None
+            size = min(old * 2, self.capacity)
+            self.sim.grow(size)
+            self._add_slots(old, size)
+        slot = heapq.heappop(self.free)
+        for key, levels in self.sim.upgrades.items():
+            levels[slot] = upgrades.get(key, DEFAULT_UPGRADES[key])
+        self.sim.reset(slot)
+        return slot
+
+    def close(self, slot):
+        self.sim.game_over[slot] = True
+        heapq.heappush(self.free, slot)
+
+    def advance(self, ready, deliver):
+        """ready 為 (session, 步數)；所有 slot 一起推進，再逐局 deliver(session, 推進步數, 狀態, 是否結束)。回傳總步數"""
+        np, sim, inputs, counts = self.np, self.sim, self.inputs, self.counts
+        # 先在 Python 端串起所有的輸入，再一次寫進 (步, slot) 矩陣
+        slots, lengths, flat = [], [], bytearray()
+        for session, n in ready:
+            slots.append(session.slot)
+            lengths.append(n)
+            flat += session.inputs[:n]
+        lengths = np.array(lengths)
+        counts[:] = 0
+        counts[slots] = lengths
+        starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+        inputs[np.arange(len(flat)) - starts, np.repeat(slots, lengths)] = np.frombuffer(flat, dtype=np.uint8)
+        inputs &= INPUT_MASK
+        before = sim.frame.copy()
+        for i in range(int(counts.max())):
+            sim.step(inputs[i], counts > i)
+        done = (sim.frame - before).tolist()
+        over = sim.game_over.tolist()
+        states = self.states
+        states['frame'] = sim.frame
+        states['score'] = sim.score
+        states['combo'] = np.minimum(sim.combo, 0xFFFF)
+        states['shields'] = np.minimum(sim.shields, 0xFF)
+        states['flags'] = sim.game_over * FLAG_GAME_OVER
+        packed = states.tobytes()
+        size = STATE.size
+        steps = 0
+        for session, _ in ready:
+            slot = session.slot
+            n = done[slot]
+            steps += n
+            deliver(session, n, packed[slot * size:(slot + 1) * size], over[slot])
+        return steps
+
+class GameServer:
+    """masks / sizes / rules 與 Simulation 相同；masks 省略時載入遊戲的碰撞遮罩 (與客戶端的判定相同)，
+    aabb 為 True 才改用預設尺寸的矩形判定。replay_dir 不為 None 時每局錄成重播檔 (檔名含局編號)；
+    batch 大於 0 時改用批次模式，每種角色最多 batch 局 (碰撞以 masks 的外框近似)"""
+    def __init__(self, masks=None, sizes=None, rules=None, replay_dir=None, metrics_path=None, quiet=False,
+                 batch=0, aabb=False):
+        if batch and replay_dir:
+            raise ValueError('批次模式的結果無法重播，不能錄製重播檔')
+        if masks is None and not aabb:
+            from replay import load_game_masks
+            masks, sizes = load_game_masks(strict=True)
+        # 回覆與指標中標明這個伺服器的碰撞判定：mask 與遊戲相同；hitbox 為遮罩外框的近似；aabb 為整張圖的矩形
+        self.collision = 'aabb' if not masks else 'hitbox' if batch else 'mask'
+        self.masks = masks
+        self.sizes = sizes
+        self.rules = rules
+        self.replay_dir = replay_dir
+        self.metrics_path = metrics_path
+        self.quiet = quiet
+        self.sessions = {}
+        self.next_id = 1
+        self.metrics = TickMetrics()
+        self.max_lag_steps = MAX_LAG * SIM_HZ
+        self.batch = batch
+        self.pools = {}
+
+    # --- 連線 ---
+
+    def open_session(self, session, hello):
+        """握手成功時建立模擬並回覆；回傳錯誤訊息 (成功時為 None)"""
+        parsed = parse_hello(hello)
+        if isinstance(parsed, str):
+            return parsed
+        seed, character, upgrades = parsed
+        if self.batch:
+            pool = self.pools.get(character)
+            if pool is None:
+                pool = self.pools[character] = BatchPool(self.batch, character, self.sizes, self.hitboxes(),
+                                                         self.rules, aabb=self.collision == 'aabb')
+            slot = pool.open(upgrades)
+            if slot is None:
+                return '伺服器已滿'
+            session.pool, session.slot = pool, slot
+            seed = None
+        else:
+            session.sim = Simulation(seed=seed, character_key=character, upgrades=upgrades,
+                                     sizes=self.sizes, masks=self.masks, rules=self.rules)
+        if self.replay_dir:
+            from replay import ReplayRecorder
+            session.recorder = ReplayRecorder(session.sim, masks=bool(self.masks))
+        session.id = self.next_id
+        self.next_id += 1
+        self.sessions[session.id] = session
+        self.metrics.opened += 1
+        reply = {'session': session.id, 'seed': seed, 'hz': SIM_HZ, 'collision': self.collision}
+        session.transport.write(json.dumps(reply).encode('utf-8') + b'\n')
+        return None
+
+    def hitboxes(self):
+        if not self.masks:
+            return None
+        from batch_sim import hitbox_from_mask
+        return {key: hitbox_from_mask(mask) for key, mask in self.masks.items() if isinstance(key, str)}
+
+    def close_session(self, session):
+        if self.sessions.pop(session.id, None) is None:
+            return
+        if session.pool is not None:
+            session.pool.close(session.slot)
+            session.pool = None
+        if session.recorder is not None:
+            # 檔案寫入交給執行緒池，不阻塞排程
+            loop = asyncio.get_running_loop()
+            try:
+                session.recorder.save(self.replay_dir, lambda fn, *args: loop.run_in_executor(None, fn, *args),
+                                      tag=session.id)
+            except OSError as e:
+                print(f"重播寫入失敗: {e}", file=sys.stderr)
+            session.recorder = None
+
+    # --- 排程 ---
+
+    def tick(self, elapsed):
+        """所有的局依經過的時間推進；回傳 (推進步數, 緩衝的輸入總數, 暫停推進的局數, 暫停讀取的局數)"""
+        owed = elapsed * SIM_HZ
+        max_lag = self.max_lag_steps
+        queued = stalled = throttled = 0
+        ready = []
+        for session in list(self.sessions.values()):
+            session.owed += owed
+            inputs = session.inputs
+            n = 0
+            if not session.writable:
+                stalled += 1
+            else:
+                n = min(int(session.owed), len(inputs), MAX_CATCHUP_STEPS)
+            if session.owed - n > max_lag:
+                self.metrics.dropped += 1
+                session.transport.abort()
+                self.close_session(session)
+                continue
+            if n: ready.append((session, n))
+            if not session.reading: throttled += 1
+            queued += len(inputs) - n
+        if not ready:
+            steps = 0
+        elif self.batch:
+            steps = 0
+            for pool in self.pools.values():
+                group = [item for item in ready if item[0].pool is pool]
+                if group: steps += pool.advance(group, self.deliver)
+        else:
+            steps = self.advance(ready)
+        return steps, queued, stalled, throttled
+
+    def advance(self, ready):
+        """逐局以 Simulation 推進 ready 中的 (session, 步數)；回傳總步數"""
+        steps = 0
+        deliver = self.deliver
+        pack = STATE.pack
+        for session, n in ready:
+            sim = session.sim
+            step = sim.step
+            inputs = session.inputs
+            record = session.recorder.record if session.recorder else None
+            for i in range(n):
+                bits = inputs[i] & INPUT_MASK
+                if record: record(bits)
+                if not step(bits):
+                    n = i + 1
+                    break
+            steps += n
+            state = pack(sim.frame, sim.score, min(sim.combo, 0xFFFF), min(sim.player.shields, 0xFF),
+                         FLAG_GAME_OVER if sim.game_over else 0)
+            deliver(session, n, state, sim.game_over)
+        return steps
+
+    def deliver(self, session, n, state, game_over):
+        """一局推進了 n 步：消耗輸入，輸入用完或結束時回傳打包好的狀態，結束時關閉，緩衝消化到一半時恢復讀取"""
+        inputs = session.inputs
+        del inputs[:n]
+        session.owed -= n
+        if not inputs or game_over: session.transport.write(state)
+        if game_over:
+            self.metrics.finished += 1
+            session.finish()
+            self.close_session(session)
+        elif not session.reading and len(inputs) <= INPUT_WINDOW // 2:
+            session.reading = True
+            session.transport.resume_reading()
+
+    async def run_ticks(self):
+        metrics = self.metrics
+        out = open(self.metrics_path, 'a', encoding='utf-8') if self.metrics_path else None
+        try:
+            scheduled = last = published = perf_counter()
+            while True:
+                scheduled += SIM_DT
+                delay = scheduled - perf_counter()
+                # 落後時也讓出一次，讓連線的讀寫有機會處理
+                await asyncio.sleep(max(0.0, delay))
+                start = perf_counter()
+                lateness = start - scheduled
+                if lateness > MAX_CATCHUP_STEPS * SIM_DT: scheduled = start
+                elapsed = min(start - last, MAX_CATCHUP_STEPS * SIM_DT)
+                last = start
+                steps, queued, stalled, throttled = self.tick(elapsed)
+                metrics.record(max(0.0, lateness), perf_counter() - start, steps, len(self.sessions),
+                               queued, stalled, throttled)
+                if start - published >= METRICS_INTERVAL:
+                    published = start
+                    report = metrics.publish(start)
+                    report['collision'] = self.collision
+                    if not self.quiet: print_metrics(report)
+                    if out:
+                        out.write(json.dumps(report) + '\n')
+                        out.flush()
+        finally:
+            if out: out.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: Session(self), host, port, backlog=1024)
+        if not self.quiet: print(f"伺服器啟動於 {host}:{port}", file=sys.stderr)
+        async with server:
+            await self.run_ticks()
+
+def print_metrics(report):
+    print(f"{report['sessions']:>6} 局 {report['steps_per_s']:>9.0f} 步/秒 "
+          f"tick {report['ticks_per_s']:.0f}/秒 延遲 p50/p99 {report['late_p50_ms']:.2f}/{report['late_p99_ms']:.2f} ms "
+          f"處理 {report['work_p50_ms']:.2f}/{report['work_p99_ms']:.2f} ms 排隊 {report['queue_ms']:.0f} ms "
+          f"暫停推進 {report['stalled']} 暫停讀取 {report['throttled']} "
+          f"開 {report['opened']} 結束 {report['finished']} 中斷 {report['dropped']}", file=sys.stderr)
+
+# --- 本機測試客戶端 ---
+
+async def run_client(host, port, seed, deadline, totals, chunk=6):
+    """反覆開局直到 deadline：每 chunk 步送一次輸入 (隨機保持左右一段時間、偶爾跳)，並讀取狀態"""
+    rng = random.Random(seed)
+    while perf_counter() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            totals['errors'] += 1
+            await asyncio.sleep(1.0)
+            continue
+        writer.write(json.dumps({'seed': rng.getrandbits(32)}).encode('utf-8') + b'\n')
+        try:
+            reply = json.loads(await reader.readline())
+        except (OSError, ValueError):
+            reply = {}
+        if 'session' not in reply:
+            totals['errors'] += 1
+            writer.close()
+            continue
+        move, hold = 0, 0
+        pending = b''
+        interval = chunk * SIM_DT
+        next_send = perf_counter()
+        done = False
+        while not done and perf_counter() < deadline:
+            batch = bytearray()
+            for _ in range(chunk):
+                if hold <= 0: move, hold = rng.choice((0, INPUT_LEFT, INPUT_RIGHT)), rng.randint(10, 60)
+                hold -= 1
+                batch.append(move | (INPUT_JUMP if rng.random() < 0.01 else 0))
+            writer.write(bytes(batch))
+            next_send += interval
+            try:
+                data = await asyncio.wait_for(reader.read(65536), max(0.0, next_send - perf_counter()))
+            except asyncio.TimeoutError:
+                data = None
+            except OSError:
+                break
+            if data == b'':
+                break
+            if data:
+                pending += data
+                whole = len(pending) - len(pending) % STATE.size
+                totals['states'] += whole // STATE.size
+                if whole:
+                    frame, score, combo, shields, flags = STATE.unpack_from(pending, whole - STATE.size)
+                    if flags & FLAG_GAME_OVER:
+                        totals['sessions'] += 1
+                        totals['steps'] += frame
+                        done = True
+                pending = pending[whole:]
+            delay = next_send - perf_counter()
+            if delay > 0: await asyncio.sleep(delay)
+        writer.close()
+
+async def run_clients(host, port, count, seconds, seed=0):
+    totals = {'sessions': 0, 'steps': 0, 'states': 0, 'errors': 0}
+    deadline = perf_counter() + seconds
+    start = perf_counter()
+    # 錯開連線時間，避免同時握手
+    tasks = []
+    for i in range(count):
+        tasks.append(asyncio.create_task(run_client(host, port, seed + i, deadline, totals)))
+        if i % 100 == 99: await asyncio.sleep(0.01)
+    await asyncio.gather(*tasks)
+    elapsed = perf_counter() - start
+    print(f"{count} 個客戶端 {elapsed:.1f} 秒：完成 {totals['sessions']} 局，收到 {totals['states']} 筆狀態 "
+          f"({totals['states'] / elapsed:.0f}/秒)，錯誤 {totals['errors']}")
+
+# --- 不經網路的 tick 量測 ---
+
+class NullTransport:
+    """丟棄寫出的資料；讓量測只包含伺服器本身的處理 (測試客戶端與伺服器搶同一個核心時，量到的多半是客戶端)"""
+    def write(self, data): pass
+    def can_write_eof(self): return False
+    def close(self): pass
+    def abort(self): pass
+    def pause_reading(self): pass
+    def resume_reading(self): pass
+
+async def run_bench(server, count, ticks, seed=0, chunk=6):
+    """維持 count 局 (結束就開新局)，每局每 chunk 步補一次隨機輸入，直接呼叫 tick 並量測處理時間"""
+    rng = random.Random(seed)
+
+    def open_one():
+        session = Session(server)
+        session.connection_made(NullTransport())
+        session.data_received(json.dumps({'seed': rng.getrandbits(32)}).encode('utf-8') + b'\n')
+        return session
+
+    sessions = [open_one() for _ in range(count)]
+    work = []
+    steps = 0
+    for _ in range(ticks):
+        for i, session in enumerate(sessions):
+            if session.finished: session = sessions[i] = open_one()
+            if len(session.inputs) < chunk:
+                session.inputs += bytes(rng.choice((0, INPUT_LEFT, INPUT_RIGHT)) for _ in range(chunk))
+        start = perf_counter()
+        steps += server.tick(SIM_DT)[0]
+        work.append(perf_counter() - start)
+    for session in sessions:
+        if session.timer: session.timer.cancel()
+    work.sort()
+    mean = sum(work) / len(work)
+    print(f"{count} 局 {'批次' if server.batch else '逐局'}：tick 處理 p50/p99 {work[len(work) // 2] * 1000:.2f}/"
+          f"{work[int(len(work) * 0.99)] * 1000:.2f} ms，每步 {mean * ticks / max(1, steps) * 1e6:.2f} µs，"
+          f"每秒 {SIM_HZ} tick 約可容納 {count * SIM_DT / mean:.0f} 局")
+
+def main():
+    parser = argparse.ArgumentParser(description='多局遊戲伺服器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--replays', help='每局錄成重播檔的資料夾')
+    parser.add_argument('--metrics', help='每段區間的指標另存為 JSON Lines')
+    parser.add_argument('--aabb', action='store_true',
+                        help='不載入遊戲資源，以預設尺寸的矩形判定碰撞 (與客戶端的判定不同，分數不可作為驗證)')
+    parser.add_argument('--batch', type=int, default=0, metavar='N',
+                        help='批次模式：同一角色的局一起向量化推進，每種角色最多 N 局 (無法重播)')
+    parser.add_argument('--clients', type=int, help='改為執行 N 個本機測試客戶端')
+    parser.add_argument('--seconds', type=float, default=30, help='測試客戶端的執行時間')
+    parser.add_argument('--bench', type=int, metavar='N', help='改為不經網路以 N 局量測每個 tick 的處理時間')
+    args = parser.parse_args()
+    if args.batch and args.replays:
+        parser.error('--batch 與 --replays 不能同時使用')
+
+    if args.clients:
+        asyncio.run(run_clients(args.host, args.port, args.clients, args.seconds))
+        return 0
+    server = GameServer(replay_dir=args.replays, metrics_path=args.metrics, batch=args.batch, aabb=args.aabb)
+    if args.bench:
+        asyncio.run(run_bench(server, args.bench, int(args.seconds * SIM_HZ)))
+        return 0
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""太空捕手 - 模擬與繪製的管線化 (--pipeline)
+
+模擬在背景執行緒推進，每次推進後把畫面需要的狀態 (玩家、落下物件、粒子、HUD 數值、
+上一步的位置與內插比例) 複製成一份快照，寫進雙緩衝區的後台；主執行緒繪製前台快照，
+與模擬下一幀的計算重疊：
+
+    主執行緒：wait() 取得第 N 幀快照 -> 處理事件 -> submit(第 N+1 幀的輸入) -> 繪製第 N 幀並呈現
+    模擬執行緒：                                  推進第 N+1 幀 -> 寫入後台快照
+
+主執行緒只在模擬執行緒閒置時 (wait() 之後、submit() 之前) 處理事件與讀取模擬，
+因此暫停、開商店、重開一局都不需要額外的鎖。代價是畫面比輸入晚一幀。
+
+模擬是純 Python，兩個執行緒仍要輪流持有 GIL；真正重疊的只有 pygame 釋放 GIL 的部分
+(呈現畫面、整頁填色等) 與快照複製，多核心時 CPU 時間較長的那一邊決定幀時間。
+"""
+import threading
+
+class PlayerView:
+    __slots__ = ('x', 'y', 'w', 'h', 'mask_key', 'shields', 'invincible_timer', 'fire_timer')
+
+class ObjectView:
+    __slots__ = ('type', 'x', 'y', 'is_active')
+
+class ParticleView:
+    """存活粒子的複本；live 為 0..n-1，繪製端與 ParticlePool 的存取方式相同"""
+    __slots__ = ('live', 'x', 'y', 'vx', 'vy', 'life', 'sprite')
+
+    def __init__(self):
+        self.live = range(0)
+        self.x = self.y = self.vx = self.vy = self.life = self.sprite = []
+
+class FrameSnapshot:
+    """一幀的繪製資料；屬性名稱與 Simulation 相同，繪製端不必區分來源"""
+    __slots__ = ('sim', 'frame', 'score', 'combo', 'game_over', 'player', 'objects', 'particles',
+                 'prev_positions', 'alpha')
+
+    def __init__(self):
+        self.sim = None
+        self.frame = -1
+        self.player = PlayerView()
+        self.objects = []
+        self.particles = ParticleView()
+
+    def capture(self, sim, prev_positions, alpha):
+        """從模擬複製這一幀的狀態 (物件重複使用，只更新欄位)"""
+        self.sim = sim
+        self.frame = sim.frame
+        self.score = sim.score
+        self.combo = sim.combo
+        self.game_over = sim.game_over
+        self.prev_positions = prev_positions
+        self.alpha = alpha
+        p, v = sim.player, self.player
+        v.x, v.y, v.w, v.h, v.mask_key = p.x, p.y, p.w, p.h, p.mask_key
+        v.shields, v.invincible_timer, v.fire_timer = p.shields, p.invincible_timer, p.fire_timer
+        objs = sim.wave_system.all_falling_objects
+        views = self.objects
+        while len(views) < len(objs): views.append(ObjectView())
+        del views[len(objs):]
+        for view, obj in zip(views, objs):
+            view.type, view.x, view.y, view.is_active = obj.type, obj.x, obj.y, obj.is_active
+        pool, parts = sim.particles, self.particles
+        live = pool.live
+        xs, ys, vxs, vys, lifes, idx = pool.x, pool.y, pool.vx, pool.vy, pool.life, pool.sprite
+        parts.x = [xs[i] for i in live]
+        parts.y = [ys[i] for i in live]
+        parts.vx = [vxs[i] for i in live]
+        parts.vy = [vys[i] for i in live]
+        parts.life = [lifes[i] for i in live]
+        parts.sprite = [idx[i] for i in live]
+        parts.live = range(len(live))
+
+    def matches(self, sim):
+        """快照是否為 sim 目前的狀態 (換了一局或在主執行緒推進過就會過期)"""
+        return self.sim is sim and self.frame == sim.frame
+
+class SimPipeline:
+    """advance(inputs, dt) 在模擬執行緒推進一幀；capture(snapshot) 把目前狀態寫進快照"""
+    def __init__(self, advance, capture):
+        self.advance = advance
+        self.capture = capture
+        self.buffers = [FrameSnapshot(), FrameSnapshot()]
+        self.front = 0
+        self.job = None
+        self.busy = False
+        self.error = None
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._worker, name='simulation', daemon=True)
+        self.thread.start()
+
+    @property
+    def snapshot(self):
+        return self.buffers[self.front]
+
+    def submit(self, inputs, dt):
+        """交給模擬執行緒推進一幀 (不等待)"""
+        with self.cond:
+            self.job = (inputs, dt)
+            self.busy = True
+            self.cond.notify_all()
+
+    def wait(self):
+        """等模擬執行緒閒置；有新的快照時交換前後台，回傳前台快照"""
+        with self.cond:
+            while self.busy:
+                self.cond.wait()
+            error, self.error = self.error, None
+        if error is not None:
+            raise error
+        return self.buffers[self.front]
+
+    def capture_now(self):
+        """在呼叫端的執行緒直接把目前狀態寫進前台 (模擬須閒置；開局或快照過期時)"""
+        snapshot = self.buffers[self.front]
+        self.capture(snapshot)
+        return snapshot
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while self.job is None:
+                    self.cond.wait()
+                inputs, dt = self.job
+                self.job = None
+            try:
+                self.advance(inputs, dt)
+                self.capture(self.buffers[1 - self.front])
+                swap = True
+            except Exception as e:
+                # 交給主執行緒在下一次 wait() 時拋出
+                self.error = e
+                swap = False
+            with self.cond:
+                if swap: self.front = 1 - self.front
+                self.busy = False
+                self.cond.notify_all()
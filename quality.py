@@ -0,0 +1,98 @@
+"""太空捕手 - 依幀時間自動調整畫面品質
+
+QualityGovernor 觀察最近 window 幀的處理時間 (不含等待下一幀)，
+第 90 百分位超過預算時降一級，低於預算的 RESTORE_RATIO 並持續一段時間才升回一級。
+兩個門檻之間不動作 (遲滯)，每次變動後至少等一整個觀察窗；
+剛升級又被迫降級時，下一次升級要等的時間加倍，避免在兩級之間來回跳動。
+
+各級只影響畫面，不影響模擬 (粒子的數量與壽命照常參與碰撞，重播與分數不變)：
+    particle_stride  每幾步發射的粒子畫一次 (畫出的粒子數約為 1 / stride)
+    particle_life    粒子只在壽命的前這個比例內畫出
+    star_step        遊戲中前景星點每幾顆畫一顆
+    star_skip        完整星空略過最遠的幾層
+    rings            是否畫護盾 / 無敵光環
+    hud_interval     HUD 每幾幀重新組字一次 (其餘幀沿用組好的圖)
+"""
+from array import array
+
+# 由高到低依序放棄：粒子數量、粒子壽命、星空密度、光環、HUD 更新率
+QUALITY_LEVELS = (
+    {'particle_stride': 1, 'particle_life': 1.0, 'star_step': 1, 'star_skip': 0, 'rings': True, 'hud_interval': 1},
+    {'particle_stride': 2, 'particle_life': 1.0, 'star_step': 1, 'star_skip': 0, 'rings': True, 'hud_interval': 1},
+    {'particle_stride': 2, 'particle_life': 0.6, 'star_step': 1, 'star_skip': 0, 'rings': True, 'hud_interval': 1},
+    {'particle_stride': 3, 'particle_life': 0.6, 'star_step': 2, 'star_skip': 2, 'rings': True, 'hud_interval': 1},
+    {'particle_stride': 3, 'particle_life': 0.5, 'star_step': 2, 'star_skip': 2, 'rings': False, 'hud_interval': 1},
+    {'particle_stride': 4, 'particle_life': 0.4, 'star_step': 3, 'star_skip': 3, 'rings': False, 'hud_interval': 4},
+)
+
+# 每幀的時間預算 (秒) 與升回一級所需的餘裕 (p90 低於預算的比例)
+FRAME_BUDGET = 1 / 60
+RESTORE_RATIO = 0.6
+# 觀察窗 (幀)；升級前須持續有餘裕的幀數與其上限 (被迫降級時加倍)
+QUALITY_WINDOW = 30
+RESTORE_HOLD = 120
+RESTORE_HOLD_MAX = 1920
+
+class QualityGovernor:
+    def __init__(self, budget=FRAME_BUDGET, window=QUALITY_WINDOW, levels=QUALITY_LEVELS):
+        self.budget = budget
+        self.window = window
+        self.levels = levels
+        self.level = 0
+        self.samples = array('d', bytes(8 * window))
+        self.count = 0
+        self.cursor = 0
+        # 距離上次變動的幀數、目前升級所需的持續幀數、持續有餘裕的幀數
+        self.since_change = 0
+        self.restore_hold = RESTORE_HOLD
+        self.headroom = 0
+        self.last_change = 0    # 上次變動的方向 (+1 降級、-1 升級)
+        self.changes = 0
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def reset(self):
+        """清空觀察窗 (例如開新的一局)，保留目前的等級"""
+        self.count = self.cursor = 0
+        self.headroom = 0
+
+    def restore(self):
+        """回到最高品質並清空觀察窗 (例如離開遊戲畫面)；保留升級所需的持續幀數"""
+        self.reset()
+        self.level = 0
+        self.since_change = 0
+
+    def update(self, frame_time):
+        """記錄一幀的處理時間 (秒)；等級改變時回傳 True"""
+        c = self.cursor
+        self.samples[c] = frame_time
+        self.cursor = (c + 1) % self.window
+        if self.count < self.window: self.count += 1
+        self.since_change += 1
+        if self.count < self.window or self.since_change < self.window:
+            return False
+        p90 = sorted(self.samples)[int(self.window * 0.9)]
+        if p90 > self.budget:
+            self.headroom = 0
+            if self.level + 1 < len(self.levels):
+                # 剛升級就撐不住：下次升級前等更久
+                if self.last_change < 0 and self.since_change < 2 * self.restore_hold:
+                    self.restore_hold = min(self.restore_hold * 2, RESTORE_HOLD_MAX)
+                return self._change(+1)
+        elif p90 < self.budget * RESTORE_RATIO:
+            self.headroom += 1
+            if self.level > 0 and self.headroom >= self.restore_hold:
+                return self._change(-1)
+        else:
+            self.headroom = 0
+        return False
+
+    def _change(self, step):
+        self.level += step
+        self.last_change = step
+        self.since_change = 0
+        self.headroom = 0
+        self.changes += 1
+        return True
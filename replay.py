@@ -0,0 +1,332 @@
+"""太空捕手 - 重播錄製與播放
+
+一局 PLAYING 記錄成：種子與開局設定 + 每步輸入 (左、右、跳) 的變化量編碼，
+外加暫停 (發生在第幾步、停了幾秒) 與每隔 SNAPSHOT_SECONDS 的完整狀態快照。
+輸入很少改變，因此只存 (持續步數, 輸入值) 的連續段，並以 varint 寫入；
+快照讓跳到任意一步時只需從最近的快照往後推進，不必從第 0 步重算。
+
+檔案格式：
+    MAGIC (4 bytes) | version, 標頭長度, 輸入段長度, 快照長度 (<IIII)
+    | 標頭 JSON | 輸入段 varint | 快照 (zlib 壓縮的 JSON)
+
+無畫面重播 (大量檔案驗證與統計)：
+
+    python replay.py replays/                    # 全速重跑資料夾內所有重播並核對最終分數
+    python replay.py death.scr --seek 1800       # 從最近的快照跳到第 1800 步並顯示狀態
+
+有畫面的重播使用 python 嘉桐gemini.py --replay 檔案 [--seek 步數]。
+"""
+import argparse
+import bisect
+import json
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from time import perf_counter, strftime
+
+from sim_core import SIM_HZ, Simulation
+
+MAGIC = b'SCRP'
+VERSION = 1
+HEADER = struct.Struct('<IIII')
+EXTENSION = '.scr'
+
+# 快照間隔 (秒)；跳轉時最多需要從快照往後推進這麼久
+SNAPSHOT_SECONDS = 10
+SNAPSHOT_STEPS = SIM_HZ * SNAPSHOT_SECONDS
+
+def encode_varints(values):
+    out = bytearray()
+    for v in values:
+        while v >= 0x80:
+            out.append((v & 0x7F) | 0x80)
+            v >>= 7
+        out.append(v)
+    return bytes(out)
+
+def decode_varints(data):
+    values = []
+    v = shift = 0
+    for b in data:
+        v |= (b & 0x7F) << shift
+        if b & 0x80:
+            shift += 7
+        else:
+            values.append(v)
+            v = shift = 0
+    return values
+
+class Replay:
+    """一局的開局設定、輸入連續段、暫停與快照
+
+    runs: [[持續步數, 輸入值], ...]；pauses: [[步數, 秒數], ...]；
+    snapshots: 步數 -> Simulation.snapshot()。
+    """
+    def __init__(self, seed, character_key, upgrades, rules, sizes, masks=True):
+        self.seed = seed
+        self.character_key = character_key
+        self.upgrades = dict(upgrades)
+        self.rules = dict(rules)
+        self.sizes = {key: list(size) for key, size in sizes.items()}
+        # 錄製時是否以遮罩判定碰撞 (重播時需要相同的遮罩才會得到相同結果)
+        self.masks = masks
+        self.runs = []
+        self.pauses = []
+        self.snapshots = {}
+        self.frames = 0
+        self.score = 0
+        self.game_over = False
+        self._starts = None
+
+    # --- 錄製 ---
+
+    def append_input(self, value):
+        runs = self.runs
+        if runs and runs[-1][1] == value:
+            runs[-1][0] += 1
+        else:
+            runs.append([1, value])
+        self.frames += 1
+        self._starts = None
+
+    # --- 查詢 ---
+
+    def input_at(self, frame):
+        """第 frame 步 (0 起算) 的輸入；超出錄製範圍時為 0"""
+        if self._starts is None:
+            starts, total = [], 0
+            for count, _ in self.runs:
+                starts.append(total)
+                total += count
+            self._starts = starts
+        if frame >= self.frames or frame < 0:
+            return 0
+        return self.runs[bisect.bisect_right(self._starts, frame) - 1][1]
+
+    def inputs(self):
+        for count, value in self.runs:
+            for _ in range(count):
+                yield value
+
+    def pause_at(self, frame):
+        """第 frame 步之前玩家暫停的秒數 (沒有暫停為 0)"""
+        return sum(seconds for step, seconds in self.pauses if step == frame)
+
+    # --- 播放 ---
+
+    def simulation(self, masks=None, frame=0):
+        """建立這一局的模擬並推進到第 frame 步 (從最近的快照開始)"""
+        sim = Simulation(seed=self.seed, character_key=self.character_key, upgrades=self.upgrades,
+                         sizes={key: tuple(size) for key, size in self.sizes.items()},
+                         masks=masks, rules=self.rules)
+        return self.seek(sim, frame)
+
+    def seek(self, sim, frame):
+        """把 sim 移到第 frame 步：往回或跨過快照時先還原最近的快照，再逐步推進"""
+        frame = max(0, min(frame, self.frames))
+        start = max((f for f in self.snapshots if f <= frame), default=None)
+        if frame < sim.frame or (start is not None and start > sim.frame):
+            if start is not None:
+                sim.restore(self.snapshots[start])
+            else:
+                sim.restore(self.simulation(sim.masks).snapshot())
+        while sim.frame < frame and not sim.game_over:
+            sim.step(self.input_at(sim.frame))
+        return sim
+
+    def play(self, masks=None, until=None):
+        """無畫面從第 0 步全速重跑到 until 步 (預設為結尾)，不使用快照；回傳模擬
+
+        用來核對重播：結果應與錄製時的分數、步數相同。
+        """
+        sim = self.simulation(masks)
+        sim.run(self.inputs(), max_frames=self.frames if until is None else until)
+        return sim
+
+    # --- 存取 ---
+
+    def save(self, path):
+        header = {
+            'seed': self.seed, 'character_key': self.character_key, 'upgrades': self.upgrades,
+            'rules': self.rules, 'sizes': self.sizes, 'masks': self.masks, 'pauses': self.pauses,
+            'frames': self.frames, 'score': self.score, 'game_over': self.game_over,
+            'snapshot_steps': SNAPSHOT_STEPS,
+        }
+        head = json.dumps(header, ensure_ascii=False).encode('utf-8')
+        runs = encode_varints(v for run in self.runs for v in run)
+        snaps = zlib.compress(json.dumps({str(f): s for f, s in self.snapshots.items()}).encode())
+        # 暫存檔名不與其他同時寫入的重播衝突 (伺服器由多個執行緒寫入)
+        fd, tmp = tempfile.mkstemp(suffix='.tmp', prefix=os.path.basename(path) + '.',
+                                   dir=os.path.dirname(path) or '.')
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                fp.write(MAGIC)
+                fp.write(HEADER.pack(VERSION, len(head), len(runs), len(snaps)))
+                fp.write(head)
+                fp.write(runs)
+                fp.write(snaps)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path):
+        """讀取重播檔；格式不符時拋出 ValueError"""
+        with open(path, 'rb') as fp:
+            data = fp.read()
+        if data[:4] != MAGIC:
+            raise ValueError(f'{path}: 不是重播檔')
+        version, head_len, runs_len, snaps_len = HEADER.unpack_from(data, 4)
+        if version != VERSION:
+            raise ValueError(f'{path}: 不支援的版本 {version}')
+        a = 4 + HEADER.size
+        header = json.loads(data[a:a + head_len].decode('utf-8'))
+        a += head_len
+        flat = decode_varints(data[a:a + runs_len])
+        a += runs_len
+        snaps = json.loads(zlib.decompress(data[a:a + snaps_len]))
+
+        replay = cls(header['seed'], header['character_key'], header['upgrades'], header['rules'],
+                     header['sizes'], header['masks'])
+        replay.runs = [[flat[i], flat[i + 1]] for i in range(0, len(flat), 2)]
+        replay.pauses = header['pauses']
+        replay.frames = header['frames']
+        replay.score = header['score']
+        replay.game_over = header['game_over']
+        replay.snapshots = {int(f): s for f, s in snaps.items()}
+        return replay
+
+class ReplayRecorder:
+    """錄製一局：每步推進前呼叫 record(輸入)，暫停結束時呼叫 pause(秒數)"""
+    def __init__(self, sim, masks=True, snapshot_steps=SNAPSHOT_STEPS):
+        self.sim = sim
+        self.snapshot_steps = snapshot_steps
+        self.replay = Replay(sim.seed, sim.player.mask_key, sim.upgrades, sim.rules, sim.sizes, masks)
+        self.started = strftime('%Y%m%d-%H%M%S')
+        self.saved = False
+
+    def record(self, inputs):
+        sim = self.sim
+        if sim.frame and sim.frame % self.snapshot_steps == 0 and sim.frame not in self.replay.snapshots:
+            self.replay.snapshots[sim.frame] = sim.snapshot()
+        self.replay.append_input(inputs)
+
+    def pause(self, seconds):
+        self.replay.pauses.append([self.sim.frame, round(seconds, 3)])
+
+    def finish(self):
+        replay = self.replay
+        replay.score = self.sim.score
+        replay.game_over = self.sim.game_over
+        return replay
+
+    def save(self, directory, run=None, tag=None):
+        """寫入 directory，檔名為開始時間、種子與 tag；回傳路徑 (沒有推進過則不寫)
+
+        run: 可選的 run(fn, *args)，把實際的檔案寫入交給其他執行緒 (例如 SaveStore.run_in_background)。
+        tag: 同一秒內可能有多局同種子時用來區分檔名 (例如伺服器的局編號)。
+        """
+        if self.saved or not self.replay.frames:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        suffix = f"-{tag}" if tag is not None else ''
+        path = os.path.join(directory, f"{self.started}-{self.sim.seed:08x}{suffix}{EXTENSION}")
+        replay = self.finish()
+        if run is None: replay.save(path)
+        else: run(replay.save, path)
+        self.saved = True
+        return path
+
+# 遊戲隨附圖片的物件 (星星與花本來就是程式畫的)
+GAME_IMAGES = ('player', 'player_2', 'coin', 'f_coin')
+
+def load_game_masks(strict=False):
+    """以遊戲主程式的資源建立碰撞遮罩 (無畫面)，讓重播的碰撞判定與遊戲相同。
+    strict 為 True 時，GAME_IMAGES 的圖片找不到 (改用備用圖形，尺寸與遊戲不同) 就拋出 FileNotFoundError"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    import 嘉桐gemini as game_module
+    game_module.init_pygame()
+    if pygame.display.get_surface() is None:
+        pygame.display.set_mode((1, 1))
+    if strict:
+        # 資源包不記錄哪些是備用圖形，直接從圖片載入才能檢查
+        game_module.load_and_clean_assets()
+        missing = [key for key in GAME_IMAGES if game_module.asset_sources.get(key) is None]
+        if missing:
+            raise FileNotFoundError(f"找不到遊戲圖片: {', '.join(missing)}")
+    elif not game_module.assets:
+        game_module.load_assets()
+    sizes = {key: surf.get_size() for key, surf in game_module.assets.items()}
+    return game_module.build_masks(game_module.build_fire_sprites()), sizes
+
+def pack_masks(masks):
+    """把遮罩轉成可以 pickle 的 {鍵: (尺寸, RGBA bytes)}，交給子行程"""
+    import pygame
+    packed = {}
+    for key, mask in masks.items():
+        surf = mask.to_surface(setcolor=(255, 255, 255, 255), unsetcolor=(0, 0, 0, 0))
+        packed[key] = (mask.get_size(), pygame.image.tobytes(surf, 'RGBA'))
+    return packed
+
+def unpack_masks(packed):
+    import pygame
+    return {key: pygame.mask.from_surface(pygame.image.frombytes(data, size, 'RGBA'))
+            for key, (size, data) in packed.items()}
+
+def replay_paths(targets):
+    for target in targets:
+        if os.path.isdir(target):
+            for name in sorted(os.listdir(target)):
+                if name.endswith(EXTENSION):
+                    yield os.path.join(target, name)
+        else:
+            yield target
+
+def main():
+    parser = argparse.ArgumentParser(description='無畫面重播')
+    parser.add_argument('targets', nargs='+', help='重播檔或資料夾')
+    parser.add_argument('--seek', type=int, help='只推進到第 N 步並顯示當時狀態')
+    parser.add_argument('--aabb', action='store_true', help='不載入遊戲資源，以矩形判定碰撞 (較快但可能與遊戲不同)')
+    args = parser.parse_args()
+
+    masks = sizes = None
+    failed = 0
+    total_steps = 0
+    start = perf_counter()
+    for path in replay_paths(args.targets):
+        try:
+            replay = Replay.load(path)
+        except (OSError, ValueError) as e:
+            print(f"{path}: 無法讀取 ({e})")
+            failed += 1
+            continue
+        use_masks = None
+        if replay.masks and not args.aabb:
+            if masks is None:
+                masks, sizes = load_game_masks()
+            if any(tuple(size) != sizes.get(key) for key, size in replay.sizes.items()):
+                print(f"{path}: 注意，錄製時的圖片尺寸與目前資源不同")
+            use_masks = masks
+        if args.seek is not None:
+            sim = replay.simulation(use_masks, args.seek)
+            p = sim.player
+            print(f"{path}: 第 {sim.frame} 步 分數 {sim.score} 連擊 {sim.combo} 玩家 ({p.x}, {p.y}) "
+                  f"護盾 {p.shields} 無敵 {p.invincible_timer} 火焰 {p.fire_timer} 粒子 {len(sim.particles)}")
+            continue
+        sim = replay.play(use_masks)
+        total_steps += sim.frame
+        ok = sim.frame == replay.frames and sim.score == replay.score and sim.game_over == replay.game_over
+        if not ok: failed += 1
+        print(f"{path}: {sim.frame} 步 ({sim.frame / SIM_HZ:.1f}s) 分數 {sim.score} "
+              f"{'一致' if ok else f'不一致 (錄製時 {replay.frames} 步 分數 {replay.score})'}")
+    elapsed = perf_counter() - start
+    if total_steps and elapsed > 0:
+        print(f"共 {total_steps} 步，{total_steps / elapsed:.0f} 步/秒 (即時的 {total_steps / elapsed / SIM_HZ:.0f} 倍)")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""太空捕手 - 存檔 (代幣、商店升級與每局紀錄)
+
+以 SQLite (WAL 模式) 保存，每次寫入都是一個交易，程式中途被終止也不會留下半套資料。
+寫入由背景執行緒處理：遊戲只把要寫的內容放進佇列，不會因為磁碟 I/O 卡住畫面；
+執行緒把佇列中累積的項目合併成一個交易寫入 (同一批裡的進度只保留最新的一筆)。
+每局結束時的紀錄與進度在同一個交易中寫入，當機時最多遺失最後一局。
+其他較慢的檔案寫入 (重播檔) 也可以交給同一個執行緒處理。
+"""
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS wallet (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    tokens INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS upgrades (
+    item TEXT PRIMARY KEY,
+    level INTEGER NOT NULL,
+    cost INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ended_at REAL NOT NULL,
+    seed INTEGER,
+    character TEXT,
+    score INTEGER NOT NULL,
+    frames INTEGER NOT NULL,
+    max_combo INTEGER NOT NULL,
+    tokens_after INTEGER NOT NULL,
+    replay TEXT
+);
+"""
+
+# 佇列項目種類
+_PROGRESS = 'progress'
+_SESSION = 'session'
+_FLUSH = 'flush'
+_TASK = 'task'
+
+def connect(path):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    if conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+        conn.executescript(SCHEMA)
+        conn.execute(f'PRAGMA user_version={SCHEMA_VERSION}')
+    return conn
+
+def progress_rows(shop_items):
+    return [(key, item['level'], item['cost']) for key, item in shop_items.items()]
+
+class SaveStore:
+    def __init__(self, path, batch_delay=0.2):
+        self.path = path
+        # 收到第一筆後再等 batch_delay 秒，把這段時間內的寫入合併成一個交易
+        self.batch_delay = batch_delay
+        self.queue = queue.Queue()
+        self.error = None
+        connect(path).close()
+        self.thread = threading.Thread(target=self._writer, name='save-store', daemon=True)
+        self.thread.start()
+
+    # --- 讀取 (同步，只在啟動或查詢時使用) ---
+
+    def load(self):
+        """回傳 (代幣, {項目: (等級, 費用)})；沒有存檔時代幣為 0、升級為空"""
+        conn = connect(self.path)
+        try:
+            row = conn.execute('SELECT tokens FROM wallet WHERE id = 0').fetchone()
+            upgrades = {item: (level, cost) for item, level, cost
+                        in conn.execute('SELECT item, level, cost FROM upgrades')}
+        finally:
+            conn.close()
+        return (row[0] if row else 0), upgrades
+
+    def sessions(self, limit=None):
+        """最近的每局紀錄 (新到舊)，每筆為 dict"""
+        conn = connect(self.path)
+        conn.row_factory = sqlite3.Row
+        try:
+            sql = 'SELECT * FROM sessions ORDER BY id DESC'
+            rows = conn.execute(sql + ' LIMIT ?', (limit,)) if limit else conn.execute(sql)
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    # --- 寫入 (非同步) ---
+
+    def save_progress(self, tokens, shop_items):
+        """保存目前的代幣與升級 (購買後呼叫)"""
+        self.queue.put((_PROGRESS, (tokens, progress_rows(shop_items))))
+
+    def record_session(self, sim, tokens, shop_items, replay=None):
+        """一局結束：寫入該局紀錄與結算後的進度 (同一個交易)"""
+        session = (time.time(), sim.seed, sim.player.mask_key, sim.score, sim.frame, sim.max_combo,
+                   tokens, replay)
+        self.queue.put((_SESSION, (session, (tokens, progress_rows(shop_items)))))
+
+    def run_in_background(self, fn, *args):
+        """在寫入執行緒上執行 fn(*args) (例如寫出重播檔)，先於同一批的資料庫寫入"""
+        self.queue.put((_TASK, (fn, args)))
+
+    def flush(self, timeout=None):
+        """等待目前佇列中的寫入完成"""
+        done = threading.Event()
+        self.queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout=5.0):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    # --- 背景寫入 ---
+
+    def _writer(self):
+        conn = connect(self.path)
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            if batch[0] is not None:
+                time.sleep(self.batch_delay)
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+            ops = [op for op in batch if op is not None]
+            waiters = [data for kind, data in ops if kind == _FLUSH]
+            try:
+                for kind, (fn, args) in (op for op in ops if op[0] == _TASK):
+                    try:
+                        fn(*args)
+                    except Exception as e:
+                        print(f"背景寫入失敗: {e!r}", file=sys.stderr)
+                self._write(conn, [op for op in ops if op[0] in (_PROGRESS, _SESSION)])
+            except Exception as e:
+                # 執行緒結束的話之後的寫入都會遺失，flush() 也會永遠等下去：記下錯誤，繼續處理下一批
+                print(f"存檔執行緒錯誤: {e!r}", file=sys.stderr)
+            finally:
+                for done in waiters:
+                    done.set()
+        conn.close()
+
+    def _write(self, conn, ops):
+        if not ops:
+            return
+        try:
+            sessions = [data[0] for kind, data in ops if kind == _SESSION]
+            # 進度以最後一筆為準
+            tokens, upgrades = [data if kind == _PROGRESS else data[1] for kind, data in ops][-1]
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany('INSERT INTO sessions (ended_at, seed, character, score, frames, max_combo, '
+                             'tokens_after, replay) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', sessions)
+            conn.execute('INSERT OR REPLACE INTO wallet (id, tokens) VALUES (0, ?)', (tokens,))
+            conn.executemany('INSERT OR REPLACE INTO upgrades (item, level, cost) VALUES (?, ?, ?)', upgrades)
+            conn.execute('COMMIT')
+        except Exception as e:
+            # 除了 sqlite3.Error，資料本身有問題 (例如無法綁定的型別) 時也一樣處理
+            if conn.in_transaction: conn.execute('ROLLBACK')
+            # 寫入失敗不應讓遊戲停下；記下錯誤，下一次寫入時會再存一次最新進度
+            if self.error is None: print(f"存檔寫入失敗: {e}", file=sys.stderr)
+            self.error = e
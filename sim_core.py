@@ -0,0 +1,812 @@
+"""太空捕手 - 無畫面模擬核心
+
+玩家、波次系統、碰撞、計分與計時器的純邏輯版本，不依賴 pygame 顯示。
+以種子化的 random.Random 與每幀輸入驅動，可以用 CPU 全速推進，
+遊戲主程式與平衡測試共用同一份規則。
+"""
+import heapq
+import random
+
+# --- 常數設定 ---
+SCREEN_WIDTH = 800
+SCREEN_HEIGHT = 600
+
+# 角色與物理設定
+PLAYER_SIZE = 120
+PLAYER_SPEED_BASE = 13
+GRAVITY = 0.9
+JUMP_STRENGTH = -18
+
+# 物件設定
+COIN_BASE_SIZE = 140
+STAR_SIZE = 70
+FLOWER_SIZE = 80
+COIN_SPEED_BASE = 11
+
+# 軌道系統
+NUM_LANES = 6
+LANE_WIDTH = SCREEN_WIDTH // NUM_LANES
+BAND_HEIGHT = 100           # 碰撞索引格子的高度 (寬度為一條軌道)
+
+# 固定時間步長：模擬每秒固定推進 SIM_HZ 步，與畫面更新率無關。
+# 上面的速度與重力都以「每步」為單位；計時器以秒為單位，推進時換算成步數。
+SIM_HZ = 60
+SIM_DT = 1 / SIM_HZ
+
+def seconds_to_steps(seconds):
+    return int(round(seconds * SIM_HZ))
+
+# 計時器 (秒)
+INVINCIBLE_TIME = 5.0
+FIRE_TIME = 20 / 3
+FIRE_PARTICLE_LIFETIME = 0.5
+INVINCIBLE_STEPS = seconds_to_steps(INVINCIBLE_TIME)
+FIRE_STEPS = seconds_to_steps(FIRE_TIME)
+
+# 火焰粒子：尺寸範圍、預先繪製的色調數與粒子池容量
+FIRE_SIZE_MIN = 15
+FIRE_SIZE_MAX = 30
+FIRE_TINTS = 4
+FIRE_POOL_CAPACITY = 4096
+
+# 輸入位元：每幀一個整數
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+
+# 沒有圖片時的預設尺寸 (與 create_fallback 一致)
+DEFAULT_SIZES = {
+    'player': (PLAYER_SIZE, PLAYER_SIZE),
+    'player_2': (PLAYER_SIZE, PLAYER_SIZE),
+    'coin': (COIN_BASE_SIZE, COIN_BASE_SIZE),
+    'f_coin': (COIN_BASE_SIZE, COIN_BASE_SIZE),
+    'star': (STAR_SIZE, STAR_SIZE),
+    'flower': (STAR_SIZE, STAR_SIZE),
+}
+
+DEFAULT_UPGRADES = {'magnet': 0, 'shield': 0, 'speed': 0}
+
+# 波次定義 (可由 JSON 載入)：依分數由低到高排列，目前分數適用 from_score 不超過它的最後一段。
+#   counts:        每波各種類的數量 [基本數量, 每多少分多 1 個 (0 為固定), 上限]；這些種類為「核心」物件
+#   overlap:       場上剩下不超過幾個核心物件時就生成下一波 (0 為全部消失才生成)
+#   y_spread:      生成高度的隨機範圍 (畫面上方多遠)
+#   speed_div:     每多少分落下速度 +1 (None 則用 rules['wave_speed_div'])；speed_max 為加速上限
+#   props:         玩家沒有特殊效果時，每波以 prop_chance 的機率生成其中一種道具，
+#                  最多嘗試 prop_attempts 個隨機位置，與同軌道物件的高度差至少 prop_gap
+DEFAULT_WAVES = [
+    {
+        'from_score': 0,
+        'counts': {'coin': [1, 0, 1], 'f_coin': [3, 0, 3]},
+        'overlap': 0,
+        'y_spread': 400,
+        'speed_div': None,
+        'speed_max': None,
+        'props': ['star', 'flower'],
+        'prop_chance': 0.10,
+        'prop_attempts': 10,
+        'prop_gap': 150,
+    },
+]
+
+# 難度曲線：每多少分玩家加速 1、落下物件加速 1
+DEFAULT_RULES = {
+    'player_speed_div': 100,
+    'wave_speed_div': 150,
+    # 火焰模式下每秒平均發射的粒子數與粒子壽命 (秒)
+    'fire_emit_rate': 24.0,
+    'fire_particle_lifetime': FIRE_PARTICLE_LIFETIME,
+    'waves': DEFAULT_WAVES,
+}
+
+def load_waves(path):
+    """從 JSON 檔讀取波次定義 (格式同 DEFAULT_WAVES)，缺少的欄位以第一段預設值補上"""
+    import json
+    with open(path, encoding='utf-8') as fp:
+        stages = json.load(fp)
+    stages = [dict(DEFAULT_WAVES[0], **stage) for stage in stages]
+    return sorted(stages, key=lambda stage: stage['from_score'])
+
+# 商店經濟：初始費用、等級上限與每次購買後的費用成長倍率
+SHOP_DEFAULTS = {
+    'magnet': {'max': 5, 'cost': 100},
+    'shield': {'max': 3, 'cost': 200},
+    'speed': {'max': 10, 'cost': 50},
+}
+SHOP_COST_GROWTH = 1.3
+
+def buy_upgrade(item, tokens, growth=SHOP_COST_GROWTH):
+    """購買一級升級並更新 item 的等級與費用；回傳剩餘代幣，買不起或已滿級則回傳 None"""
+    if tokens < item['cost'] or item['level'] >= item['max']:
+        return None
+    tokens -= item['cost']
+    item['level'] += 1
+    item['cost'] = int(item['cost'] * growth)
+    return tokens
+
+def to_px(v):
+    """與 pygame.Rect 存入浮點座標時相同的取整 (四捨五入，遠離零)"""
+    return int(v + 0.5) if v >= 0 else -int(-v + 0.5)
+
+# --- 實體類別 ---
+
+class Body:
+    """帶有矩形位置的實體，座標語意與 pygame.Rect 相同"""
+    __slots__ = ('x', 'y', 'w', 'h', 'mask_key')
+
+    def __init__(self, w, h, mask_key):
+        self.x = 0
+        self.y = 0
+        self.w = w
+        self.h = h
+        self.mask_key = mask_key
+
+    @property
+    def centerx(self):
+        return self.x + self.w // 2
+
+    @property
+    def centery(self):
+        return self.y + self.h // 2
+
+    @property
+    def right(self):
+        return self.x + self.w
+
+    @property
+    def bottom(self):
+        return self.y + self.h
+
+class ParticlePool:
+    """固定容量的火焰粒子池
+
+    位置、速度、壽命、尺寸與圖片索引各存一個平行陣列，
+    以空閒索引堆疊 O(1) 取用與回收，存活粒子的索引依生成順序放在 live。
+    sprite 為預先繪製圖片的索引：(尺寸 - FIRE_SIZE_MIN) * FIRE_TINTS + 色調。
+    """
+    def __init__(self, capacity=FIRE_POOL_CAPACITY):
+        self.capacity = capacity
+        self.x = [0] * capacity
+        self.y = [0] * capacity
+        self.vx = [0.0] * capacity
+        self.vy = [0.0] * capacity
+        self.life = [0] * capacity
+        self.size = [0] * capacity
+        self.sprite = [0] * capacity
+        self.free = list(range(capacity - 1, -1, -1))
+        self.live = []
+
+    def __len__(self):
+        return len(self.live)
+
+    def emit(self, cx, cy, rng, life):
+        """在 (cx, cy) 生成一顆粒子；池滿時丟棄並回傳 False"""
+        if not self.free:
+            return False
+        i = self.free.pop()
+        size = rng.randint(FIRE_SIZE_MIN, FIRE_SIZE_MAX)
+        self.size[i] = size
+        self.sprite[i] = (size - FIRE_SIZE_MIN) * FIRE_TINTS + rng.randrange(FIRE_TINTS)
+        self.x[i] = cx - size // 2
+        self.y[i] = cy - size // 2
+        self.vy[i] = rng.uniform(-15, -8)
+        self.vx[i] = rng.uniform(-2, 2)
+        self.life[i] = life
+        self.live.append(i)
+        return True
+
+    def update(self):
+        """移動所有存活粒子並回收壽命用完的"""
+        xs, ys, vxs, vys, lifes = self.x, self.y, self.vx, self.vy, self.life
+        still = []
+        for i in self.live:
+            x = xs[i] + vxs[i]
+            xs[i] = int(x + 0.5) if x >= 0 else -int(-x + 0.5)
+            y = ys[i] + vys[i]
+            ys[i] = int(y + 0.5) if y >= 0 else -int(-y + 0.5)
+            lifes[i] -= 1
+            if lifes[i] > 0: still.append(i)
+            else: self.free.append(i)
+        self.live = still
+
+    def clear(self):
+        self.free.extend(self.live)
+        self.live = []
+
+class SimPlayer(Body):
+    __slots__ = ('ground_y', 'vel_y', 'is_jumping', 'base_speed', 'max_shields',
+                 'shields', 'invincible_timer', 'fire_timer')
+
+    def __init__(self, character_key, size, upgrades):
+        super().__init__(size[0], size[1], character_key)
+        self.ground_y = SCREEN_HEIGHT - self.h - 20
+        self.x = SCREEN_WIDTH // 2 - self.w // 2
+        self.y = self.ground_y
+        self.vel_y = 0
+        self.is_jumping = False
+        self.base_speed = PLAYER_SPEED_BASE + upgrades['speed'] * 1.5
+        self.max_shields = upgrades['shield']
+        self.shields = self.max_shields
+        self.invincible_timer = 0
+        self.fire_timer = 0
+
+    def update(self, inputs, current_score, speed_div=DEFAULT_RULES['player_speed_div']):
+        current_speed = self.base_speed + (current_score // speed_div)
+        if inputs & INPUT_LEFT: self.x = to_px(self.x - current_speed)
+        if inputs & INPUT_RIGHT: self.x = to_px(self.x + current_speed)
+        if inputs & INPUT_JUMP and not self.is_jumping:
+            self.vel_y = JUMP_STRENGTH
+            self.is_jumping = True
+
+        self.vel_y += GRAVITY
+        self.y = to_px(self.y + self.vel_y)
+        if self.y >= self.ground_y:
+            self.y = self.ground_y
+            self.vel_y = 0
+            self.is_jumping = False
+
+        if self.x < 0: self.x = 0
+        if self.x + self.w > SCREEN_WIDTH: self.x = SCREEN_WIDTH - self.w
+
+        if self.invincible_timer > 0: self.invincible_timer -= 1
+        if self.fire_timer > 0: self.fire_timer -= 1
+
+class SimObject(Body):
+    __slots__ = ('type', 'is_active', 'speed', 'index')
+
+    def __init__(self, type, size, index=0):
+        super().__init__(size[0], size[1], type)
+        self.type = type
+        self.is_active = False
+        self.speed = COIN_SPEED_BASE
+        # 在 all_falling_objects 中的位置；場上物件依此排序，處理順序才會固定
+        self.index = index
+
+    def spawn(self, lane, y_offset, speed_bonus):
+        lane_start = lane * LANE_WIDTH
+        self.x = lane_start + (LANE_WIDTH // 2) - self.w // 2
+        self.y = -self.h - y_offset
+        self.speed = COIN_SPEED_BASE + speed_bonus
+        self.is_active = True
+
+    def handle_movement(self, player, sim):
+        if not self.is_active:
+            return
+        magnet_level = sim.upgrades['magnet']
+        if self.type == 'coin' and magnet_level > 0:
+            dist_x = player.centerx - self.centerx
+            dist_y = player.centery - self.centery
+            distance = (dist_x**2 + dist_y**2)**0.5
+            magnet_range = 100 + magnet_level * 100
+            if distance < magnet_range and distance > 5:
+                self.x = to_px(self.x + (dist_x / distance) * 8)
+                self.y = to_px(self.y + (dist_y / distance) * 4)
+
+        self.y += self.speed
+        if self.y > SCREEN_HEIGHT:
+            self.is_active = False
+            if self.type == 'coin':
+                before = sim.score
+                sim.score = max(0, sim.score - 5)
+                tel = sim.telemetry
+                if tel:
+                    tel.emit(EVENT_MISS, self.centerx, sim.combo, sim.score - before)
+                    if sim.combo: tel.emit(EVENT_COMBO_BREAK, self.centerx, 0, sim.combo)
+                sim.combo = 0
+
+class ObjectPool:
+    """單一種類落下物件的池
+
+    物件在建立時一次配置好，空閒的位置放在以位置編號排序的堆積中，
+    取用時總是拿編號最小的空位：同一波的物件因此固定對應到同一組物件，
+    與生成順序無關 (重播與機器人的結果不受回收順序影響)。
+    池用完時依序輪流重用場上的物件 (容量 1 的道具即為「重新生成同一個」)。
+    """
+    def __init__(self, type, size, capacity, objects):
+        self.type = type
+        self.start = len(objects)
+        self.objects = [SimObject(type, size, self.start + i) for i in range(capacity)]
+        objects += self.objects
+        self.free = list(range(capacity))
+        self.steal = 0
+
+    def acquire(self):
+        """回傳 (物件, 是否為重用中的物件)"""
+        if self.free:
+            return self.objects[heapq.heappop(self.free)], False
+        obj = self.objects[self.steal]
+        self.steal = (self.steal + 1) % len(self.objects)
+        return obj, True
+
+    def release(self, obj):
+        heapq.heappush(self.free, obj.index - self.start)
+
+    def reset_free(self):
+        """依 is_active 重建空位 (還原快照後使用)"""
+        self.free = [i for i, obj in enumerate(self.objects) if not obj.is_active]
+
+class SimWaveSystem:
+    """依 rules['waves'] 的資料生成波次
+
+    每種物件一個 ObjectPool；場上的物件放在 active (依 index 排序)，
+    每步開始時把已失效的物件放回各自的池，並計算還在場上的核心物件數。
+    """
+    def __init__(self, sim):
+        self.sim = sim
+        sizes = sim.sizes
+        self.stages = sim.rules['waves']
+        # 各種類的容量：任一段波次中同時在場上的最大數量
+        capacity = {}
+        for stage in self.stages:
+            for type, (base, per, cap) in stage['counts'].items():
+                capacity[type] = max(capacity.get(type, 0), cap + stage['overlap'])
+            for type in stage['props']:
+                capacity.setdefault(type, 1)
+        self.all_falling_objects = []
+        self.pools = {type: ObjectPool(type, sizes[type], n, self.all_falling_objects)
+                      for type, n in capacity.items()}
+        self.active = []
+        self.core_active = 0
+
+    def pool_objects(self, type):
+        pool = self.pools.get(type)
+        return pool.objects if pool else []
+
+    @property
+    def coins(self): return self.pool_objects('coin')
+    @property
+    def f_coins(self): return self.pool_objects('f_coin')
+    @property
+    def stars(self): return self.pool_objects('star')
+    @property
+    def flowers(self): return self.pool_objects('flower')
+
+    def stage(self, score):
+        current = self.stages[0]
+        for stage in self.stages:
+            if stage['from_score'] > score: break
+            current = stage
+        return current
+
+    def collect(self):
+        """把失效的物件放回池中，重新計算場上的核心物件數"""
+        counts = self.stage(self.sim.score)['counts']
+        still = []
+        core = 0
+        pools = self.pools
+        for obj in self.active:
+            if obj.is_active:
+                still.append(obj)
+                if obj.type in counts: core += 1
+            else:
+                pools[obj.type].release(obj)
+        self.active = still
+        self.core_active = core
+
+    def update(self, player):
+        self.collect()
+        # 場上的核心物件 (真金幣與假金幣) 少到一定程度才刷下一波
+        if self.core_active <= self.stage(self.sim.score)['overlap']:
+            self.spawn_wave(self.sim.score, player)
+        sim = self.sim
+        for obj in self.active:
+            obj.handle_movement(player, sim)
+
+    def rebuild(self, steal=None):
+        """還原快照後依 is_active 重建場上列表與各池的空位"""
+        for type, pool in self.pools.items():
+            pool.reset_free()
+            if steal: pool.steal = steal.get(type, 0)
+        self.active = [obj for obj in self.all_falling_objects if obj.is_active]
+
+    def spawn(self, type, lane, y_offset, speed_bonus):
+        obj, reused = self.pools[type].acquire()
+        obj.spawn(lane, y_offset, speed_bonus)
+        if not reused: self.active.append(obj)
+        return obj
+
+    def spawn_wave(self, current_score, player):
+        rng = self.sim.rng
+        stage = self.stage(current_score)
+        lanes = rng.sample(range(NUM_LANES), NUM_LANES)
+        speed_div = stage['speed_div'] or self.sim.rules['wave_speed_div']
+        speed_bonus = current_score // speed_div
+        if stage['speed_max'] is not None: speed_bonus = min(speed_bonus, stage['speed_max'])
+
+        # 各軌道已佔用的高度 (本波)，防止物件與道具重疊
+        occupied = [[] for _ in range(NUM_LANES)]
+        gap = stage['prop_gap']
+        k = 0
+        for type, (base, per, cap) in stage['counts'].items():
+            count = min(cap, base + (current_score // per if per else 0))
+            for _ in range(count):
+                lane = lanes[k % NUM_LANES]
+                k += 1
+                y_off = rng.randint(0, stage['y_spread'])
+                # 物件比軌道多時同一軌道會放第二個，往上錯開避免重疊
+                while any(abs(y - (-self.pools[type].objects[0].h - y_off)) < gap for y in occupied[lane]):
+                    y_off += gap
+                obj = self.spawn(type, lane, y_off, speed_bonus)
+                occupied[lane].append(obj.y)
+
+        # 只有在玩家沒有任何特殊效果時，才允許生成新道具
+        if stage['props'] and player.invincible_timer <= 0 and player.fire_timer <= 0:
+            if rng.random() < stage['prop_chance']:
+                self.spawn_prop_safely(rng.choice(stage['props']), speed_bonus, occupied, stage)
+        self.active.sort(key=lambda obj: obj.index)
+
+    def spawn_prop_safely(self, type, speed_bonus, occupied, stage):
+        rng = self.sim.rng
+        h = self.pools[type].objects[0].h
+        gap = stage['prop_gap']
+        for _ in range(stage['prop_attempts']): # 嘗試尋找不衝突位置
+            l = rng.randint(0, NUM_LANES - 1)
+            y_o = rng.randint(0, stage['y_spread'])
+            temp_y = -h - y_o
+            if any(abs(y - temp_y) < gap for y in occupied[l]):
+                continue
+            obj = self.spawn(type, l, y_o, speed_bonus)
+            occupied[l].append(obj.y)
+            break
+
+# --- 碰撞 ---
+
+# 碰撞事件種類
+HIT_FIRE_FAKE = 'fire_f_coin'
+HIT_FIRE_COIN = 'fire_coin'
+HIT_COIN = 'coin'
+HIT_STAR = 'star'
+HIT_FLOWER = 'flower'
+HIT_FAKE = 'f_coin'
+
+# 玩家同一幀碰到多個物件時的處理順序 (先吃道具再判定假金幣)
+PLAYER_HIT_ORDER = {HIT_COIN: 0, HIT_STAR: 1, HIT_FLOWER: 2, HIT_FAKE: 3}
+
+# 遙測事件種類 (Simulation.telemetry.emit(種類, x, aux, value) 的第一個參數，見 telemetry.py)
+EVENT_CATCH = 1             # aux: 接住後的連擊數；value: 得分
+EVENT_MISS = 2              # 真金幣落地；value: 實際扣的分數 (負值)
+EVENT_COMBO_BREAK = 3       # value: 中斷時的連擊數
+EVENT_SHIELD_BLOCK = 4      # 護盾擋下假金幣；aux: 剩餘護盾
+EVENT_INVINCIBLE_BLOCK = 5  # 無敵時撞到假金幣
+EVENT_STAR = 6
+EVENT_FLOWER = 7
+EVENT_FIRE_FAKE = 8         # 火焰消滅假金幣；value: 得分
+EVENT_FIRE_COIN = 9         # 火焰誤傷真金幣
+EVENT_DEATH = 10
+
+class GridIndex:
+    """以 (軌道, 高度帶) 切成二維格子的空間索引 (broad-phase)
+
+    項目登記到它的矩形涵蓋的每一格；查詢時只看查詢矩形涵蓋的格子，
+    橫跨多格的項目只列出一次。畫面外的座標併入最邊緣的格子。
+    """
+    def __init__(self, cell_w=LANE_WIDTH, cell_h=BAND_HEIGHT, width=SCREEN_WIDTH, height=SCREEN_HEIGHT):
+        self.cell_w, self.cell_h = cell_w, cell_h
+        self.last_col = width // cell_w
+        self.last_row = height // cell_h
+        self.cells = [[] for _ in range((self.last_col + 1) * (self.last_row + 1))]
+        self.used = []          # 有項目的格子，clear() 只清這些
+        self.candidates = 0     # query() 列出的候選數累計 (量測 broad-phase 效果用)
+
+    def _span(self, x, y, w, h):
+        cw, ch, lc, lr = self.cell_w, self.cell_h, self.last_col, self.last_row
+        c0, c1 = int(x // cw), int((x + w) // cw)
+        r0, r1 = int(y // ch), int((y + h) // ch)
+        return (0 if c0 < 0 else (lc if c0 > lc else c0), 0 if c1 < 0 else (lc if c1 > lc else c1),
+                0 if r0 < 0 else (lr if r0 > lr else r0), 0 if r1 < 0 else (lr if r1 > lr else r1))
+
+    def clear(self):
+        cells = self.cells
+        for k in self.used:
+            cells[k].clear()
+        self.used.clear()
+
+    def insert(self, item, x, y, w, h):
+        c0, c1, r0, r1 = self._span(x, y, w, h)
+        cells, used, stride = self.cells, self.used, self.last_col + 1
+        for r in range(r0, r1 + 1):
+            for k in range(r * stride + c0, r * stride + c1 + 1):
+                cell = cells[k]
+                if not cell: used.append(k)
+                cell.append(item)
+
+    def fill(self, items, xs, ys, sizes):
+        """一次登記多個正方形項目；xs/ys/sizes[item] 為其左上角與邊長 (例如粒子池的索引與陣列)"""
+        cw, ch, lc, lr = self.cell_w, self.cell_h, self.last_col, self.last_row
+        cells, used, stride = self.cells, self.used, lc + 1
+        for item in items:
+            x, y, s = xs[item], ys[item], sizes[item]
+            c0, c1 = int(x // cw), int((x + s) // cw)
+            r0, r1 = int(y // ch), int((y + s) // ch)
+            if c0 < 0: c0 = 0
+            elif c0 > lc: c0 = lc
+            if c1 < 0: c1 = 0
+            elif c1 > lc: c1 = lc
+            if r0 < 0: r0 = 0
+            elif r0 > lr: r0 = lr
+            if r1 < 0: r1 = 0
+            elif r1 > lr: r1 = lr
+            for r in range(r0, r1 + 1):
+                for k in range(r * stride + c0, r * stride + c1 + 1):
+                    cell = cells[k]
+                    if not cell: used.append(k)
+                    cell.append(item)
+
+    def query(self, x, y, w, h):
+        """回傳與矩形涵蓋同樣格子的項目 (不重複，依格子順序)"""
+        c0, c1, r0, r1 = self._span(x, y, w, h)
+        cells, stride = self.cells, self.last_col + 1
+        if c0 == c1 and r0 == r1:
+            found = cells[r0 * stride + c0]
+        else:
+            found, seen = [], set()
+            for r in range(r0, r1 + 1):
+                for k in range(r * stride + c0, r * stride + c1 + 1):
+                    for item in cells[k]:
+                        if item not in seen:
+                            seen.add(item)
+                            found.append(item)
+        self.candidates += len(found)
+        return found
+
+# --- 模擬 ---
+
+class Simulation:
+    """一局 PLAYING 的完整規則
+
+    sizes: 各物件鍵對應的 (寬, 高)，預設與備用圖形相同。
+    masks: 各物件鍵對應的遮罩 (需提供 overlap(other, offset)，例如 pygame.mask.Mask)；
+           缺少遮罩時以矩形 (AABB) 判定。
+    rules: 覆寫 DEFAULT_RULES 中的難度曲線參數。
+    """
+    def __init__(self, seed=None, character_key='player', upgrades=None, sizes=None, masks=None,
+                 rules=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.upgrades = dict(DEFAULT_UPGRADES)
+        if upgrades: self.upgrades.update(upgrades)
+        self.rules = dict(DEFAULT_RULES)
+        if rules: self.rules.update(rules)
+        self.sizes = dict(DEFAULT_SIZES)
+        if sizes: self.sizes.update(sizes)
+        self.masks = masks or {}
+        self.player = SimPlayer(character_key, self.sizes[character_key], self.upgrades)
+        self.wave_system = SimWaveSystem(self)
+        self.particles = ParticlePool()
+        self.fire_index = GridIndex()
+        # 可選的分段計時器 (frame_profiler.FrameProfiler)，None 時不計時
+        self.profiler = None
+        # 可選的遊戲事件紀錄 (telemetry.TelemetryLog)，None 時不記錄；clone() 不會複製
+        self.telemetry = None
+        self.score = 0
+        self.combo = 0
+        self.max_combo = 0
+        self.frame = 0
+        self.game_over = False
+
+    def snapshot(self):
+        """目前狀態的完整快照 (只含可 JSON 序列化的值)
+
+        restore() 之後以相同輸入推進，結果與原本的模擬相同。
+        粒子只記錄存活的部分；還原後池中索引可能不同，但不影響結果。
+        """
+        player = self.player
+        pool = self.particles
+        version, state, gauss = self.rng.getstate()
+        return {
+            'frame': self.frame,
+            'score': self.score,
+            'combo': self.combo,
+            'max_combo': self.max_combo,
+            'game_over': self.game_over,
+            'rng': [version, list(state), gauss],
+            'player': [player.x, player.y, player.vel_y, player.is_jumping, player.shields,
+                       player.invincible_timer, player.fire_timer],
+            'objects': [[obj.x, obj.y, obj.speed, obj.is_active]
+                        for obj in self.wave_system.all_falling_objects],
+            'steal': {type: pool.steal for type, pool in self.wave_system.pools.items()},
+            'particles': [[pool.x[i], pool.y[i], pool.vx[i], pool.vy[i], pool.life[i], pool.size[i],
+                           pool.sprite[i]] for i in pool.live],
+        }
+
+    def restore(self, state):
+        """回到 snapshot() 記錄的狀態 (需為相同種子、角色、升級與規則建立的模擬)"""
+        self.frame = state['frame']
+        self.score = state['score']
+        self.combo = state['combo']
+        self.max_combo = state['max_combo']
+        self.game_over = state['game_over']
+        version, rng_state, gauss = state['rng']
+        self.rng.setstate((version, tuple(rng_state), gauss))
+        player = self.player
+        (player.x, player.y, player.vel_y, player.is_jumping, player.shields,
+         player.invincible_timer, player.fire_timer) = state['player']
+        for obj, (x, y, speed, active) in zip(self.wave_system.all_falling_objects, state['objects']):
+            obj.x, obj.y, obj.speed, obj.is_active = x, y, speed, active
+        self.wave_system.rebuild(state.get('steal'))
+        pool = self.particles
+        pool.clear()
+        for x, y, vx, vy, life, size, sprite in state['particles']:
+            i = pool.free.pop()
+            pool.x[i], pool.y[i], pool.vx[i], pool.vy[i] = x, y, vx, vy
+            pool.life[i], pool.size[i], pool.sprite[i] = life, size, sprite
+            pool.live.append(i)
+        return self
+
+    def clone(self):
+        """以相同設定建立一個新的模擬並複製目前狀態 (不含分段計時器)"""
+        other = Simulation(self.seed, self.player.mask_key, self.upgrades, self.sizes, self.masks, self.rules)
+        return other.copy_from(self)
+
+    def copy_from(self, other, rng_state=None):
+        """把 other (相同設定建立的模擬) 的狀態直接複製過來
+
+        不經過可序列化的中間格式，供前瞻搜尋反覆使用。
+        從同一個狀態複製多次時，可先取一次 other.rng.getstate() 傳入 rng_state
+        (取出亂數狀態是複製中最貴的一步)。粒子只複製存活的部分，池中索引可能不同但不影響結果。
+        """
+        self.frame = other.frame
+        self.score = other.score
+        self.combo = other.combo
+        self.max_combo = other.max_combo
+        self.game_over = other.game_over
+        self.rng.setstate(rng_state or other.rng.getstate())
+        p, q = self.player, other.player
+        p.x, p.y, p.vel_y, p.is_jumping = q.x, q.y, q.vel_y, q.is_jumping
+        p.shields, p.invincible_timer, p.fire_timer = q.shields, q.invincible_timer, q.fire_timer
+        waves, src = self.wave_system, other.wave_system
+        objects = waves.all_falling_objects
+        for a, b in zip(objects, src.all_falling_objects):
+            a.x, a.y, a.speed, a.is_active = b.x, b.y, b.speed, b.is_active
+        for type, pool in waves.pools.items():
+            pool.free[:] = src.pools[type].free
+            pool.steal = src.pools[type].steal
+        waves.active = [objects[obj.index] for obj in src.active]
+        waves.core_active = src.core_active
+        pool, sp = self.particles, other.particles
+        pool.clear()
+        for i in sp.live:
+            j = pool.free.pop()
+            pool.x[j], pool.y[j], pool.vx[j], pool.vy[j] = sp.x[i], sp.y[i], sp.vx[i], sp.vy[i]
+            pool.life[j], pool.size[j], pool.sprite[j] = sp.life[i], sp.size[i], sp.sprite[i]
+            pool.live.append(j)
+        return self
+
+    def collide(self, a, b):
+        if a.x >= b.x + b.w or b.x >= a.x + a.w or a.y >= b.y + b.h or b.y >= a.y + a.h:
+            return False
+        mask_a = self.masks.get(a.mask_key)
+        mask_b = self.masks.get(b.mask_key)
+        if mask_a is None or mask_b is None:
+            return True
+        return mask_a.overlap(mask_b, (b.x - a.x, b.y - a.y)) is not None
+
+    def fire_hits(self, i, b):
+        """粒子池第 i 顆粒子與 b 的碰撞"""
+        p = self.particles
+        x, y, size = p.x[i], p.y[i], p.size[i]
+        if x >= b.x + b.w or b.x >= x + size or y >= b.y + b.h or b.y >= y + size:
+            return False
+        mask_a = self.masks.get(('fire', size))
+        mask_b = self.masks.get(b.mask_key)
+        if mask_a is None or mask_b is None:
+            return True
+        return mask_a.overlap(mask_b, (b.x - x, b.y - y)) is not None
+
+    def step(self, inputs=0):
+        """推進一幀；回傳是否仍在進行中"""
+        if self.game_over:
+            return False
+        rng = self.rng
+        player = self.player
+        waves = self.wave_system
+        self.frame += 1
+
+        prof = self.profiler
+        player.update(inputs, self.score, self.rules['player_speed_div'])
+        if prof: prof.mark('player')
+        waves.update(player)
+        if prof: prof.mark('waves')
+
+        particles = self.particles
+        if player.fire_timer > 0:
+            # 每步的期望發射數，小數部分以機率決定
+            rate = self.rules['fire_emit_rate'] * SIM_DT
+            count = int(rate)
+            if rng.random() < rate - count: count += 1
+            life = seconds_to_steps(self.rules['fire_particle_lifetime'])
+            for _ in range(count):
+                particles.emit(player.centerx, player.y, rng, life)
+        particles.update()
+
+        self.apply_hits(self.find_hits())
+        if prof: prof.mark('collide')
+        return not self.game_over
+
+    def find_hits(self):
+        """單一碰撞階段：以格子索引篩出候選配對，再做矩形與遮罩判定
+
+        回傳依處理順序排列的 (事件種類, 物件) 列表：先火焰、再玩家
+        (金幣、星星、火焰花、假金幣)。火焰對真金幣每顆命中的粒子各一筆。
+        """
+        events = []
+        pool = self.particles
+        objects = [obj for obj in self.wave_system.active if obj.is_active]
+        if pool.live:
+            fire_index = self.fire_index
+            fire_index.clear()
+            fire_index.fill(pool.live, pool.x, pool.y, pool.size)
+            for obj in objects:
+                if obj.type == 'f_coin':
+                    for i in fire_index.query(obj.x, obj.y, obj.w, obj.h):
+                        if self.fire_hits(i, obj):
+                            events.append((HIT_FIRE_FAKE, obj))
+                            break
+                elif obj.type == 'coin':
+                    for i in fire_index.query(obj.x, obj.y, obj.w, obj.h):
+                        if self.fire_hits(i, obj):
+                            events.append((HIT_FIRE_COIN, obj))
+
+        if self.profiler: self.profiler.mark('fire')
+
+        # 玩家只有一個矩形：建索引本身就要走過所有物件，直接逐一判定 (collide 先比矩形)
+        player = self.player
+        touched = [obj for obj in objects if self.collide(player, obj)]
+        touched.sort(key=lambda obj: PLAYER_HIT_ORDER[obj.type])
+        events += [(obj.type, obj) for obj in touched]
+        return events
+
+    def apply_hits(self, events):
+        player = self.player
+        rng = self.rng
+        tel = self.telemetry
+        for kind, obj in events:
+            if not obj.is_active:
+                continue
+            if kind == HIT_FIRE_FAKE:
+                obj.is_active = False
+                self.score += 2 # 清理假金幣有額外獎勵
+                if tel: tel.emit(EVENT_FIRE_FAKE, obj.centerx, 0, 2)
+            elif kind == HIT_FIRE_COIN:
+                # 火焰擊中真金幣 (只有 10% 誤傷機率)
+                if rng.random() < 0.1:
+                    obj.is_active = False
+                    if tel: tel.emit(EVENT_FIRE_COIN, obj.centerx)
+            elif kind == HIT_COIN:
+                self.combo += 1
+                self.max_combo = max(self.max_combo, self.combo)
+                bonus = min(self.combo // 5, 5)
+                self.score += 10 * (1 + bonus)
+                obj.is_active = False
+                if tel: tel.emit(EVENT_CATCH, obj.centerx, self.combo, 10 * (1 + bonus))
+            elif kind == HIT_STAR:
+                player.invincible_timer = INVINCIBLE_STEPS
+                obj.is_active = False
+                if tel: tel.emit(EVENT_STAR, obj.centerx)
+            elif kind == HIT_FLOWER:
+                player.fire_timer = FIRE_STEPS
+                obj.is_active = False
+                if tel: tel.emit(EVENT_FLOWER, obj.centerx)
+            elif kind == HIT_FAKE:
+                if player.invincible_timer > 0:
+                    obj.is_active = False
+                    if tel: tel.emit(EVENT_INVINCIBLE_BLOCK, obj.centerx)
+                elif player.shields > 0:
+                    player.shields -= 1; obj.is_active = False
+                    if tel: tel.emit(EVENT_SHIELD_BLOCK, obj.centerx, player.shields)
+                else:
+                    self.game_over = True
+                    if tel: tel.emit(EVENT_DEATH, obj.centerx)
+                    break
+
+    def run(self, inputs, max_frames=None):
+        """以輸入序列 (可迭代的整數) 或策略函式 policy(sim) -> int 連續推進，直到結束"""
+        if callable(inputs):
+            policy = inputs
+            while not self.game_over and (max_frames is None or self.frame < max_frames):
+                self.step(policy(self))
+        else:
+            for value in inputs:
+                if self.game_over or (max_frames is not None and self.frame >= max_frames):
+                    break
+                self.step(value)
+        return self
@@ -0,0 +1,242 @@
+"""太空捕手 - 強化學習環境 (Gym 風格介面)
+
+SpaceCatcherEnv 包裝 sim_core.Simulation，規則與遊戲完全相同：
+
+    env = SpaceCatcherEnv()
+    obs = env.reset(seed=1)
+    obs, reward, done, info = env.step(action)
+
+動作 (ACTIONS 的索引)：0 不動、1 左、2 右、3 跳、4 左跳、5 右跳。
+獎勵為這一步的分數變化 (接金幣、火焰清除假金幣加分，漏接金幣扣分)；遊戲結束時 done。
+觀測為 float32 向量 (長度 OBS_SIZE)：
+    玩家 [x, y, 垂直速度, 是否跳躍中, 護盾, 無敵剩餘秒數, 火焰剩餘秒數, 分數/1000, 連擊/10]
+    每條軌道最靠近地面的 LANE_SLOTS 個物件，各為
+        [存在, 金幣, 假金幣, 星星, 火焰花, x, y, 速度]
+座標除以畫面寬高、速度除以 COIN_SPEED_BASE。
+
+VectorEnv 把 N 個環境分給多個子行程，觀測、動作、獎勵與 done 放在共享記憶體，
+每步只傳一個指令位元組；結束的環境自動以下一個種子重開。
+
+    venv = VectorEnv(64, workers=8, seed=0)
+    obs = venv.reset()
+    obs, rewards, dones, scores = venv.step(actions)
+
+預設載入遊戲圖片建立碰撞遮罩與物件尺寸 (每個行程一次)，碰撞判定與遊戲相同，找不到圖片時拋出錯誤；
+aabb=True 改用備用圖形尺寸的矩形判定 (較快，但物件比實際圖形大，與遊戲不同)。
+"""
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from sim_core import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, NUM_LANES, LANE_WIDTH, COIN_SPEED_BASE, SIM_HZ,
+    INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, Simulation,
+)
+
+ACTIONS = (0, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, INPUT_LEFT | INPUT_JUMP, INPUT_RIGHT | INPUT_JUMP)
+OBJECT_TYPES = ('coin', 'f_coin', 'star', 'flower')
+LANE_SLOTS = 3
+PLAYER_FEATURES = 9
+OBJECT_FEATURES = 3 + len(OBJECT_TYPES) + 1
+OBS_SIZE = PLAYER_FEATURES + NUM_LANES * LANE_SLOTS * OBJECT_FEATURES
+
+_game_collision = None
+
+def game_collision():
+    """遊戲圖片的 (遮罩, 尺寸)；同一個行程只載入一次"""
+    global _game_collision
+    if _game_collision is None:
+        from replay import load_game_masks
+        _game_collision = load_game_masks(strict=True)
+    return _game_collision
+
+class SpaceCatcherEnv:
+    """單一局的環境；max_steps 為每局步數上限 (達到時 done，info['truncated'] 為 True)
+
+    masks 省略時使用遊戲圖片的遮罩與尺寸 (sizes 可再覆寫)；aabb 為 True 時不載入，以矩形判定。
+    """
+    def __init__(self, character_key='player', upgrades=None, rules=None, masks=None, sizes=None,
+                 max_steps=None, aabb=False):
+        if masks is None and not aabb:
+            masks, game_sizes = game_collision()
+            sizes = {**game_sizes, **(sizes or {})}
+        self.character_key = character_key
+        self.upgrades = upgrades
+        self.rules = rules
+        self.masks = masks
+        self.sizes = sizes
+        self.max_steps = max_steps
+        self.sim = None
+        self.action_count = len(ACTIONS)
+        self.observation_shape = (OBS_SIZE,)
+
+    def reset(self, seed=None, out=None):
+        self.sim = Simulation(seed=seed, character_key=self.character_key, upgrades=self.upgrades,
+                              sizes=self.sizes, masks=self.masks, rules=self.rules)
+        return self.observe(out)
+
+    def step(self, action, out=None):
+        sim = self.sim
+        before = sim.score
+        sim.step(ACTIONS[action])
+        truncated = self.max_steps is not None and sim.frame >= self.max_steps and not sim.game_over
+        done = sim.game_over or truncated
+        info = {'score': sim.score, 'frame': sim.frame, 'truncated': truncated}
+        return self.observe(out), float(sim.score - before), done, info
+
+    def observe(self, out=None):
+        """把目前狀態寫入 out (長度 OBS_SIZE 的 float32 陣列，省略時新建) 並回傳"""
+        if out is None:
+            out = np.empty(OBS_SIZE, dtype=np.float32)
+        sim = self.sim
+        p = sim.player
+        out[:PLAYER_FEATURES] = (
+            p.x / SCREEN_WIDTH, p.y / SCREEN_HEIGHT, p.vel_y / COIN_SPEED_BASE, p.is_jumping, p.shields,
+            p.invincible_timer / SIM_HZ, p.fire_timer / SIM_HZ, sim.score / 1000, sim.combo / 10,
+        )
+        lanes = [[] for _ in range(NUM_LANES)]
+        for obj in sim.wave_system.active:
+            if obj.is_active:
+                lane = min(NUM_LANES - 1, max(0, obj.centerx // LANE_WIDTH))
+                lanes[lane].append(obj)
+        objects = out[PLAYER_FEATURES:].reshape(NUM_LANES, LANE_SLOTS, OBJECT_FEATURES)
+        objects[:] = 0
+        for lane, objs in enumerate(lanes):
+            # 最靠近地面 (y 最大) 的優先
+            objs.sort(key=lambda obj: -obj.y)
+            for slot, obj in enumerate(objs[:LANE_SLOTS]):
+                row = objects[lane, slot]
+                row[0] = 1
+                row[1 + OBJECT_TYPES.index(obj.type)] = 1
+                row[-3] = obj.x / SCREEN_WIDTH
+                row[-2] = obj.y / SCREEN_HEIGHT
+                row[-1] = obj.speed / COIN_SPEED_BASE
+        return out
+
+# --- 向量化 (子行程 + 共享記憶體) ---
+
+_STEP = b's'
+_RESET = b'r'
+_CLOSE = b'c'
+
+def _attach(name, shape, dtype):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def _worker(conn, names, n, lo, hi, seed, env_kwargs):
+    handles = []
+    arrays = []
+    for name, shape, dtype in names:
+        shm, arr = _attach(name, shape, dtype)
+        handles.append(shm)
+        arrays.append(arr)
+    obs, actions, rewards, dones, scores = arrays
+    envs = [SpaceCatcherEnv(**env_kwargs) for _ in range(lo, hi)]
+    # 第 i 個環境的第 k 局使用種子 seed + i + k * n，各局種子不重複
+    episodes = [0] * len(envs)
+    try:
+        while True:
+            cmd = conn.recv_bytes()
+            if cmd == _STEP:
+                for j, env in enumerate(envs):
+                    i = lo + j
+                    _, reward, done, info = env.step(int(actions[i]), obs[i])
+                    rewards[i] = reward
+                    dones[i] = done
+                    if done:
+                        scores[i] = info['score']
+                        episodes[j] += 1
+                        env.reset(seed + i + episodes[j] * n, obs[i])
+            elif cmd == _RESET:
+                for j, env in enumerate(envs):
+                    episodes[j] = 0
+                    env.reset(seed + lo + j, obs[lo + j])
+                dones[lo:hi] = False
+            else:
+                break
+            conn.send_bytes(b'k')
+    finally:
+        del obs, actions, rewards, dones, scores, arrays
+        for shm in handles:
+            shm.close()
+
+class VectorEnv:
+    """n 個環境平均分給 workers 個子行程
+
+    step(actions) 回傳 (觀測, 獎勵, done, 分數)：done 的環境已自動重開，
+    觀測為新一局的第一個觀測，分數為剛結束那一局的最終分數 (其他位置無意義)。
+    回傳的陣列直接指向共享記憶體，下一次 step 會被覆寫；需要保留時請自行複製。
+    env_kwargs 傳給每個 SpaceCatcherEnv：預設各子行程載入遊戲圖片的遮罩，aabb=True 改用矩形判定。
+    """
+    def __init__(self, n, workers=None, seed=0, **env_kwargs):
+        self.n = n
+        workers = max(1, min(n, workers or mp.cpu_count()))
+        specs = {
+            'obs': ((n, OBS_SIZE), np.float32),
+            'actions': ((n,), np.int64),
+            'rewards': ((n,), np.float32),
+            'dones': ((n,), np.bool_),
+            'scores': ((n,), np.int64),
+        }
+        self._shms = []
+        names = []
+        for key, (shape, dtype) in specs.items():
+            size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+            shm = shared_memory.SharedMemory(create=True, size=size)
+            self._shms.append(shm)
+            setattr(self, key, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+            names.append((shm.name, shape, dtype))
+        self.dones[:] = False
+
+        ctx = mp.get_context('spawn')
+        bounds = [n * w // workers for w in range(workers + 1)]
+        self._conns = []
+        self._procs = []
+        for w in range(workers):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_worker, daemon=True,
+                               args=(child, names, n, bounds[w], bounds[w + 1], seed, env_kwargs))
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+        self.closed = False
+
+    def _broadcast(self, cmd):
+        for conn in self._conns:
+            conn.send_bytes(cmd)
+        for conn in self._conns:
+            conn.recv_bytes()
+
+    def reset(self):
+        self._broadcast(_RESET)
+        return self.obs
+
+    def step(self, actions):
+        self.actions[:] = actions
+        self._broadcast(_STEP)
+        return self.obs, self.rewards, self.dones, self.scores
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        for conn in self._conns:
+            try:
+                conn.send_bytes(_CLOSE)
+            except (BrokenPipeError, OSError):
+                pass
+        for proc in self._procs:
+            proc.join(5)
+        for key in ('obs', 'actions', 'rewards', 'dones', 'scores'):
+            setattr(self, key, None)
+        for shm in self._shms:
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,104 @@
+"""太空捕手 - 視差星空背景
+
+每一層星星的位置存在 array 中，建立時一次畫進一張與畫面同大的圖塊 (黑色為透明色，RLE 加速)，
+之後每幀只依該層速度捲動圖塊：每層兩次 blit (上下銜接)，成本與星星數量無關
+(RLE 只處理非透明的像素；實測整頁填黑加上四層圖塊，比不透明圖塊整頁 blit 還便宜)。
+星星數量以每百萬像素的密度計算，大畫面也一樣密。
+
+遊戲進行中的畫面只更新變動區域 (DirtyRenderer)，整片捲動會讓每幀都變成整頁更新，
+因此那裡只畫最前面一層的星點 (draw_points，每顆回傳一個小矩形)。
+"""
+import random
+from array import array
+
+import pygame
+
+BLACK = (0, 0, 0)
+
+# (每百萬像素的星星數, 速度倍率, 亮度範圍, 尺寸)；由遠到近，最後一層也用於遊戲中的星點
+STAR_LAYERS = (
+    (2600, 0.3, (50, 110), 1),
+    (900, 0.8, (100, 180), 1),
+    (250, 1.6, (160, 240), 2),
+    (110, 2.5, (210, 255), 1),
+)
+# 星星的色調 (乘上亮度)：偏藍、白、偏黃
+STAR_TINTS = ((0.8, 0.85, 1.0), (1.0, 1.0, 1.0), (1.0, 0.95, 0.8))
+STAR_LEVELS = 8
+
+class StarLayer:
+    def __init__(self, width, height, count, speed, brightness, size, rng):
+        self.width = width
+        self.height = height
+        self.speed = speed
+        self.size = size
+        self.offset = 0.0
+        random = rng.random
+        self.xs = array('H', [int(random() * width) for _ in range(count)])
+        self.ys = array('H', [int(random() * height) for _ in range(count)])
+        # 亮度分成 STAR_LEVELS 階，每階每種色調一個顏色，星星從中挑選 (比逐顆計算快得多，啟動時較省時間)
+        lo, hi = brightness
+        palette = [tuple(min(255, int((lo + (hi - lo) * i / (STAR_LEVELS - 1)) * t)) for t in tint)
+                   for i in range(STAR_LEVELS) for tint in STAR_TINTS]
+        n = len(palette)
+        self.colors = [palette[int(random() * n)] for _ in range(count)]
+        self.tile = self.render()
+
+    def render(self):
+        # 直接以畫面的像素格式建立，省去 convert() 的整張複製
+        tile = pygame.Surface((self.width, self.height), 0, pygame.display.get_surface())
+        tile.fill(BLACK)
+        size = self.size
+        for x, y, color in zip(self.xs, self.ys, self.colors):
+            if size > 1:
+                # 較大的星星：實心核心加上暗一半的十字光暈
+                glow = tuple(c // 2 for c in color)
+                tile.fill(glow, (x - 1, y, size + 2, size))
+                tile.fill(glow, (x, y - 1, size, size + 2))
+            tile.fill(color, (x, y, size, size))
+        tile.set_colorkey(BLACK, pygame.RLEACCEL)
+        return tile
+
+    def update(self, distance):
+        self.offset = (self.offset + distance * self.speed) % self.height
+
+    def draw(self, surface):
+        y = int(self.offset)
+        surface.blit(self.tile, (0, y - self.height))
+        if y: surface.blit(self.tile, (0, y))
+
+    def draw_points(self, surface, step=1):
+        """把這一層的星點逐顆畫上 (不透過圖塊，每 step 顆畫一顆)；回傳每顆的矩形"""
+        y0 = int(self.offset)
+        h = self.height
+        size = self.size
+        fill = surface.fill
+        xs, ys, colors = (self.xs, self.ys, self.colors) if step == 1 else (self.xs[::step], self.ys[::step], self.colors[::step])
+        return [fill(color, (x, (y + y0) % h, size, size)) for x, y, color in zip(xs, ys, colors)]
+
+class Starfield:
+    """layers 由遠到近；drift 為速度倍率 1 時每秒移動的像素"""
+    def __init__(self, width, height, drift, layers=STAR_LAYERS, seed=None):
+        rng = random.Random(seed)
+        self.drift = drift
+        megapixels = width * height / 1_000_000
+        self.layers = [StarLayer(width, height, max(1, int(density * megapixels)), speed, brightness, size, rng)
+                       for density, speed, brightness, size in layers]
+
+    def __len__(self):
+        return sum(len(layer.xs) for layer in self.layers)
+
+    def update(self, dt):
+        distance = self.drift * dt
+        for layer in self.layers:
+            layer.update(distance)
+
+    def draw(self, surface, skip=0):
+        """填黑後畫出所有層 (略過最遠的 skip 層，最前面一層一定會畫)"""
+        surface.fill(BLACK)
+        for layer in self.layers[min(skip, len(self.layers) - 1):]:
+            layer.draw(surface)
+
+    def draw_points(self, surface, step=1):
+        """只畫最前面一層的星點 (遊戲中局部更新用，每 step 顆畫一顆)；回傳變動的矩形"""
+        return self.layers[-1].draw_points(surface, step)
@@ -0,0 +1,206 @@
+"""太空捕手 - 商店經濟與難度曲線的蒙地卡羅掃描
+
+對參數網格 (商店初始費用、費用成長倍率、難度曲線除數) 的每一組設定，
+以腳本機器人連續遊玩多局並在局間購買升級，統計平均分數、存活時間，
+以及升到各等級時累積賺到的代幣。
+
+碰撞與遊戲相同：主行程載入一次遊戲圖片建立的遮罩與尺寸，交給每個子行程；
+找不到遊戲圖片時直接報錯，不會退回矩形判定 (預設尺寸的矩形判定下存活時間短一個數量級)。
+
+各組設定分散到所有核心的行程池執行，完成一組就追加一行 JSON 到輸出檔；
+中斷後以同一個輸出檔重新執行，會跳過已完成的設定繼續掃描。
+是否完成以 (設定、campaign 數、每個 campaign 的局數) 判斷，改了局數會重新掃描。
+
+    python sweep.py results.jsonl --campaigns 8 --sessions 30
+"""
+import argparse
+import copy
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from replay import load_game_masks, pack_masks, unpack_masks
+from sim_core import (
+    SIM_HZ, INPUT_LEFT, INPUT_RIGHT, SHOP_DEFAULTS, SHOP_COST_GROWTH, DEFAULT_RULES,
+    Simulation, buy_upgrade,
+)
+
+# 單局上限 (步)，避免機器人在低難度下永遠玩不完
+MAX_SESSION_FRAMES = SIM_HZ * 60 * 10
+
+# 預設掃描網格
+DEFAULT_GRID = {
+    'magnet_cost': [60, 100, 150],
+    'shield_cost': [120, 200, 300],
+    'speed_cost': [30, 50, 80],
+    'cost_growth': [1.2, SHOP_COST_GROWTH, 1.5],
+    'wave_speed_div': [100, DEFAULT_RULES['wave_speed_div'], 200],
+    'player_speed_div': [DEFAULT_RULES['player_speed_div']],
+}
+
+def param_grid(grid):
+    """展開網格為設定 dict 的列表 (順序固定)"""
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+def config_id(config):
+    """設定的雜湊 (決定種子)"""
+    return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+def run_id(config, campaigns, sessions):
+    """續跑用的鍵：同一組設定以不同的樣本數執行視為不同的結果"""
+    key = {'config': config, 'campaigns': campaigns, 'sessions': sessions}
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()[:16]
+
+# 子行程的碰撞遮罩與尺寸 (由 init_worker 設定)
+_collision = {}
+
+def init_worker(packed_masks, sizes):
+    _collision['masks'] = unpack_masks(packed_masks)
+    _collision['sizes'] = sizes
+
+def chase_bot(sim):
+    """腳本機器人：追著真金幣或道具所在的 x 移動，頭上有假金幣時往空的一側閃避"""
+    player = sim.player
+    px, pw = player.x, player.w
+    for f in sim.wave_system.f_coins:
+        if f.is_active and f.y + f.h > player.y - 250 and f.x < px + pw and px < f.x + f.w:
+            return INPUT_RIGHT if f.centerx < player.centerx else INPUT_LEFT
+    target = None
+    for obj in sim.wave_system.all_falling_objects:
+        if obj.is_active and obj.type != 'f_coin' and (target is None or obj.y > target.y):
+            target = obj
+    if target is None:
+        return 0
+    dx = target.centerx - player.centerx
+    if dx < -10: return INPUT_LEFT
+    if dx > 10: return INPUT_RIGHT
+    return 0
+
+def run_campaign(config, seed, sessions, masks, sizes, bot=chase_bot):
+    """從零開始連玩 sessions 局，局間以最便宜優先購買升級"""
+    shop = copy.deepcopy(SHOP_DEFAULTS)
+    for key, item in shop.items():
+        item['cost'] = config.get(key + '_cost', item['cost'])
+        item['level'] = 0
+    rules = {k: config[k] for k in DEFAULT_RULES if k in config}
+    growth = config.get('cost_growth', SHOP_COST_GROWTH)
+
+    tokens = 0
+    earned = 0
+    scores, frames = [], []
+    tokens_to_level = {key: [] for key in shop}
+    for i in range(sessions):
+        sim = Simulation(seed=seed * 100003 + i,
+                         upgrades={key: item['level'] for key, item in shop.items()},
+                         rules=rules, masks=masks, sizes=sizes)
+        sim.run(bot, max_frames=MAX_SESSION_FRAMES)
+        scores.append(sim.score)
+        frames.append(sim.frame)
+        tokens += sim.score
+        earned += sim.score
+        while True:
+            affordable = [k for k, item in shop.items() if item['level'] < item['max'] and tokens >= item['cost']]
+            if not affordable:
+                break
+            key = min(affordable, key=lambda k: shop[k]['cost'])
+            tokens = buy_upgrade(shop[key], tokens, growth)
+            tokens_to_level[key].append(earned)
+    return scores, frames, tokens_to_level
+
+def run_config(config, campaigns, sessions, masks=None, sizes=None):
+    """單一設定的工作函式 (在子行程中執行；masks / sizes 省略時使用 init_worker 設定的)"""
+    if masks is None:
+        if not _collision:
+            raise RuntimeError('子行程沒有碰撞遮罩 (請以 init_worker 初始化)')
+        masks, sizes = _collision['masks'], _collision['sizes']
+    base_seed = int(config_id(config), 16) % (2**31)
+    scores, frames = [], []
+    levels = {key: [] for key in SHOP_DEFAULTS}
+    for c in range(campaigns):
+        s, f, t = run_campaign(config, base_seed + c, sessions, masks, sizes)
+        scores += s
+        frames += f
+        for key, values in t.items():
+            levels[key].append(values)
+
+    def mean(values):
+        return sum(values) / len(values) if values else None
+
+    tokens_per_level = {}
+    for key, runs in levels.items():
+        depth = max((len(r) for r in runs), default=0)
+        # 第 n 級：有升到該級的 campaign 中，購買當下累積賺到的代幣平均
+        tokens_per_level[key] = [mean([r[n] for r in runs if len(r) > n]) for n in range(depth)]
+    return {
+        'id': run_id(config, campaigns, sessions),
+        'config': config,
+        'campaigns': campaigns,
+        'sessions': sessions,
+        'mean_score': mean(scores),
+        'mean_survival_s': mean(frames) / SIM_HZ,
+        'tokens_per_level': tokens_per_level,
+    }
+
+def load_done(path):
+    """讀取已完成的設定 id；忽略中斷時寫了一半的最後一行"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as fp:
+        for line in fp:
+            try:
+                done.add(json.loads(line)['id'])
+            except (ValueError, KeyError):
+                pass
+    return done
+
+def trim_partial_line(path):
+    """截掉中斷時沒寫完的最後一行，避免新結果接在殘行後面"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb+') as fp:
+        data = fp.read()
+        if data and not data.endswith(b'\n'):
+            fp.truncate(data.rfind(b'\n') + 1)
+
+def run_sweep(grid, out_path, campaigns=4, sessions=20, processes=None):
+    """掃描整個網格，逐筆追加結果到 out_path；回傳本次新完成的筆數"""
+    trim_partial_line(out_path)
+    done = load_done(out_path)
+    todo = [c for c in param_grid(grid) if run_id(c, campaigns, sessions) not in done]
+    if not todo:
+        return 0
+    masks, sizes = load_game_masks(strict=True)
+    completed = 0
+    with open(out_path, 'a', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                                initargs=(pack_masks(masks), sizes)) as pool:
+        futures = [pool.submit(run_config, c, campaigns, sessions) for c in todo]
+        for future in as_completed(futures):
+            out.write(json.dumps(future.result(), ensure_ascii=False) + '\n')
+            out.flush()
+            completed += 1
+    return completed
+
+def main():
+    parser = argparse.ArgumentParser(description='商店經濟與難度曲線掃描')
+    parser.add_argument('out', help='結果輸出 (JSON Lines，可續跑)')
+    parser.add_argument('--grid', help='以 JSON 檔覆寫預設網格')
+    parser.add_argument('--campaigns', type=int, default=4)
+    parser.add_argument('--sessions', type=int, default=20)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    grid = dict(DEFAULT_GRID)
+    if args.grid:
+        with open(args.grid, encoding='utf-8') as fp:
+            grid.update(json.load(fp))
+    total = len(param_grid(grid))
+    n = run_sweep(grid, args.out, args.campaigns, args.sessions, args.processes)
+    print(f"完成 {n} 組設定 (網格共 {total} 組) -> {args.out}")
+
+if __name__ == "__main__":
+    main()
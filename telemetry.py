@@ -0,0 +1,226 @@
+"""太空捕手 - 遊戲事件紀錄 (遙測)
+
+每個事件是一筆固定欄位的紀錄：局號、步數、種類、軌道 (或商店項目)、aux、value、當時分數。
+紀錄直接附加在各欄位的 array 上 (每欄一個型別固定的陣列)，累積 CHUNK_RECORDS 筆
+就整塊交給背景執行緒壓縮並寫入檔案；遊戲迴圈裡只有幾次 append，沒有 I/O 也不建立物件。
+
+檔案格式 (欄式分塊，每塊可獨立讀取，程式中途結束最多只損失最後不完整的一塊)：
+    MAGIC (4 bytes) | version, 標頭長度 (<II) | 標頭 JSON (欄位名稱與型別、商店項目、角色)
+    | 區塊 * N：筆數, 欄數 (<II)，接著每欄 壓縮後長度 (<I) + zlib(小端序的欄位資料)
+
+事件種類見 sim_core 的 EVENT_*，另外加上局的開始 / 結束與商店購買。
+統計見 telemetry_report.py。
+"""
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from time import strftime
+
+from sim_core import (
+    NUM_LANES, LANE_WIDTH,
+    EVENT_CATCH, EVENT_MISS, EVENT_COMBO_BREAK, EVENT_SHIELD_BLOCK, EVENT_INVINCIBLE_BLOCK,
+    EVENT_STAR, EVENT_FLOWER, EVENT_FIRE_FAKE, EVENT_FIRE_COIN, EVENT_DEATH,
+)
+
+EVENT_SESSION_START = 16    # slot: 角色；value: 升級 (磁鐵 | 護盾 << 4 | 動力 << 8)
+EVENT_SESSION_END = 17      # aux: 旗標 (FLAG_AUTOPILOT)；value: 最高連擊
+EVENT_PURCHASE = 18         # slot: 商店項目；aux: 購買後等級；value: 費用；score: 剩餘代幣
+
+EVENT_NAMES = {
+    EVENT_CATCH: 'catch', EVENT_MISS: 'miss', EVENT_COMBO_BREAK: 'combo_break',
+    EVENT_SHIELD_BLOCK: 'shield_block', EVENT_INVINCIBLE_BLOCK: 'invincible_block',
+    EVENT_STAR: 'star', EVENT_FLOWER: 'flower', EVENT_FIRE_FAKE: 'fire_fake', EVENT_FIRE_COIN: 'fire_coin',
+    EVENT_DEATH: 'death', EVENT_SESSION_START: 'session_start', EVENT_SESSION_END: 'session_end',
+    EVENT_PURCHASE: 'purchase',
+}
+
+FLAG_AUTOPILOT = 1
+
+MAGIC = b'SCTL'
+VERSION = 1
+FILE_HEADER = struct.Struct('<II')
+CHUNK_HEADER = struct.Struct('<II')
+COLUMN_HEADER = struct.Struct('<I')
+EXTENSION = '.tlm'
+
+# (欄位名稱, array 型別碼)；型別碼在標頭中記錄，讀取端據此還原
+COLUMNS = (
+    ('session', 'I'),
+    ('frame', 'I'),
+    ('kind', 'B'),
+    ('slot', 'B'),
+    ('aux', 'i'),
+    ('value', 'i'),
+    ('score', 'i'),
+)
+CHUNK_RECORDS = 8192
+
+CHARACTERS = ('player', 'player_2')
+SHOP_ITEMS = ('magnet', 'shield', 'speed')
+
+def pack_upgrades(upgrades):
+    return upgrades.get('magnet', 0) | upgrades.get('shield', 0) << 4 | upgrades.get('speed', 0) << 8
+
+class TelemetryLog:
+    """寫入 directory 下以開始時間命名的一個檔案；begin_session(sim) 之後模擬的事件自動記錄"""
+    def __init__(self, directory, chunk_records=CHUNK_RECORDS):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, strftime('%Y%m%d-%H%M%S') + EXTENSION)
+        self.chunk_records = chunk_records
+        self.session = 0
+        self.sim = None
+        self.records = 0
+        self.dropped = 0
+        self.error = None
+        self._new_chunk()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._writer, name='telemetry', daemon=True)
+        self.thread.start()
+
+    def _new_chunk(self):
+        self.columns = [array(code) for _, code in COLUMNS]
+        self._appends = tuple(col.append for col in self.columns)
+        self.count = 0
+
+    # --- 記錄 (遊戲迴圈中呼叫) ---
+
+    def emit(self, kind, x=0, aux=0, value=0):
+        """模擬事件 (由 sim_core 呼叫)：x 為物件中心，換算成軌道"""
+        sim = self.sim
+        lane = x // LANE_WIDTH
+        a_session, a_frame, a_kind, a_slot, a_aux, a_value, a_score = self._appends
+        a_session(self.session)
+        a_frame(sim.frame)
+        a_kind(kind)
+        a_slot(0 if lane < 0 else (NUM_LANES - 1 if lane >= NUM_LANES else lane))
+        a_aux(aux)
+        a_value(value)
+        a_score(sim.score)
+        self.count += 1
+        if self.count >= self.chunk_records:
+            self.flush()
+
+    def record(self, kind, slot=0, aux=0, value=0, score=None):
+        """一般事件；步數取自目前的局 (沒有進行中的局時為 0)，score 省略時為目前分數"""
+        sim = self.sim
+        if score is None: score = sim.score if sim else 0
+        for append, v in zip(self._appends, (self.session, sim.frame if sim else 0, kind, slot, aux, value, score)):
+            append(v)
+        self.count += 1
+        if self.count >= self.chunk_records:
+            self.flush()
+
+    def begin_session(self, sim):
+        if self.sim is not None: self.end_session()
+        self.session += 1
+        self.sim = sim
+        sim.telemetry = self
+        char = CHARACTERS.index(sim.player.mask_key) if sim.player.mask_key in CHARACTERS else 255
+        self.record(EVENT_SESSION_START, char, 0, pack_upgrades(sim.upgrades))
+
+    def end_session(self, flags=0):
+        """記錄這一局的結束並把目前的區塊交給背景寫入；沒有進行中的局時不做任何事"""
+        sim = self.sim
+        if sim is None:
+            return
+        self.record(EVENT_SESSION_END, 0, flags, sim.max_combo)
+        sim.telemetry = None
+        self.sim = None
+        self.flush()
+
+    def purchase(self, key, level, cost, tokens):
+        slot = SHOP_ITEMS.index(key) if key in SHOP_ITEMS else 255
+        self.record(EVENT_PURCHASE, slot, level, cost, tokens)
+
+    def flush(self):
+        """把目前累積的紀錄交給背景執行緒 (不等待寫入完成)"""
+        if not self.count:
+            return
+        self.records += self.count
+        self.queue.put(self.columns)
+        self._new_chunk()
+
+    def close(self, timeout=5.0):
+        self.end_session()
+        self.flush()
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join(timeout)
+
+    # --- 背景寫入 ---
+
+    def _writer(self):
+        fp = None
+        while True:
+            columns = self.queue.get()
+            if columns is None:
+                break
+            try:
+                if fp is None:
+                    fp = open(self.path, 'ab')
+                    head = json.dumps({'columns': COLUMNS, 'characters': CHARACTERS, 'shop_items': SHOP_ITEMS,
+                                       'lanes': NUM_LANES}).encode('utf-8')
+                    fp.write(MAGIC + FILE_HEADER.pack(VERSION, len(head)) + head)
+                fp.write(encode_chunk(columns))
+                fp.flush()
+            except OSError as e:
+                # 寫不進去時丟棄這一塊，不影響遊戲
+                if self.error is None: print(f"遙測寫入失敗: {e}", file=sys.stderr)
+                self.error = e
+                self.dropped += len(columns[0])
+        if fp is not None:
+            fp.close()
+
+def encode_chunk(columns):
+    parts = [CHUNK_HEADER.pack(len(columns[0]), len(columns))]
+    for col in columns:
+        if sys.byteorder == 'big': col.byteswap()
+        data = zlib.compress(col.tobytes(), 1)
+        parts.append(COLUMN_HEADER.pack(len(data)))
+        parts.append(data)
+    return b''.join(parts)
+
+def read_chunks(path):
+    """逐塊讀取檔案，每塊回傳 (標頭, {欄位名稱: array})；結尾不完整的區塊略過"""
+    with open(path, 'rb') as fp:
+        if fp.read(4) != MAGIC:
+            raise ValueError(f'{path}: 不是遙測檔')
+        version, head_len = FILE_HEADER.unpack(fp.read(FILE_HEADER.size))
+        if version != VERSION:
+            raise ValueError(f'{path}: 不支援的版本 {version}')
+        header = json.loads(fp.read(head_len).decode('utf-8'))
+        columns = header['columns']
+        while True:
+            raw = fp.read(CHUNK_HEADER.size)
+            if len(raw) < CHUNK_HEADER.size:
+                return
+            count, ncols = CHUNK_HEADER.unpack(raw)
+            chunk = {}
+            try:
+                for name, code in columns[:ncols]:
+                    size, = COLUMN_HEADER.unpack(fp.read(COLUMN_HEADER.size))
+                    data = fp.read(size)
+                    if len(data) < size:
+                        return
+                    col = array(code, zlib.decompress(data))
+                    if sys.byteorder == 'big': col.byteswap()
+                    chunk[name] = col
+            except (struct.error, zlib.error):
+                return
+            if any(len(col) != count for col in chunk.values()):
+                return
+            yield header, chunk
+
+def telemetry_paths(targets):
+    for target in targets:
+        if os.path.isdir(target):
+            for name in sorted(os.listdir(target)):
+                if name.endswith(EXTENSION):
+                    yield os.path.join(target, name)
+        else:
+            yield target
@@ -0,0 +1,203 @@
+"""太空捕手 - 遙測統計
+
+逐塊讀取 telemetry.py 寫出的檔案，每塊以 NumPy 累加進固定大小的統計表，
+記憶體用量與檔案大小無關 (只保留計數，不保留事件本身)。
+
+    python telemetry_report.py telemetry/              # 統計資料夾內所有檔案
+    python telemetry_report.py telemetry/ --json out.json
+
+報表內容：
+    每個分數區間 (SCORE_BAND 分) 的接住、漏接、漏接率、護盾 / 無敵擋下、死亡、道具與火焰事件
+    每分鐘的漏接率 (同一局的時間軸)
+    連擊中斷時的連擊數分布 (依計分加成級距)
+    每局的分數、長度、最高連擊；商店各項目各等級的購買次數與平均費用
+"""
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from sim_core import SIM_HZ, NUM_LANES
+from telemetry import (
+    EVENT_CATCH, EVENT_MISS, EVENT_COMBO_BREAK, EVENT_SHIELD_BLOCK, EVENT_INVINCIBLE_BLOCK,
+    EVENT_STAR, EVENT_FLOWER, EVENT_FIRE_FAKE, EVENT_FIRE_COIN, EVENT_DEATH,
+    EVENT_SESSION_END, EVENT_PURCHASE, EVENT_NAMES, FLAG_AUTOPILOT, SHOP_ITEMS,
+    read_chunks, telemetry_paths,
+)
+
+SCORE_BAND = 500
+KINDS = max(EVENT_NAMES) + 1
+# 連擊數 // 5 即計分加成 (上限 5)
+COMBO_LEVELS = 6
+# 每局分數的直方圖區間
+SESSION_BAND = 1000
+
+def grow(table, rows):
+    """讓二維計數表至少有 rows 列"""
+    if rows <= len(table):
+        return table
+    extra = np.zeros((rows - len(table),) + table.shape[1:], dtype=table.dtype)
+    return np.concatenate([table, extra])
+
+def bincount_2d(table, rows, cols, width):
+    """把 (rows, cols) 配對的出現次數加進 table (width 欄)"""
+    if not len(rows):
+        return table
+    table = grow(table, int(rows.max()) + 1)
+    counts = np.bincount(rows * width + cols, minlength=len(table) * width)
+    table += counts[:len(table) * width].reshape(len(table), width)
+    return table
+
+class BalanceStats:
+    def __init__(self):
+        self.by_band = np.zeros((1, KINDS), dtype=np.int64)
+        self.by_minute = np.zeros((1, KINDS), dtype=np.int64)
+        self.by_lane = np.zeros((NUM_LANES, KINDS), dtype=np.int64)
+        self.combo_breaks = np.zeros(COMBO_LEVELS, dtype=np.int64)
+        self.combo_break_sum = 0
+        self.session_scores = np.zeros(1, dtype=np.int64)
+        self.sessions = 0
+        self.autopilot_sessions = 0
+        self.total_score = 0
+        self.total_frames = 0
+        self.best_score = 0
+        self.best_combo = 0
+        self.purchases = {}
+        self.records = 0
+        self.chunks = 0
+
+    def add(self, chunk):
+        kind = np.frombuffer(chunk['kind'], dtype=np.uint8).astype(np.int64)
+        score = np.frombuffer(chunk['score'], dtype=np.int32).astype(np.int64)
+        frame = np.frombuffer(chunk['frame'], dtype=np.uint32).astype(np.int64)
+        slot = np.frombuffer(chunk['slot'], dtype=np.uint8).astype(np.int64)
+        aux = np.frombuffer(chunk['aux'], dtype=np.int32)
+        value = np.frombuffer(chunk['value'], dtype=np.int32).astype(np.int64)
+        self.records += len(kind)
+        self.chunks += 1
+
+        sim_events = kind < EVENT_DEATH + 1
+        k = kind[sim_events]
+        self.by_band = bincount_2d(self.by_band, score[sim_events] // SCORE_BAND, k, KINDS)
+        self.by_minute = bincount_2d(self.by_minute, frame[sim_events] // (60 * SIM_HZ), k, KINDS)
+        self.by_lane = bincount_2d(self.by_lane, slot[sim_events], k, KINDS)
+
+        breaks = value[kind == EVENT_COMBO_BREAK]
+        self.combo_breaks += np.bincount(np.minimum(breaks // 5, COMBO_LEVELS - 1), minlength=COMBO_LEVELS)
+        self.combo_break_sum += int(breaks.sum())
+
+        ends = kind == EVENT_SESSION_END
+        if ends.any():
+            end_scores = score[ends]
+            self.sessions += int(ends.sum())
+            self.autopilot_sessions += int(((aux[ends] & FLAG_AUTOPILOT) != 0).sum())
+            self.total_score += int(end_scores.sum())
+            self.total_frames += int(frame[ends].sum())
+            self.best_score = max(self.best_score, int(end_scores.max()))
+            self.best_combo = max(self.best_combo, int(value[ends].max()))
+            bands = end_scores // SESSION_BAND
+            self.session_scores = grow(self.session_scores, int(bands.max()) + 1)
+            self.session_scores += np.bincount(bands, minlength=len(self.session_scores))
+
+        buys = np.flatnonzero(kind == EVENT_PURCHASE)
+        for i in buys:
+            key = (int(slot[i]), int(aux[i]))
+            count, cost = self.purchases.get(key, (0, 0))
+            self.purchases[key] = (count + 1, cost + int(value[i]))
+
+    # --- 報表 ---
+
+    def band_rows(self, table, label):
+        rows = []
+        for i, counts in enumerate(table):
+            catches, misses = int(counts[EVENT_CATCH]), int(counts[EVENT_MISS])
+            if not counts.any():
+                continue
+            rows.append({
+                label: i,
+                'catch': catches,
+                'miss': misses,
+                'miss_rate': misses / (catches + misses) if catches + misses else 0.0,
+                'shield_block': int(counts[EVENT_SHIELD_BLOCK]),
+                'invincible_block': int(counts[EVENT_INVINCIBLE_BLOCK]),
+                'death': int(counts[EVENT_DEATH]),
+                'star': int(counts[EVENT_STAR]),
+                'flower': int(counts[EVENT_FLOWER]),
+                'fire_fake': int(counts[EVENT_FIRE_FAKE]),
+                'fire_coin': int(counts[EVENT_FIRE_COIN]),
+            })
+        return rows
+
+    def report(self):
+        breaks = int(self.combo_breaks.sum())
+        return {
+            'records': self.records,
+            'sessions': self.sessions,
+            'autopilot_sessions': self.autopilot_sessions,
+            'mean_score': self.total_score / self.sessions if self.sessions else 0.0,
+            'mean_seconds': self.total_frames / SIM_HZ / self.sessions if self.sessions else 0.0,
+            'best_score': self.best_score,
+            'best_combo': self.best_combo,
+            'score_histogram': {f'{i * SESSION_BAND}-{(i + 1) * SESSION_BAND - 1}': int(n)
+                                for i, n in enumerate(self.session_scores) if n},
+            'by_score': self.band_rows(self.by_band, 'band'),
+            'by_minute': self.band_rows(self.by_minute, 'minute'),
+            'by_lane': self.band_rows(self.by_lane, 'lane'),
+            'combo_breaks': breaks,
+            'mean_combo_at_break': self.combo_break_sum / breaks if breaks else 0.0,
+            'combo_break_levels': [int(n) for n in self.combo_breaks],
+            'purchases': [{'item': SHOP_ITEMS[slot] if slot < len(SHOP_ITEMS) else slot, 'level': level,
+                           'count': count, 'mean_cost': cost / count}
+                          for (slot, level), (count, cost) in sorted(self.purchases.items())],
+        }
+
+def print_rows(rows, label, title, scale=1):
+    print(f"\n{title}")
+    print(f"{label:>10}{'接住':>8}{'漏接':>8}{'漏接率':>8}{'護盾':>6}{'無敵':>6}{'死亡':>6}{'星星':>6}{'火焰花':>6}"
+          f"{'燒假幣':>8}{'燒真幣':>8}")
+    for row in rows:
+        key = row[label]
+        name = f'{key * scale}-{(key + 1) * scale - 1}' if scale > 1 else str(key)
+        print(f"{name:>10}{row['catch']:>8}{row['miss']:>8}{row['miss_rate']:>8.1%}{row['shield_block']:>6}"
+              f"{row['invincible_block']:>6}{row['death']:>6}{row['star']:>6}{row['flower']:>6}"
+              f"{row['fire_fake']:>8}{row['fire_coin']:>8}")
+
+def print_report(report):
+    print(f"{report['records']} 筆事件，{report['sessions']} 局 (自動駕駛 {report['autopilot_sessions']} 局)")
+    print(f"平均分數 {report['mean_score']:.0f}，平均 {report['mean_seconds']:.1f} 秒，"
+          f"最高分 {report['best_score']}，最高連擊 {report['best_combo']}")
+    if report['score_histogram']:
+        print("分數分布：" + '，'.join(f'{k}: {n}' for k, n in report['score_histogram'].items()))
+    print_rows(report['by_score'], 'band', '依分數區間', SCORE_BAND)
+    print_rows(report['by_minute'], 'minute', '依遊戲時間 (分鐘)')
+    print_rows(report['by_lane'], 'lane', '依軌道')
+    print(f"\n連擊中斷 {report['combo_breaks']} 次，中斷時平均連擊 {report['mean_combo_at_break']:.1f}；"
+          f"依加成級距 (連擊 // 5)：{report['combo_break_levels']}")
+    if report['purchases']:
+        print("\n商店購買")
+        for row in report['purchases']:
+            print(f"  {row['item']} LV{row['level']}: {row['count']} 次，平均費用 {row['mean_cost']:.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='遙測統計')
+    parser.add_argument('targets', nargs='+', help='遙測檔或資料夾')
+    parser.add_argument('--json', help='另存統計結果 (JSON)')
+    args = parser.parse_args()
+
+    stats = BalanceStats()
+    for path in telemetry_paths(args.targets):
+        try:
+            for _, chunk in read_chunks(path):
+                stats.add(chunk)
+        except (OSError, ValueError) as e:
+            print(f"{path}: 無法讀取 ({e})", file=sys.stderr)
+    report = stats.report()
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as fp:
+            json.dump(report, fp, ensure_ascii=False, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
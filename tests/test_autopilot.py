@@ -0,0 +1,56 @@
+from autopilot import Autopilot
+from sim_core import Simulation
+
+def test_repeated_calls_within_a_step_reuse_the_plan():
+    """遊戲以高於模擬的更新率呼叫：同一步內的重複呼叫不重新規劃，也回傳同一個動作"""
+    pilot = Autopilot(depth=2, hold=6)
+    sim = Simulation(seed=3)
+    for _ in range(300):
+        actions = {pilot(sim) for _ in range(3)}
+        assert len(actions) == 1
+        if not sim.step(actions.pop()):
+            break
+    assert pilot.decisions <= sim.frame // pilot.hold + 1
+
+def test_same_result_as_one_call_per_step():
+    def play(calls_per_step):
+        pilot = Autopilot(depth=2, hold=6)
+        sim = Simulation(seed=5)
+        for _ in range(240):
+            for _ in range(calls_per_step):
+                action = pilot(sim)
+            if not sim.step(action):
+                break
+        return sim.frame, sim.score, pilot.decisions
+
+    assert play(1) == play(3)
+
+def test_several_steps_per_call_consume_the_plan():
+    pilot = Autopilot(depth=2, hold=6)
+    sim = Simulation(seed=7)
+    for _ in range(60):
+        action = pilot(sim)
+        for _ in range(3):
+            if not sim.step(action):
+                break
+        if sim.game_over:
+            break
+    # 每次呼叫推進 3 步，每 hold 步規劃一次
+    assert pilot.decisions <= sim.frame // pilot.hold + 1
+
+def test_spread_search_matches_unbudgeted_search():
+    """預算分散在 hold 步裡時，下一次規劃以預測的狀態為根；預算足夠時結果與不限時間相同"""
+    def play(budget):
+        pilot = Autopilot(depth=2, hold=6, budget=budget)
+        sim = Simulation(seed=11)
+        sim.run(pilot, max_frames=300)
+        return sim.frame, sim.score, pilot.reached
+
+    assert play(None) == play(60)
+
+def test_futures_per_decision_under_budget():
+    # 30 毫秒分成 6 段，每步 5 毫秒；完整搜完 3 層 (逐層加深共 4 + 16 + 64 個候選未來) 約需 10 毫秒
+    pilot = Autopilot(depth=3, hold=6, budget=0.03)
+    sim = Simulation(seed=2)
+    sim.run(pilot, max_frames=600)
+    assert pilot.futures / pilot.decisions >= 64
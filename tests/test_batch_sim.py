@@ -0,0 +1,23 @@
+import statistics
+
+from batch_sim import BatchSimulation
+from replay import load_game_masks
+from sim_core import INPUT_LEFT, Simulation
+
+def test_default_hitboxes_follow_the_game_masks():
+    # 站著不動時，遊戲的遮罩下假金幣從玩家兩側擦過；整張圖的矩形會撞上
+    masks, sizes = load_game_masks(strict=True)
+    scalar = [Simulation(seed=s, masks=masks, sizes=sizes).run(lambda sim: 0, 600) for s in range(100)]
+    assert not any(sim.game_over for sim in scalar)
+    batch = BatchSimulation(100, seed=0).run(lambda b: 0, 600)
+    assert not batch.game_over.any()
+    aabb = BatchSimulation(100, seed=0, aabb=True).run(lambda b: 0, 600)
+    assert aabb.game_over.mean() > 0.9
+
+def test_mean_frames_match_scalar_simulation():
+    # 兩者的亂數不同，只比較固定種子下的平均存活步數 (標準差約 90 步)
+    masks, sizes = load_game_masks(strict=True)
+    frames = [Simulation(seed=s, masks=masks, sizes=sizes).run(lambda sim: INPUT_LEFT, 300).frame
+              for s in range(1000)]
+    batch = BatchSimulation(1000, seed=0).run(lambda b: INPUT_LEFT, 300)
+    assert abs(batch.frame.mean() / statistics.mean(frames) - 1) < 0.03
@@ -0,0 +1,49 @@
+from save_store import SaveStore
+
+SHOP = {'shield': {'level': 1, 'cost': 200}}
+
+def test_failing_task_does_not_stop_the_writer(tmp_path):
+    store = SaveStore(str(tmp_path / 'save.db'), batch_delay=0)
+    try:
+        store.run_in_background(lambda: {}['missing'])
+        assert store.flush(timeout=5)
+        store.save_progress(7, SHOP)
+        assert store.flush(timeout=5)
+        assert store.load() == (7, {'shield': (1, 200)})
+    finally:
+        store.close()
+
+def test_unwritable_progress_is_reported_and_later_writes_succeed(tmp_path):
+    store = SaveStore(str(tmp_path / 'save.db'), batch_delay=0)
+    try:
+        # 超出 SQLite 整數範圍時拋出的是 OverflowError 而不是 sqlite3.Error
+        store.save_progress(2 ** 70, SHOP)
+        assert store.flush(timeout=5)
+        assert store.error is not None
+        store.save_progress(9, SHOP)
+        assert store.flush(timeout=5)
+        assert store.load()[0] == 9
+    finally:
+        store.close()
+
+def test_unexpected_error_still_releases_flush(tmp_path):
+    store = SaveStore(str(tmp_path / 'save.db'), batch_delay=0)
+    write = store._write
+    calls = []
+
+    def broken_once(conn, ops):
+        calls.append(ops)
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        write(conn, ops)
+
+    store._write = broken_once
+    try:
+        store.save_progress(1, SHOP)
+        assert store.flush(timeout=5)
+        assert store.thread.is_alive()
+        store.save_progress(2, SHOP)
+        assert store.flush(timeout=5)
+        assert store.load()[0] == 2
+    finally:
+        store.close()
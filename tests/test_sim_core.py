@@ -0,0 +1,86 @@
+import json
+import random
+
+from replay import Replay, ReplayRecorder, load_game_masks
+from sim_core import GridIndex, SCREEN_HEIGHT, SCREEN_WIDTH, Simulation
+from sweep import chase_bot
+
+def game_sim(seed):
+    masks, sizes = load_game_masks(strict=True)
+    return Simulation(seed=seed, masks=masks, sizes=sizes)
+
+def advance(sim, frames):
+    for _ in range(frames):
+        if not sim.step(chase_bot(sim)):
+            break
+    return sim
+
+def test_same_seed_same_game():
+    # 種子 0 在第 1651 步之後有火焰粒子
+    a = advance(game_sim(0), 2400)
+    b = advance(game_sim(0), 2400)
+    assert a.snapshot() == b.snapshot()
+    assert a.snapshot() != advance(game_sim(1), 2400).snapshot()
+
+def test_clone_and_restore_continue_like_the_original():
+    sim = advance(game_sim(0), 1800)
+    assert len(sim.particles)
+    state = json.loads(json.dumps(sim.snapshot()))
+    clone = sim.clone()
+    restored = game_sim(0).restore(state)
+    copied = game_sim(0)
+    copied.copy_from(sim)
+    expected = advance(sim, 600).snapshot()
+    for other in (clone, restored, copied):
+        assert advance(other, 600).snapshot() == expected
+
+def test_recorded_replay_verifies(tmp_path):
+    masks, _ = load_game_masks(strict=True)
+    for seed in (0, 2):     # 種子 2 在第 1287 步死亡
+        sim = game_sim(seed)
+        recorder = ReplayRecorder(sim)
+        while not sim.game_over and sim.frame < 2400:
+            action = chase_bot(sim)
+            recorder.record(action)
+            sim.step(action)
+        replay = Replay.load(recorder.save(str(tmp_path), tag=seed))
+        played = replay.play(masks)
+        assert (played.frame, played.score, played.game_over) == (sim.frame, sim.score, sim.game_over)
+        assert replay.simulation(masks, 1000).snapshot() == advance(game_sim(seed), 1000).snapshot()
+
+def scatter(rng, n, width, size):
+    return ([rng.uniform(-size, width) for _ in range(n)],
+            [rng.uniform(-size, SCREEN_HEIGHT) for _ in range(n)])
+
+def fire_candidates(k, seed=0):
+    """畫面寬度放大 k 倍、粒子與物件數也放大 k 倍 (密度不變) 時的候選配對數"""
+    rng = random.Random(seed)
+    width = SCREEN_WIDTH * k
+    index = GridIndex(width=width)
+    xs, ys = scatter(rng, 400 * k, width, 30)
+    sizes = [rng.randint(15, 30) for _ in xs]
+    index.fill(range(len(xs)), xs, ys, sizes)
+    for x, y in zip(*scatter(rng, 40 * k, width, 140)):
+        index.query(x, y, 140, 73)
+    return index.candidates
+
+def test_candidate_pairs_grow_linearly():
+    counts = [fire_candidates(k) for k in (1, 2, 4, 8)]
+    # 數量放大 8 倍：逐一比對的配對數是 64 倍，格子索引應接近 8 倍
+    assert 5 < counts[-1] / counts[0] < 14
+    for small, large in zip(counts, counts[1:]):
+        assert large / small < 3
+    assert counts[-1] < 0.05 * (400 * 8) * (40 * 8)
+
+def test_query_matches_brute_force():
+    rng = random.Random(1)
+    index = GridIndex()
+    xs, ys = scatter(rng, 500, SCREEN_WIDTH, 30)
+    sizes = [rng.randint(15, 30) for _ in xs]
+    index.fill(range(len(xs)), xs, ys, sizes)
+    for x, y in zip(*scatter(rng, 50, SCREEN_WIDTH, 140)):
+        found = index.query(x, y, 140, 73)
+        assert len(found) == len(set(found))
+        overlapping = {i for i in range(len(xs))
+                       if xs[i] < x + 140 and x < xs[i] + sizes[i] and ys[i] < y + 73 and y < ys[i] + sizes[i]}
+        assert overlapping <= set(found)
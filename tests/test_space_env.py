@@ -0,0 +1,16 @@
+from replay import load_game_masks
+from sim_core import DEFAULT_SIZES
+from space_env import SpaceCatcherEnv
+
+def test_default_collision_matches_the_game():
+    masks, sizes = load_game_masks(strict=True)
+    env = SpaceCatcherEnv()
+    env.reset(seed=1)
+    assert set(env.sim.masks) == set(masks)
+    assert env.sim.sizes['coin'] == sizes['coin']
+
+def test_aabb_is_opt_in():
+    env = SpaceCatcherEnv(aabb=True)
+    env.reset(seed=1)
+    assert not env.sim.masks
+    assert env.sim.sizes['coin'] == DEFAULT_SIZES['coin']
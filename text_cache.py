@@ -0,0 +1,117 @@
+"""太空捕手 - 文字繪製快取
+
+字型光柵化 (尤其是中文字型) 是選單與 HUD 每幀最貴的工作。
+TextCache 以 (字型, 文字, 顏色) 為鍵快取 font.render 的結果並做 LRU 淘汰；
+會一直變動的數字則由每個字型/顏色各自快取的 0-9 字元圖拼出，
+數值改變時不需要重新光柵化。
+
+resolve_font 把字型名稱對應到的檔案路徑存成 JSON，之後啟動不必再掃描系統字型
+(pygame.font.match_font 在 Linux 上會執行 fc-list，Windows 上會讀整個字型登錄)。
+"""
+import json
+import os
+import time
+from collections import OrderedDict
+
+import pygame
+
+# 找不到字型的結果也會快取，過了這麼久 (秒) 才重新掃描一次 (期間安裝的字型才會被找到)
+FONT_MISS_MAX_AGE = 7 * 24 * 3600
+
+def resolve_font(names, cache_path=None):
+    """回傳 names (依優先順序) 中第一個找得到的字型檔路徑，都找不到時為 None
+
+    cache_path 的快取以名稱列表為鍵；快取的路徑已不存在時重新掃描。
+    """
+    key = ','.join(names)
+    cache = {}
+    if cache_path:
+        try:
+            with open(cache_path, encoding='utf-8') as fp:
+                cache = json.load(fp)
+        except (OSError, ValueError):
+            cache = {}
+        entry = cache.get(key)
+        if isinstance(entry, list) and len(entry) == 2:
+            path, checked = entry
+            if path is not None and os.path.exists(path):
+                return path
+            if path is None and time.time() - checked < FONT_MISS_MAX_AGE:
+                return None
+    path = pygame.font.match_font(list(names))
+    if cache_path:
+        cache[key] = [path, time.time()]
+        try:
+            tmp = cache_path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as fp:
+                json.dump(cache, fp, ensure_ascii=False)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass
+    return path
+
+class TextCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.digit_atlas = {}
+
+    def render(self, font, text, color):
+        """與 font.render(text, True, color) 相同，但相同的字串只光柵化一次"""
+        key = (font, text, color)
+        surf = self.entries.get(key)
+        if surf is not None:
+            self.entries.move_to_end(key)
+            return surf
+        surf = font.render(text, True, color)
+        self.entries[key] = surf
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return surf
+
+    def digits(self, font, color):
+        """取得 (字元圖列表, 寬度列表)；索引即數字"""
+        key = (font, color)
+        atlas = self.digit_atlas.get(key)
+        if atlas is None:
+            glyphs = [font.render(str(d), True, color) for d in range(10)]
+            atlas = (glyphs, [g.get_width() for g in glyphs])
+            self.digit_atlas[key] = atlas
+        return atlas
+
+    def draw_counter(self, screen, font, label, value, color, pos, flags=0):
+        """在 pos 畫出「label + 整數」，label 走快取、數字由字元圖拼出；回傳畫過的區域"""
+        label_surf = self.render(font, label, color)
+        rect = screen.blit(label_surf, pos, None, flags)
+        glyphs, widths = self.digits(font, color)
+        x = pos[0] + label_surf.get_width()
+        y = pos[1]
+        text = str(value)
+        if text.startswith('-'):
+            minus = self.render(font, '-', color)
+            rect.union_ip(screen.blit(minus, (x, y), None, flags))
+            x += minus.get_width()
+            text = text[1:]
+        blits = []
+        for ch in text:
+            d = ord(ch) - 48
+            blits.append((glyphs[d], (x, y)) if not flags else (glyphs[d], (x, y), None, flags))
+            x += widths[d]
+        for r in screen.blits(blits):
+            rect.union_ip(r)
+        return rect
+
+    def counter_surface(self, font, label, value, color):
+        """把「label + 整數」組成一張透明圖 (HUD 降低更新率時重複貼上)"""
+        glyphs, widths = self.digits(font, color)
+        text = str(value)
+        width = self.render(font, label, color).get_width() + sum(widths[ord(ch) - 48] for ch in text.lstrip('-'))
+        if text.startswith('-'): width += self.render(font, '-', color).get_width()
+        surf = pygame.Surface((width, font.get_height()), pygame.SRCALPHA)
+        # 以取最大值的方式貼上，透明底上的字元圖原樣複製 (一般混合會讓字的邊緣變暗)
+        self.draw_counter(surf, font, label, value, color, (0, 0), pygame.BLEND_RGBA_MAX)
+        return surf
+
+    def clear(self):
+        self.entries.clear()
+        self.digit_atlas.clear()
@@ -1,15 +1,26 @@
+from time import perf_counter
+# 啟動計時的起點 (含以下各模組與 pygame 本身的匯入)
+STARTUP_BEGIN = perf_counter()
+
 import pygame
 import sys
 import random
 import os
 import math
-
-# 初始化 Pygame
-pygame.init()
+import atexit
+
+from text_cache import TextCache, resolve_font
+from starfield import Starfield
+from asset_bundle import read_bundle, write_bundle
+from frame_profiler import FrameProfiler, StartupTimer
+from replay import Replay, ReplayRecorder
+from save_store import SaveStore
+from telemetry import TelemetryLog, FLAG_AUTOPILOT
+from autopilot import Autopilot
+from pipeline import SimPipeline
+from quality import QualityGovernor, QUALITY_LEVELS
 
 # --- 常數設定 ---
-SCREEN_WIDTH = 800
-SCREEN_HEIGHT = 600
 TITLE = "太空捕手 - 豪華進化版 (狀態機架構)"
 
 # 顏色定義
@@ -23,33 +34,74 @@ PURPLE = (180, 100, 255)
 GREEN = (50, 255, 50)
 STAR_YELLOW = (255, 255, 0)
 ORANGE = (255, 165, 0)
-
-# 角色與物理設定
-PLAYER_SIZE = 120 
-PLAYER_SPEED_BASE = 13   
-GRAVITY = 0.9      
-JUMP_STRENGTH = -18 
-
-# 物件設定
-COIN_BASE_SIZE = 140
-STAR_SIZE = 70  
-FLOWER_SIZE = 80
-COIN_SPEED_BASE = 11
-
-# 軌道系統
-NUM_LANES = 6
-LANE_WIDTH = SCREEN_WIDTH // NUM_LANES
+# 火焰粒子的色調 (預先繪製，數量需等於 FIRE_TINTS)
+FIRE_COLORS = [(255, 60, 0), (240, 90, 0), (225, 120, 0), (210, 145, 0)]
+
+# 遊戲規則與物理常數 (與無畫面模擬核心共用)
+from sim_core import (
+    SCREEN_WIDTH, SCREEN_HEIGHT, PLAYER_SIZE, STAR_SIZE, COIN_BASE_SIZE, SIM_HZ, SIM_DT,
+    INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP, SHOP_DEFAULTS, Simulation, buy_upgrade, load_waves,
+    FIRE_SIZE_MIN, FIRE_SIZE_MAX, FIRE_TINTS, seconds_to_steps,
+)
+
+# 畫面更新率上限 (與模擬步長無關，0 表示不限制) 與單一畫面最多追趕的模擬步數
+MAX_FPS = 144
+MAX_CATCHUP_STEPS = 5
+# 背景星星每單位速度每秒移動的像素
+STAR_DRIFT = 30
+# 自動駕駛的搜尋層數與每次規劃的時間上限 (秒)；預算分散在計畫執行的每一步 (每步約 4 毫秒)，
+# 超過時採用已搜完的較淺層數
+AUTOPILOT_DEPTH = 4
+AUTOPILOT_BUDGET = 0.024
 
 # --- 全局狀態 (存檔/商店數據) ---
 total_tokens = 0  
 shop_items = {
-    'magnet': {'level': 0, 'max': 5, 'cost': 100, 'desc': '磁鐵：吸引金幣範圍'},
-    'shield': {'level': 0, 'max': 3, 'cost': 200, 'desc': '護盾：抵擋次數上限'},
-    'speed':  {'level': 0, 'max': 10, 'cost': 50, 'desc': '動力：提升基本移動'}
+    'magnet': dict(SHOP_DEFAULTS['magnet'], level=0, desc='磁鐵：吸引金幣範圍'),
+    'shield': dict(SHOP_DEFAULTS['shield'], level=0, desc='護盾：抵擋次數上限'),
+    'speed':  dict(SHOP_DEFAULTS['speed'], level=0, desc='動力：提升基本移動'),
 }
 
 # --- 資源管理器 ---
 assets = {}
+asset_sources = {}  # 鍵 -> 來源圖片路徑 (找不到圖片而使用備用圖形時為 None)
+asset_missing = {}  # 鍵 -> 探測過但不存在的候選路徑 (之後出現時資源包視為過期)
+ASSET_BUNDLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets', 'assets.bundle')
+# 每局的重播檔 (replay.py 格式)
+REPLAY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'replays')
+# 代幣、升級與每局紀錄的存檔 (save_store.py)
+SAVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'save.db')
+# 遊戲事件紀錄 (telemetry.py，每次啟動一個檔案)
+TELEMETRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telemetry')
+# 字型名稱 -> 檔案路徑的快取 (text_cache.resolve_font)
+FONT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'font_cache.json')
+UI_FONTS = ('microsoftjhenghei', 'arial')
+
+def init_pygame():
+    """只啟動用得到的子系統 (畫面與字型)；pygame.init() 還會啟動音效等遊戲沒有使用的子系統"""
+    if not pygame.display.get_init(): pygame.display.init()
+    if not pygame.font.get_init(): pygame.font.init()
+
+def apply_progress(tokens, upgrades):
+    """把存檔讀出的代幣與 {項目: (等級, 費用)} 套用到全局狀態"""
+    global total_tokens
+    total_tokens = tokens
+    for key, (level, cost) in upgrades.items():
+        if key in shop_items:
+            shop_items[key]['level'] = min(level, shop_items[key]['max'])
+            shop_items[key]['cost'] = cost
+
+def load_assets():
+    """優先從預先編譯的資源包載入；資源包不存在或過期時才從圖片重建，並嘗試寫回資源包"""
+    bundled = read_bundle(ASSET_BUNDLE)
+    if bundled is not None:
+        assets.update(bundled)
+        return
+    load_and_clean_assets()
+    try:
+        write_bundle(ASSET_BUNDLE, assets, asset_sources, asset_missing)
+    except OSError:
+        pass
 
 def load_and_clean_assets():
     """載入圖片並進行縮放與去邊處理"""
@@ -82,10 +134,12 @@ def load_and_clean_assets():
         ]
         
         found_path = None
+        asset_missing[key] = []
         for path in paths_to_check:
             if os.path.exists(path):
                 found_path = path
                 break
+            asset_missing[key].append(path)
         
         if found_path:
             try:
@@ -102,10 +156,14 @@ def load_and_clean_assets():
                 
                 img = pygame.transform.scale(img, (target_w, target_h))
                 assets[key] = img
+                asset_sources[key] = os.path.abspath(found_path)
             except:
                 create_fallback(key, color, shape, base_size)
+                # 圖片讀不進來時仍記錄來源，修好 (檔案變動) 後資源包會過期
+                asset_sources[key] = os.path.abspath(found_path)
         else:
             create_fallback(key, color, shape, base_size)
+            asset_sources[key] = None
 
 def create_fallback(key, color, shape, size):
     surf = pygame.Surface([size, size], pygame.SRCALPHA)
@@ -113,7 +171,7 @@ def create_fallback(key, color, shape, size):
         pygame.draw.rect(surf, color, [0, 0, size, size], border_radius=15)
         label_text = "P2" if key == "player_2" else "P1"
         try:
-            temp_font = pygame.font.SysFont('Arial', 20)
+            temp_font = pygame.font.Font(resolve_font(('arial',), FONT_CACHE), 20)
             label = temp_font.render(label_text, True, BLACK)
             surf.blit(label, (size//2 - label.get_width()//2, size//2 - label.get_height()//2))
         except: pass
@@ -134,243 +192,263 @@ def create_fallback(key, color, shape, size):
         pygame.draw.circle(surf, color, (size // 2, size // 2), size // 2)
     assets[key] = surf
 
-# --- 實體類別 ---
-
-class FireParticle(pygame.sprite.Sprite):
-    def __init__(self, x, y):
-        super().__init__()
-        size = random.randint(15, 30)
-        self.image = pygame.Surface((size, size), pygame.SRCALPHA)
-        pygame.draw.circle(self.image, (random.randint(200, 255), random.randint(50, 150), 0), (size//2, size//2), size//2)
-        self.rect = self.image.get_rect(center=(x, y))
-        self.vel_y = random.uniform(-15, -8)
-        self.vel_x = random.uniform(-2, 2)
-        self.life = 30
-        self.mask = pygame.mask.from_surface(self.image)
-
-    def update(self):
-        self.rect.x += self.vel_x
-        self.rect.y += self.vel_y
-        self.life -= 1
-        if self.life <= 0:
-            self.kill()
-
-class Player(pygame.sprite.Sprite):
-    def __init__(self, character_key='player'):
-        super().__init__()
-        self.image = assets[character_key]
-        self.rect = self.image.get_rect()
-        self.mask = pygame.mask.from_surface(self.image)
-        self.ground_y = SCREEN_HEIGHT - self.rect.height - 20 
-        self.rect.centerx = SCREEN_WIDTH // 2
-        self.rect.y = self.ground_y
-        self.vel_y = 0
-        self.is_jumping = False
-        self.base_speed = PLAYER_SPEED_BASE + shop_items['speed']['level'] * 1.5
-        self.max_shields = shop_items['shield']['level']
-        self.shields = self.max_shields
-        self.invincible_timer = 0 
-        self.fire_timer = 0
-
-    def update(self, current_score):
-        current_speed = self.base_speed + (current_score // 100)
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]: self.rect.x -= current_speed
-        if keys[pygame.K_RIGHT]: self.rect.x += current_speed
-        if keys[pygame.K_SPACE] and not self.is_jumping:
-            self.vel_y = JUMP_STRENGTH
-            self.is_jumping = True
-
-        self.vel_y += GRAVITY
-        self.rect.y += self.vel_y
-        if self.rect.y >= self.ground_y:
-            self.rect.y = self.ground_y
-            self.vel_y = 0
-            self.is_jumping = False
-
-        if self.rect.left < 0: self.rect.left = 0
-        if self.rect.right > SCREEN_WIDTH: self.rect.right = SCREEN_WIDTH
-        
-        if self.invincible_timer > 0: self.invincible_timer -= 1
-        if self.fire_timer > 0: self.fire_timer -= 1
-
-class FallingObject(pygame.sprite.Sprite):
-    def __init__(self, type='coin'):
-        super().__init__()
-        self.type = type
-        self.image = assets[type]
-        self.rect = self.image.get_rect()
-        self.mask = pygame.mask.from_surface(self.image)
-        self.is_active = False
-        self.speed = COIN_SPEED_BASE
-
-    def spawn(self, lane, y_offset, speed_bonus):
-        lane_start = lane * LANE_WIDTH
-        self.rect.centerx = lane_start + (LANE_WIDTH // 2)
-        self.rect.y = -self.rect.height - y_offset
-        self.speed = COIN_SPEED_BASE + speed_bonus
-        self.is_active = True
-
-    def handle_movement(self, target_player, game_ref):
-        if self.is_active:
-            if self.type == 'coin' and shop_items['magnet']['level'] > 0:
-                dist_x = target_player.rect.centerx - self.rect.centerx
-                dist_y = target_player.rect.centery - self.rect.centery
-                distance = (dist_x**2 + dist_y**2)**0.5
-                magnet_range = 100 + shop_items['magnet']['level'] * 100
-                if distance < magnet_range and distance > 5:
-                    self.rect.x += (dist_x / distance) * 8
-                    self.rect.y += (dist_y / distance) * 4
-
-            self.rect.y += self.speed
-            if self.rect.top > SCREEN_HEIGHT:
-                self.is_active = False
-                if self.type == 'coin':
-                    game_ref.score = max(0, game_ref.score - 5)
-                    game_ref.combo = 0
-
-class WaveSystem:
-    def __init__(self, all_sprites_grp):
-        self.coins_group = pygame.sprite.Group()
-        self.f_coins_group = pygame.sprite.Group()
-        self.stars_group = pygame.sprite.Group()
-        self.flowers_group = pygame.sprite.Group()
-        self.all_sprites = all_sprites_grp
-        self.all_falling_objects = []
-        
-        # 核心結構：1 顆真金幣
-        c = FallingObject('coin')
-        self.all_falling_objects.append(c) # index 0
-        self.coins_group.add(c)
-        self.all_sprites.add(c)
-        
-        # 假金幣：3 顆 (index 1, 2, 3)
-        for _ in range(3):
-            f = FallingObject('f_coin')
-            self.all_falling_objects.append(f)
-            self.f_coins_group.add(f)
-            self.all_sprites.add(f)
-            
-        # 特殊道具：星星 (物件池位置 4)
-        s = FallingObject('star')
-        self.all_falling_objects.append(s)
-        self.stars_group.add(s)
-        self.all_sprites.add(s)
-
-        # 特殊道具：火焰花 (物件池位置 5)
-        fl = FallingObject('flower')
-        self.all_falling_objects.append(fl)
-        self.flowers_group.add(fl)
-        self.all_sprites.add(fl)
-
-    def update(self, player, game_ref):
-        # 檢查核心物件 (1真金+3假金) 是否都失效了才刷下一波
-        if not any(obj.is_active for obj in self.all_falling_objects[:4]):
-            self.spawn_wave(game_ref.score, player)
-        for obj in self.all_falling_objects:
-            obj.handle_movement(player, game_ref)
-
-    def spawn_wave(self, current_score, player):
-        lanes = random.sample(range(NUM_LANES), NUM_LANES)
-        speed_bonus = current_score // 150 
-        
-        # 記錄被佔用的軌道與高度，防止道具重疊
-        occupied_data = []
-
-        # 每一波固定刷出 1 顆真金幣 (index 0) 與 3 顆假金幣 (index 1-3)
-        for i in range(4):
-            obj = self.all_falling_objects[i]
-            lane = lanes[i]
-            y_off = random.randint(0, 400)
-            obj.spawn(lane, y_off, speed_bonus)
-            occupied_data.append({'lane': lane, 'y': obj.rect.y})
-            
-        # 道具邏輯優化：降低生成機率，且不能在當前效果結束前生成
-        prop_chance = 0.10 # 從 0.15 降至 0.10
-        
-        # 只有在玩家沒有任何特殊效果時，才允許生成新道具
-        if player.invincible_timer <= 0 and player.fire_timer <= 0:
-            if random.random() < prop_chance:
-                # 隨機選擇生成星星或火焰花（互斥）
-                prop_to_spawn = random.choice([self.all_falling_objects[4], self.all_falling_objects[5]])
-                self.spawn_prop_safely(prop_to_spawn, speed_bonus, occupied_data)
-
-    def spawn_prop_safely(self, prop_obj, speed_bonus, occupied_data):
-        for _ in range(10): # 嘗試尋找不衝突位置
-            l = random.randint(0, NUM_LANES-1)
-            y_o = random.randint(0, 400)
-            temp_y = -prop_obj.rect.height - y_o
-            
-            conflict = False
-            for data in occupied_data:
-                if data['lane'] == l and abs(data['y'] - temp_y) < 150:
-                    conflict = True
-                    break
-            
-            if not conflict:
-                prop_obj.spawn(l, y_o, speed_bonus)
-                occupied_data.append({'lane': l, 'y': prop_obj.rect.y})
-                break
+def build_fire_sprites():
+    """預先繪製每種尺寸與色調的火焰粒子，索引與 ParticlePool.sprite 相同"""
+    sprites = []
+    for size in range(FIRE_SIZE_MIN, FIRE_SIZE_MAX + 1):
+        for color in FIRE_COLORS[:FIRE_TINTS]:
+            surf = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.circle(surf, color, (size//2, size//2), size//2)
+            sprites.append(surf)
+    return sprites
+
+def build_masks(fire_sprites):
+    """為每種物件建立一次碰撞遮罩，供模擬核心共用"""
+    masks = {key: pygame.mask.from_surface(surf) for key, surf in assets.items()}
+    # 火焰粒子的遮罩只與尺寸有關
+    for size in range(FIRE_SIZE_MIN, FIRE_SIZE_MAX + 1):
+        masks[('fire', size)] = pygame.mask.from_surface(fire_sprites[(size - FIRE_SIZE_MIN) * FIRE_TINTS])
+    return masks
+
+def read_input():
+    """將目前按鍵狀態轉為模擬核心的輸入位元"""
+    keys = pygame.key.get_pressed()
+    inputs = 0
+    if keys[pygame.K_LEFT]: inputs |= INPUT_LEFT
+    if keys[pygame.K_RIGHT]: inputs |= INPUT_RIGHT
+    if keys[pygame.K_SPACE]: inputs |= INPUT_JUMP
+    return inputs
+
+# --- 繪製 ---
+
+class DirtyRenderer:
+    """只把有變動的區域推到畫面上
+
+    每幀先用背景層蓋掉上一幀畫過的區域，再畫新的內容，
+    最後以 pygame.display.update(上一幀 + 本幀的區域) 呈現。
+    invalidate() 後的下一幀會重畫整個背景並整頁 flip；
+    區域數超過 max_rects (例如大量火焰粒子) 時，逐塊處理反而較慢，也改為整頁。
+    """
+    def __init__(self, screen, max_rects=150):
+        self.screen = screen
+        self.background = None
+        self.prev_rects = []
+        self.full = True
+        self.max_rects = max_rects
+
+    def set_background(self, background):
+        self.background = background
+        self.invalidate()
+
+    def invalidate(self):
+        self.full = True
+        self.prev_rects = []
+
+    def restore(self):
+        if self.full or len(self.prev_rects) > self.max_rects:
+            self.screen.blit(self.background, (0, 0))
+        else:
+            for rect in self.prev_rects:
+                self.screen.blit(self.background, rect, rect)
+
+    def present(self, rects):
+        if self.full or len(self.prev_rects) + len(rects) > self.max_rects:
+            pygame.display.flip()
+            self.full = False
+        else:
+            pygame.display.update(self.prev_rects + rects)
+        self.prev_rects = rects
 
 # --- 核心遊戲類別 ---
 
 class SpaceCatcherGame:
-    def __init__(self):
+    def __init__(self, dirty_rects=True, max_fps=MAX_FPS, profiler=None, record_replays=True,
+                 replay=None, replay_start=0, save_path=SAVE_PATH, rules=None, telemetry_dir=TELEMETRY_DIR,
+                 startup=None, report_startup=False, pipelined=False, adaptive_quality=True):
+        # 啟動各階段的耗時；第一個畫面呈現後記錄 first_frame，report_startup 時印出
+        self.startup = startup or StartupTimer()
+        self.report_startup = report_startup
+        self.first_frame_done = False
+        init_pygame()
+        self.startup.mark('pygame_init')
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption(TITLE)
+        self.startup.mark('display')
         self.clock = pygame.time.Clock()
+        self.max_fps = max_fps
+        # 上一個畫面實際經過的秒數；模擬以固定步長追上這段時間
+        self.frame_dt = SIM_DT
+        self.sim_accumulator = 0.0
+        self.prev_positions = None
+        # 分段計時 (FrameProfiler)；None 時不計時也不顯示疊加層
+        self.profiler = profiler
+        self.profiler_surface = None
+        self.profiler_font = pygame.font.Font(None, 20) if profiler else None
+        # 遊戲中只更新變動區域；False 時退回每幀整頁 flip
+        self.dirty_rects = dirty_rects
+        self.renderer = DirtyRenderer(self.screen)
+        self.frame_presented = False
+        self.text_cache = TextCache()
+        # 依幀時間自動降低 / 恢復畫面品質 (quality.py)；只在 run() 的遊戲畫面中調整，離開遊戲畫面時回到最高品質
+        self.governor = QualityGovernor() if adaptive_quality else None
+        self.quality = QUALITY_LEVELS[0]
+        self.hud_pieces = None
+        self.hud_age = 0
+        self.fire_life = 0
+        # 管線模式 (pipeline.py)：模擬在背景執行緒推進，主執行緒繪製上一幀的快照
+        self.pipeline = SimPipeline(self.advance_simulation, self.capture_snapshot) if pipelined else None
+        # 覆寫模擬規則 (例如 --waves 載入的波次定義)
+        self.rules = rules
+        # 遊戲中的輸入來源：None 時讀鍵盤，否則為 f(sim) -> 輸入位元 (機器人、基準測試)
+        self.input_source = None
+        # 自動駕駛 (--autopilot 或遊戲中按 A)；用過自動駕駛的局不計入代幣
+        self.autopilot = None
+        self.autopilot_used = False
+        # 每局錄成重播檔；傳入 replay 時改為播放該局 (從第 replay_start 步開始)
+        self.record_replays = record_replays
+        self.recorder = None
+        self.replay = replay
+        self.replay_start = replay_start
+        self.pause_started = 0
+        self.replay_resume_at = None
+        self.replay_pauses_done = set()
+        if replay is not None:
+            self.input_source = lambda sim: replay.input_at(sim.frame)
+        # 存檔 (背景執行緒寫入)；save_path 為 None 時不讀也不寫
+        self.store = None
+        if save_path:
+            self.store = SaveStore(save_path)
+            apply_progress(*self.store.load())
+            atexit.register(self.store.close)
+        self.startup.mark('save')
+        # 遊戲事件紀錄 (背景執行緒寫入)；telemetry_dir 為 None 時不記錄，播放重播時也不記錄
+        self.telemetry = None
+        if telemetry_dir and replay is None:
+            self.telemetry = TelemetryLog(telemetry_dir)
+            atexit.register(self.telemetry.close)
         
-        load_and_clean_assets()
+        # 圖片、火焰粒子與碰撞遮罩只有選角與遊戲畫面用得到，延後到 load_play_assets()
+        self.fire_sprites = None
+        self.masks = None
         self.setup_fonts()
+        self.startup.mark('fonts')
         
-        self.stars_bg = [[random.randint(0, SCREEN_WIDTH), random.randint(0, SCREEN_HEIGHT), random.random()*2 + 1] for _ in range(50)]
+        self.starfield = Starfield(SCREEN_WIDTH, SCREEN_HEIGHT, STAR_DRIFT, seed=random.getrandbits(32))
+        self.startup.mark('starfield')
         self.state = "MENU" 
         self.reset_game_state()
+        if replay is not None:
+            self.selected_char = replay.character_key
+            self.init_playing_session()
+            self.state = "PLAYING"
 
     def setup_fonts(self):
+        # 字型路徑只在第一次啟動時掃描系統字型，之後從 FONT_CACHE 讀取
+        font_path = resolve_font(UI_FONTS, FONT_CACHE)
         try:
-            font_path = pygame.font.match_font('microsoftjhenghei', 'arial')
             self.font_large = pygame.font.Font(font_path, 72)
             self.font_medium = pygame.font.Font(font_path, 36)
             self.font_small = pygame.font.Font(font_path, 24)
-        except:
-            self.font_large = pygame.font.SysFont('Arial', 72)
-            self.font_medium = pygame.font.SysFont('Arial', 36)
-            self.font_small = pygame.font.SysFont('Arial', 24)
+        except (OSError, pygame.error):
+            self.font_large = pygame.font.Font(None, 72)
+            self.font_medium = pygame.font.Font(None, 36)
+            self.font_small = pygame.font.Font(None, 24)
+
+    def load_play_assets(self):
+        """載入角色與物件圖片、預先繪製火焰粒子並建立碰撞遮罩 (只做一次)"""
+        if self.masks is not None:
+            return
+        load_assets()
+        self.fire_sprites = build_fire_sprites()
+        self.masks = build_masks(self.fire_sprites)
 
     def reset_game_state(self):
-        self.score = 0
-        self.combo = 0
-        self.max_combo = 0
         self.game_over = False
         self.paused = False
         self.selected_char = 'player'
-        self.all_sprites = pygame.sprite.Group()
-        self.fire_group = pygame.sprite.Group()
-        self.player = None
-        self.wave_system = None
+        self.sim = None
 
     def init_playing_session(self):
-        self.all_sprites = pygame.sprite.Group()
-        self.fire_group = pygame.sprite.Group()
-        self.player = Player(self.selected_char)
-        self.all_sprites.add(self.player)
-        self.wave_system = WaveSystem(self.all_sprites)
-        self.score = 0
-        self.combo = 0
-        self.game_over = False
+        self.load_play_assets()
+        self.save_replay()
+        self.end_telemetry()
+        if self.replay is not None:
+            self.sim = self.replay.simulation(self.masks, self.replay_start)
+            self.replay_pauses_done.clear()
+            self.replay_resume_at = None
+        else:
+            self.sim = Simulation(
+                seed=random.getrandbits(32),
+                character_key=self.selected_char,
+                upgrades={key: item['level'] for key, item in shop_items.items()},
+                sizes={key: surf.get_size() for key, surf in assets.items()},
+                masks=self.masks,
+                rules=self.rules,
+            )
+            if self.record_replays: self.recorder = ReplayRecorder(self.sim)
+            self.autopilot_used = self.autopilot is not None and self.input_source is self.autopilot
+            if self.telemetry: self.telemetry.begin_session(self.sim)
+        self.game_over = self.sim.game_over
+        # 遊戲中的靜態背景層 (黑底 + 地面線)
+        ground_y = self.sim.player.ground_y + self.sim.player.h
+        self.play_background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        self.play_background.fill(BLACK)
+        pygame.draw.line(self.play_background, GRAY, (0, ground_y), (SCREEN_WIDTH, ground_y), 2)
+        self.renderer.set_background(self.play_background)
+        # 管線模式的模擬在另一個執行緒，分段計時只記主執行緒的階段
+        self.sim.profiler = self.profiler if self.pipeline is None else None
+        self.sim_accumulator = 0.0
+        self.prev_positions = self.capture_positions()
+        self.fire_life = seconds_to_steps(self.sim.rules['fire_particle_lifetime'])
+        self.hud_pieces = None
+        if self.governor: self.governor.reset()
+
+    def save_replay(self):
+        """寫出目前這一局的重播 (每局只寫一次)；回傳檔案路徑"""
+        if self.recorder is None:
+            return None
+        try:
+            path = self.recorder.save(REPLAY_DIR, self.store.run_in_background if self.store else None)
+        except OSError:
+            path = None
+        self.recorder = None
+        return path
+
+    def end_telemetry(self):
+        """記錄目前這一局的結束 (沒有進行中的局時不做任何事)"""
+        if self.telemetry: self.telemetry.end_session(FLAG_AUTOPILOT if self.autopilot_used else 0)
+
+    def update_replay_pause(self):
+        """播放重播時，在錄製時暫停的那一步暫停同樣久"""
+        now = int(perf_counter() * 1000)
+        if self.replay_resume_at is not None:
+            if now >= self.replay_resume_at:
+                self.paused = False
+                self.replay_resume_at = None
+            return
+        frame = self.sim.frame
+        if not self.paused and frame not in self.replay_pauses_done:
+            seconds = self.replay.pause_at(frame)
+            if seconds:
+                self.replay_pauses_done.add(frame)
+                self.paused = True
+                self.replay_resume_at = now + int(seconds * 1000)
+
+    def draw_background(self, layer=None):
+        """沒有 layer 時畫完整的視差星空；有 layer (遊戲中的背景層) 時與局部更新相同，只畫前景星點"""
+        if layer is None:
+            self.starfield.update(self.frame_dt)
+            self.starfield.draw(self.screen, self.quality['star_skip'])
+        else:
+            self.screen.blit(layer, (0, 0))
+            self.draw_stars()
 
-    def draw_background(self):
-        self.screen.fill(BLACK)
-        for star in self.stars_bg:
-            star[1] += star[2] * 0.5
-            if star[1] > SCREEN_HEIGHT:
-                star[1] = 0
-                star[0] = random.randint(0, SCREEN_WIDTH)
-            pygame.draw.circle(self.screen, WHITE, (int(star[0]), int(star[1])), 1)
+    def draw_stars(self):
+        self.starfield.update(self.frame_dt)
+        return self.starfield.draw_points(self.screen, self.quality['star_step'])
 
     def draw_text_centered(self, text, y, font, color=WHITE):
-        surf = font.render(text, True, color)
+        surf = self.text_cache.render(font, text, color)
         rect = surf.get_rect(center=(SCREEN_WIDTH//2, y))
         self.screen.blit(surf, rect)
         return rect
@@ -419,13 +497,15 @@ class SpaceCatcherGame:
             if event.type == pygame.MOUSEBUTTONDOWN:
                 for rect, key in buttons:
                     if rect.collidepoint(event.pos):
-                        item = shop_items[key]
-                        if total_tokens >= item['cost'] and item['level'] < item['max']:
-                            total_tokens -= item['cost']
-                            item['level'] += 1
-                            item['cost'] = int(item['cost'] * 1.3)
+                        cost = shop_items[key]['cost']
+                        remaining = buy_upgrade(shop_items[key], total_tokens)
+                        if remaining is not None:
+                            total_tokens = remaining
+                            if self.store: self.store.save_progress(total_tokens, shop_items)
+                            if self.telemetry: self.telemetry.purchase(key, shop_items[key]['level'], cost, total_tokens)
 
     def handle_char_select(self):
+        self.load_play_assets()
         self.draw_background()
         self.draw_text_centered("選擇你的飛行員", 80, self.font_medium)
         p1_rect = assets['player'].get_rect(center=(SCREEN_WIDTH//3, SCREEN_HEIGHT//2))
@@ -450,113 +530,288 @@ class SpaceCatcherGame:
                     self.selected_char = 'player_2'; self.init_playing_session(); self.state = "PLAYING"
 
     def handle_playing(self):
-        global total_tokens
+        prof = self.profiler
+        pipe = self.pipeline
+        # 管線模式先等模擬執行緒閒置，之後才能處理事件與讀取模擬
+        snapshot = pipe.wait() if pipe else None
+        if prof and pipe: prof.mark('wait')
         for event in pygame.event.get():
-            if event.type == pygame.QUIT: pygame.quit(); sys.exit()
+            if event.type == pygame.QUIT: self.save_replay(); self.end_telemetry(); pygame.quit(); sys.exit()
             if event.type == pygame.KEYDOWN:
                 if not self.game_over:
-                    if event.key == pygame.K_p: self.paused = not self.paused
-                    if event.key == pygame.K_s: self.state = "SHOP" 
+                    if event.key == pygame.K_p: self.toggle_pause()
+                    if event.key == pygame.K_a and self.replay is None: self.toggle_autopilot()
+                    if event.key == pygame.K_s: self.save_replay(); self.end_telemetry(); self.state = "SHOP" 
                 else:
                     if event.key == pygame.K_SPACE: self.init_playing_session()
                     if event.key == pygame.K_c or event.key == pygame.K_ESCAPE: self.state = "MENU"
 
-        if not self.game_over and not self.paused:
-            self.player.update(self.score)
-            self.wave_system.update(self.player, self)
-            
-            if self.player.fire_timer > 0:
-                if random.random() < 0.4:
-                    self.fire_group.add(FireParticle(self.player.rect.centerx, self.player.rect.top))
-            self.fire_group.update()
-            
-            for fire in self.fire_group:
-                # 火焰清理假金幣 (100% 擊毀機率)
-                hits_f = pygame.sprite.spritecollide(fire, self.wave_system.f_coins_group, False, pygame.sprite.collide_mask)
-                for h in hits_f:
-                    if h.is_active:
-                        h.is_active = False
-                        self.score += 2 # 清理假金幣有額外獎勵
-                
-                # 火焰擊中真金幣 (只有 10% 誤傷機率)
-                hits_c = pygame.sprite.spritecollide(fire, self.wave_system.coins_group, False, pygame.sprite.collide_mask)
-                for h in hits_c:
-                    if h.is_active and random.random() < 0.1: # 誤傷率 10%
-                        h.is_active = False
-
-            hits_coin = pygame.sprite.spritecollide(self.player, self.wave_system.coins_group, False, pygame.sprite.collide_mask)
-            for hit in hits_coin:
-                if hit.is_active:
-                    self.combo += 1
-                    self.max_combo = max(self.max_combo, self.combo)
-                    bonus = min(self.combo // 5, 5)
-                    self.score += 10 * (1 + bonus)
-                    hit.is_active = False 
-
-            hits_star = pygame.sprite.spritecollide(self.player, self.wave_system.stars_group, False, pygame.sprite.collide_mask)
-            for hit in hits_star:
-                if hit.is_active:
-                    self.player.invincible_timer = 300 
-                    hit.is_active = False
-
-            hits_flower = pygame.sprite.spritecollide(self.player, self.wave_system.flowers_group, False, pygame.sprite.collide_mask)
-            for hit in hits_flower:
-                if hit.is_active:
-                    self.player.fire_timer = 400 
-                    hit.is_active = False
-
-            for f in self.wave_system.f_coins_group:
-                if f.is_active and pygame.sprite.collide_mask(self.player, f):
-                    if self.player.invincible_timer > 0: f.is_active = False 
-                    elif self.player.shields > 0: self.player.shields -= 1; f.is_active = False
-                    else: self.game_over = True; total_tokens += self.score 
-
-        self.draw_background()
-        if not self.game_over:
-            pygame.draw.line(self.screen, GRAY, (0, self.player.ground_y + self.player.rect.height), (SCREEN_WIDTH, self.player.ground_y + self.player.rect.height), 2)
-            for f in self.fire_group: self.screen.blit(f.image, f.rect)
-            for sprite in self.all_sprites:
-                if isinstance(sprite, FallingObject):
-                    if sprite.is_active: self.screen.blit(sprite.image, sprite.rect)
-                else:
-                    if not (self.player.invincible_timer > 0 and (self.player.invincible_timer // 5) % 2 == 0):
-                        self.screen.blit(sprite.image, sprite.rect)
-            
-            if self.player.invincible_timer > 0:
-                pygame.draw.circle(self.screen, STAR_YELLOW, self.player.rect.center, 80, 5)
-            elif self.player.shields > 0:
-                pygame.draw.circle(self.screen, BLUE, self.player.rect.center, 70, 3)
-            
-            self.screen.blit(self.font_medium.render(f"得分: {self.score}", True, WHITE), (20, 20))
-            self.screen.blit(self.font_medium.render(f"連擊: {self.combo}", True, GOLD if self.combo >= 5 else WHITE), (20, 65))
-            self.screen.blit(self.font_small.render(f"護盾: {self.player.shields}", True, BLUE), (SCREEN_WIDTH - 150, 20))
-            
-            if self.player.invincible_timer > 0:
-                self.draw_text_centered(f"無敵中! {self.player.invincible_timer // 60}s", 20, self.font_small, STAR_YELLOW)
-            if self.player.fire_timer > 0:
-                self.draw_text_centered(f"火焰模式! {self.player.fire_timer // 60}s", 50, self.font_small, ORANGE)
-            
-            self.draw_text_centered("按 [S] 商店 | [P] 暫停", SCREEN_HEIGHT - 30, self.font_small, GRAY)
-
-            if self.paused:
+        if self.replay is not None and not self.game_over: self.update_replay_pause()
+        # 送出下一幀之後模擬執行緒可能改變這兩個狀態，繪製一律依送出前的值
+        game_over, paused = self.game_over, self.paused
+        alpha = 1.0
+        if not game_over and not paused:
+            inputs = read_input() if self.input_source is None else self.input_source(self.sim)
+            if prof: prof.mark('input')
+            if pipe:
+                if not snapshot.matches(self.sim): snapshot = pipe.capture_now()
+                pipe.submit(inputs, self.frame_dt)
+                alpha = snapshot.alpha
+            else:
+                self.advance_simulation(inputs)
+                alpha = self.sim_accumulator / SIM_DT
+        else:
+            if prof: prof.mark('input')
+            # 暫停與結算畫面期間模擬不推進，直接讀取模擬
+            snapshot = None
+
+        if self.dirty_rects and not game_over and not paused:
+            self.renderer.restore()
+            rects = self.draw_stars()
+            if prof: prof.mark('background')
+            rects += self.draw_playing_scene(alpha, snapshot)
+            if prof: rects.append(self.draw_profiler_overlay())
+            self.renderer.present(rects)
+            if prof: prof.mark('present')
+            self.frame_presented = True
+            return
+
+        self.draw_background(self.play_background if not game_over else None)
+        if prof: prof.mark('background')
+        if not game_over:
+            self.draw_playing_scene(alpha, snapshot)
+            if paused:
                 overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA); overlay.fill((0, 0, 0, 150))
                 self.screen.blit(overlay, (0,0))
                 self.draw_text_centered("遊戲暫停", SCREEN_HEIGHT//2 - 20, self.font_large, WHITE)
                 self.draw_text_centered("按下 [P] 繼續遊戲", SCREEN_HEIGHT//2 + 60, self.font_small, GRAY)
         else:
             self.draw_text_centered("任務失敗", SCREEN_HEIGHT//2 - 100, self.font_large, RED)
-            self.draw_text_centered(f"最終得分: {self.score}", SCREEN_HEIGHT//2, self.font_medium, WHITE)
+            self.draw_text_centered(f"最終得分: {self.sim.score}", SCREEN_HEIGHT//2, self.font_medium, WHITE)
             self.draw_text_centered("[空白鍵] 重玩 | [C] 回主選單", SCREEN_HEIGHT//2 + 110, self.font_small, GRAY)
 
+    def advance_simulation(self, inputs, dt=None):
+        """以固定步長追上實際經過的時間 (dt，預設為上一個畫面的長度)；落後太多時捨棄多出的時間，避免越追越慢"""
+        global total_tokens
+        if dt is None: dt = self.frame_dt
+        self.sim_accumulator = min(self.sim_accumulator + dt, MAX_CATCHUP_STEPS * SIM_DT)
+        while self.sim_accumulator >= SIM_DT:
+            self.prev_positions = self.capture_positions()
+            if self.recorder: self.recorder.record(inputs)
+            self.sim.step(inputs)
+            self.sim_accumulator -= SIM_DT
+            if self.sim.game_over:
+                self.game_over = True
+                replay_path = self.save_replay()
+                self.end_telemetry()
+                if self.replay is None:
+                    if not self.autopilot_used: total_tokens += self.sim.score
+                    if self.store: self.store.record_session(self.sim, total_tokens, shop_items, replay_path)
+                break
+
+    def toggle_pause(self):
+        """切換暫停；恢復時把暫停的長度記入重播"""
+        self.paused = not self.paused
+        self.replay_resume_at = None
+        now = int(perf_counter() * 1000)
+        if self.paused: self.pause_started = now
+        elif self.recorder: self.recorder.pause((now - self.pause_started) / 1000)
+
+    def toggle_autopilot(self):
+        if self.input_source is not None and self.input_source is self.autopilot:
+            self.input_source = None
+            return
+        if self.autopilot is None: self.autopilot = Autopilot(AUTOPILOT_DEPTH, budget=AUTOPILOT_BUDGET)
+        self.input_source = self.autopilot
+        self.autopilot_used = True
+
+    def capture_positions(self):
+        """記錄玩家與落下物件在這一步之前的位置，供畫面內插"""
+        player = self.sim.player
+        return ((player.x, player.y),
+                [(obj.x, obj.y, obj.is_active) for obj in self.sim.wave_system.all_falling_objects])
+
+    def capture_snapshot(self, snapshot):
+        """把目前的模擬狀態寫進管線的快照 (在模擬執行緒，或模擬閒置時呼叫)"""
+        snapshot.capture(self.sim, self.prev_positions, self.sim_accumulator / SIM_DT)
+
+    def draw_playing_scene(self, alpha=1.0, snapshot=None):
+        """畫出火焰、玩家、落下物件與 HUD；回傳本幀畫過的區域
+
+        alpha 為目前時間落在上一步與這一步之間的比例，位置依此內插。
+        snapshot (管線模式的 FrameSnapshot) 不為 None 時畫快照的內容，否則直接讀取模擬。
+        """
+        if snapshot is None:
+            sim = self.sim
+            objects = sim.wave_system.all_falling_objects
+            prev_positions = self.prev_positions
+        else:
+            sim = snapshot
+            objects = snapshot.objects
+            prev_positions = snapshot.prev_positions
+        player = sim.player
+        screen = self.screen
+        back = 1.0 - alpha
+        (prev_px, prev_py), prev_objs = prev_positions
+        quality = self.quality
+        rects = []
+        pool = sim.particles
+        if pool.live:
+            # 粒子等速移動，上一步的位置即目前位置減去速度
+            sprites, xs, ys, vxs, vys, idx = self.fire_sprites, pool.x, pool.y, pool.vx, pool.vy, pool.sprite
+            stride = quality['particle_stride']
+            if stride == 1 and quality['particle_life'] >= 1.0:
+                rects += screen.blits([(sprites[idx[i]], (round(xs[i] - vxs[i] * back), round(ys[i] - vys[i] * back)))
+                                       for i in pool.live])
+            else:
+                # 只畫一部分：步數 + 剩餘壽命在粒子存活期間不變，同一步發射的粒子一起畫或一起略過 (不閃爍)
+                lifes, frame = pool.life, sim.frame
+                cut = self.fire_life * (1.0 - quality['particle_life'])
+                rects += screen.blits([(sprites[idx[i]], (round(xs[i] - vxs[i] * back), round(ys[i] - vys[i] * back)))
+                                       for i in pool.live if lifes[i] > cut and (frame + lifes[i]) % stride == 0])
+        px = round(prev_px + (player.x - prev_px) * alpha)
+        py = round(prev_py + (player.y - prev_py) * alpha)
+        if not (player.invincible_timer > 0 and (player.invincible_timer // 5) % 2 == 0):
+            rects.append(screen.blit(assets[player.mask_key], (px, py)))
+        for obj, (ox, oy, was_active) in zip(objects, prev_objs):
+            if not obj.is_active: continue
+            # 剛生成的物件沒有可內插的上一個位置
+            if was_active and abs(obj.y - oy) < 100:
+                rects.append(screen.blit(assets[obj.type], (round(ox + (obj.x - ox) * alpha), round(oy + (obj.y - oy) * alpha))))
+            else:
+                rects.append(screen.blit(assets[obj.type], (obj.x, obj.y)))
+        
+        center = (px + player.w // 2, py + player.h // 2)
+        if quality['rings']:
+            if player.invincible_timer > 0:
+                rects.append(pygame.draw.circle(screen, STAR_YELLOW, center, 80, 5))
+            elif player.shields > 0:
+                rects.append(pygame.draw.circle(screen, BLUE, center, 70, 3))
+        if self.profiler: self.profiler.mark('sprites')
+        
+        rects += self.draw_hud(sim, player)
+        if self.profiler: self.profiler.mark('hud')
+        return rects
+
+    def draw_hud(self, sim, player):
+        """分數、連擊、護盾與提示文字；品質降低時每 hud_interval 幀才重新組字，其餘幀直接貼上組好的圖"""
+        screen = self.screen
+        interval = self.quality['hud_interval']
+        if interval > 1 and self.hud_pieces is not None and self.hud_age < interval:
+            self.hud_age += 1
+            return screen.blits(self.hud_pieces)
+        counters = [
+            (self.font_medium, "得分: ", sim.score, WHITE, (20, 20)),
+            (self.font_medium, "連擊: ", sim.combo, GOLD if sim.combo >= 5 else WHITE, (20, 65)),
+            (self.font_small, "護盾: ", player.shields, BLUE, (SCREEN_WIDTH - 150, 20)),
+        ]
+        lines = []
+        if player.invincible_timer > 0:
+            lines.append((f"無敵中! {player.invincible_timer // SIM_HZ}s", 20, self.font_small, STAR_YELLOW))
+        if player.fire_timer > 0:
+            lines.append((f"火焰模式! {player.fire_timer // SIM_HZ}s", 50, self.font_small, ORANGE))
+        lines.append(("按 [S] 商店 | [P] 暫停", SCREEN_HEIGHT - 30, self.font_small, GRAY))
+        text = self.text_cache
+        if interval <= 1:
+            self.hud_pieces = None
+            rects = [text.draw_counter(screen, *counter) for counter in counters]
+            return rects + [self.draw_text_centered(*line) for line in lines]
+        pieces = [(text.counter_surface(font, label, value, color), pos) for font, label, value, color, pos in counters]
+        for line, y, font, color in lines:
+            surf = text.render(font, line, color)
+            pieces.append((surf, surf.get_rect(center=(SCREEN_WIDTH//2, y))))
+        self.hud_pieces = pieces
+        self.hud_age = 1
+        return screen.blits(pieces)
+
+    def draw_profiler_overlay(self):
+        """右上角顯示各階段的 p50 / p99 (毫秒)；每 30 幀更新一次內容"""
+        prof = self.profiler
+        if self.profiler_surface is None or prof.frames_total % 30 == 0:
+            rows = [f"{'phase':<10}{'p50':>7}{'p99':>7}"]
+            rows += [f"{name:<10}{p50:>7.2f}{p99:>7.2f}" for name, p50, p99 in prof.summary()]
+            if self.governor: rows.append(f"{'quality':<10}{self.governor.level:>7}")
+            font = self.profiler_font
+            line_h = font.get_linesize()
+            surf = pygame.Surface((190, line_h * len(rows) + 8), pygame.SRCALPHA)
+            surf.fill((0, 0, 0, 170))
+            for i, row in enumerate(rows):
+                surf.blit(font.render(row, True, GREEN), (6, 4 + i * line_h))
+            self.profiler_surface = surf
+        return self.screen.blit(self.profiler_surface, (SCREEN_WIDTH - 200, 60))
+
+    def run_frame(self):
+        """處理並畫出目前狀態的一個畫面 (不含等待下一幀)"""
+        prof = self.profiler
+        if prof: prof.begin_frame()
+        self.frame_presented = False
+        if self.state == "MENU": self.handle_menu()
+        elif self.state == "SHOP": self.handle_shop()
+        elif self.state == "CHAR_SELECT": self.handle_char_select()
+        elif self.state == "PLAYING": self.handle_playing()
+        if not self.frame_presented:
+            if prof:
+                prof.mark('menu' if self.state != "PLAYING" else 'hud')
+                self.draw_profiler_overlay()
+            # 其他畫面整頁重畫；回到遊戲時需要先整頁 flip 一次
+            self.renderer.invalidate()
+            pygame.display.flip()
+            if prof: prof.mark('present')
+        if prof: prof.end_frame()
+        if not self.first_frame_done:
+            self.first_frame_done = True
+            self.startup.mark('first_frame')
+            if self.report_startup: print(self.startup.report())
+
+    def restore_quality(self):
+        self.quality = QUALITY_LEVELS[0]
+        self.hud_pieces = None
+        if self.governor: self.governor.restore()
+
     def run(self):
         while True:
-            if self.state == "MENU": self.handle_menu()
-            elif self.state == "SHOP": self.handle_shop()
-            elif self.state == "CHAR_SELECT": self.handle_char_select()
-            elif self.state == "PLAYING": self.handle_playing()
-            pygame.display.flip()
-            self.clock.tick(60)
+            start = perf_counter()
+            self.run_frame()
+            if self.state != "PLAYING":
+                # 遊戲中的降級不帶到選單、商店與角色選擇
+                if self.quality is not QUALITY_LEVELS[0]: self.restore_quality()
+            elif self.governor and not self.paused and not self.game_over:
+                # 只以處理時間 (不含下面等待下一幀) 判斷
+                if self.governor.update(perf_counter() - start): self.quality = self.governor.settings
+            self.frame_dt = min(self.clock.tick(self.max_fps) / 1000, MAX_CATCHUP_STEPS * SIM_DT)
+
+def build_asset_bundle():
+    """從圖片重新產生資源包 (python 嘉桐gemini.py --build-assets)"""
+    init_pygame()
+    pygame.display.set_mode((1, 1))
+    load_and_clean_assets()
+    write_bundle(ASSET_BUNDLE, assets, asset_sources, asset_missing)
+    print(f"資源包已寫入 {ASSET_BUNDLE}")
 
 if __name__ == "__main__":
-    game = SpaceCatcherGame()
+    if '--build-assets' in sys.argv:
+        build_asset_bundle()
+        sys.exit()
+    # --full-flip：關閉局部更新，每幀整頁 flip；--fps N：畫面更新率上限
+    # --profile：顯示分段計時；--profile-out 檔案：結束時匯出 (.csv 或 Chrome trace .json)
+    # --replay 檔案 [--seek 步數]：播放重播 (從指定步數開始)；--waves 檔案：以 JSON 波次定義取代預設波次
+    # --autopilot：由前瞻搜尋自動駕駛操作 (遊戲中按 A 切換)；--startup：印出啟動各階段的耗時
+    # --pipeline：模擬在背景執行緒推進，與繪製上一幀重疊 (pipeline.py)
+    # --fixed-quality：關閉依幀時間自動調整畫面品質 (quality.py)
+    startup = StartupTimer(STARTUP_BEGIN)
+    startup.mark('import')
+    max_fps = int(sys.argv[sys.argv.index('--fps') + 1]) if '--fps' in sys.argv else MAX_FPS
+    profiler = None
+    if '--profile' in sys.argv or '--profile-out' in sys.argv:
+        profiler = FrameProfiler()
+        if '--profile-out' in sys.argv:
+            atexit.register(profiler.export, sys.argv[sys.argv.index('--profile-out') + 1])
+    replay = Replay.load(sys.argv[sys.argv.index('--replay') + 1]) if '--replay' in sys.argv else None
+    seek = int(sys.argv[sys.argv.index('--seek') + 1]) if '--seek' in sys.argv else 0
+    rules = {'waves': load_waves(sys.argv[sys.argv.index('--waves') + 1])} if '--waves' in sys.argv else None
+    game = SpaceCatcherGame(dirty_rects='--full-flip' not in sys.argv, max_fps=max_fps, profiler=profiler,
+                            replay=replay, replay_start=seek, rules=rules,
+                            startup=startup, report_startup='--startup' in sys.argv,
+                            pipelined='--pipeline' in sys.argv, adaptive_quality='--fixed-quality' not in sys.argv)
+    if '--autopilot' in sys.argv and replay is None: game.toggle_autopilot()
     game.run()
\ No newline at end of file